@@ -1,5 +1,8 @@
 
 call "%~dp0.venv\Scripts\activate.bat"
-cd /d "%~dp0EbookCopier
+set "APP_DIR=%~dp0EbookCopier"
+if exist "%~dp0current_version" set /p VERSION=<"%~dp0current_version"
+if defined VERSION if exist "%~dp0versions\%VERSION%\EbookCopier" set "APP_DIR=%~dp0versions\%VERSION%\EbookCopier"
+cd /d "%APP_DIR%"
 python -m main
 pause
\ No newline at end of file
@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+"""Benchmark Regression Gate"""
+# Runs the benchmark suites the way the stored baseline was made and fails if any tracked metric got worse by
+# more than its tolerance. Run from the EbookCopier folder:
+#   python -m benchmarks.compare                            # run the suites, compare with baseline.json
+#   python -m benchmarks.compare --tolerance 0.1 min_ms=0.3
+#   python -m benchmarks.compare --update                   # accept the current numbers as the new baseline
+# Timings only compare on the machine the baseline was made on, so baseline.json is local and not committed.
+# Make it with --update before changing the hot paths, and again after moving to another machine.
+# Exit codes: 0 no regressions, 1 regressions, 2 no baseline or a suite failed.
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+# Arguments each suite is run with, kept short enough to run before every commit to the hot paths
+SUITES = {
+    "micro": ["--repeat", "10"],
+    "throughput": ["--pages", "100"],
+}
+# Metric: (better, default tolerance as a fraction of the baseline value)
+TRACKED = {
+    # Fastest run, the least disturbed by whatever else the machine is doing
+    "min_ms": ("lower", 0.25),
+    # Stages inside the end-to-end run share the CPU with each other, only gross slowdowns are reliable there
+    "stage_p50_ms": ("lower", 1.0),
+    "cpu_s_per_page": ("lower", 0.2),
+    "pages_per_sec": ("higher", 0.2),
+    "peak_rss_mb": ("lower", 0.1),
+    "bytes_per_page": ("lower", 0.05),
+    "log_bytes_per_page": ("lower", 0.1),
+}
+# Latency changes smaller than this are noise however large the fraction
+MIN_DELTA_MS = 0.5
+
+
+def run_suite(suite, args):
+    """Run a suite in a fresh interpreter, returns its results list"""
+    with tempfile.TemporaryDirectory() as folder:
+        output = os.path.join(folder, f"{suite}.json")
+        print(f"Running {suite} {' '.join(args)}", flush=True)
+        result = subprocess.run([sys.executable, "-m", f"benchmarks.{suite}", *args, "--output", output],
+                                capture_output=True, text=True, cwd=os.getcwd())
+        if result.returncode != 0:
+            raise RuntimeError(f"{suite} failed:\n{result.stderr.strip()}")
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def flatten(results):
+    """{(case id, metric): value} of the tracked metrics, end-to-end stages become their own cases"""
+    values = {}
+    for entry in results:
+        for metric in TRACKED:
+            if entry.get(metric) is not None:
+                values[(entry["id"], metric)] = entry[metric]
+        for stage, timing in entry.get("stages", {}).items():
+            values[(f"{entry['id']} stage {stage}", "stage_p50_ms")] = timing["p50_ms"]
+    return values
+
+
+def compare(baseline, current, tolerances):
+    """Returns (regressions, improvements, missing), each a list of report lines"""
+    regressions, improvements = [], []
+    for key, before in sorted(baseline.items()):
+        if key not in current or not before:
+            continue
+        case, metric = key
+        after = current[key]
+        better, _ = TRACKED[metric]
+        change = (after - before) / before
+        worse = change if better == "lower" else -change
+        if metric.endswith("_ms") and abs(after - before) < MIN_DELTA_MS:
+            continue
+        line = f"{case} {metric}: {before:g} -> {after:g} ({change:+.1%})"
+        if worse > tolerances[metric]:
+            regressions.append(line)
+        elif worse < -tolerances[metric]:
+            improvements.append(line)
+    missing = [f"{case} {metric}" for case, metric in sorted(set(baseline) - set(current))]
+    return regressions, improvements, missing
+
+
+def parse_tolerances(values):
+    """Default tolerances overridden by a bare fraction for every metric and/or metric=fraction entries"""
+    tolerances = {metric: tolerance for metric, (_, tolerance) in TRACKED.items()}
+    for value in values or []:
+        metric, _, fraction = value.rpartition("=")
+        if metric and metric not in TRACKED:
+            raise ValueError(f"Unknown metric {metric}, tracked are {', '.join(TRACKED)}")
+        for name in [metric] if metric else TRACKED:
+            tolerances[name] = float(fraction)
+    return tolerances
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare",
+                                     description="Fail when benchmarks regress against the stored baseline")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument("--suites", nargs="+", choices=list(SUITES), default=list(SUITES), help="Suites to run")
+    parser.add_argument("--tolerance", nargs="+", metavar="[METRIC=]FRACTION",
+                        help=f"Allowed slowdown, e.g. 0.1 for all metrics or min_ms=0.3, tracked: {', '.join(TRACKED)}")
+    parser.add_argument("--update", action="store_true", help="Write the current results as the new baseline")
+    args = parser.parse_args(argv)
+
+    try:
+        tolerances = parse_tolerances(args.tolerance)
+    except ValueError as e:
+        parser.error(str(e))
+
+    baseline_path = Path(args.baseline)
+    stored = None
+    if baseline_path.exists():
+        stored = json.loads(baseline_path.read_text(encoding="utf-8"))
+    elif not args.update:
+        print(f"No baseline at {baseline_path}, create one with --update")
+        return 2
+
+    reports = {}
+    try:
+        for suite in args.suites:
+            # Same arguments the baseline was made with, or the defaults for a new baseline
+            suite_args = stored["suites"][suite]["args"] if stored and suite in stored["suites"] else SUITES[suite]
+            reports[suite] = (suite_args, run_suite(suite, suite_args))
+    except RuntimeError as e:
+        print(e)
+        return 2
+
+    if args.update:
+        suites = dict(stored["suites"]) if stored else {}
+        for suite, (suite_args, report) in reports.items():
+            suites[suite] = {"args": suite_args, "results": report["results"]}
+        environment = next(iter(reports.values()))[1]["environment"]
+        baseline_path.write_text(json.dumps({"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                                             "environment": environment, "suites": suites}, indent=2),
+                                 encoding="utf-8")
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    environment = next(iter(reports.values()))[1]["environment"]
+    if environment != stored["environment"]:
+        changed = sorted(k for k in environment if environment.get(k) != stored["environment"].get(k))
+        print(f"Warning: baseline was made on a different setup ({', '.join(changed)}), timings may not compare")
+
+    failed = False
+    for suite, (_, report) in reports.items():
+        regressions, improvements, missing = compare(flatten(stored["suites"].get(suite, {}).get("results", [])),
+                                                     flatten(report["results"]), tolerances)
+        print(f"{suite}: {len(regressions)} regressed, {len(improvements)} improved")
+        for line in regressions:
+            print(f"  REGRESSED {line}")
+        for line in improvements:
+            print(f"  improved  {line}")
+        for line in missing:
+            print(f"  missing   {line}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
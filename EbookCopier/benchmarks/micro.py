@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from benchmarks.pages import make_page, make_pair, KINDS, RESOLUTIONS
+from utils import image_manipulation, pdf_maker
+
+"""Micro-Benchmarks For The Image And PDF Hot Paths"""
+# Times image_manipulation and pdf_maker on synthetic pages at 1080p, 1440p and 4K. Run from the EbookCopier
+# folder:
+#   python -m benchmarks.micro                              # everything, results/micro.json
+#   python -m benchmarks.micro --only is_blank --repeat 20
+# Each result is identified as name[case], e.g. is_blank[text@4K] or add_image_to_pdf[batch=50@1080p],
+# the key to match a result against the same case in a stored baseline.
+
+DEFAULT_OUTPUT = Path(__file__).parent / "results" / "micro.json"
+BATCH_SIZES = (1, 10, 50)
+# Page kind and resolution the batch benchmarks write, a typical text page
+BATCH_PAGE = ("text", "1080p")
+
+
+def time_call(func, repeat, warmup=1):
+    """Seconds per call of func(), warmup calls are not timed"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def result(name, case, samples, **extra):
+    return {
+        "id": f"{name}[{case}]",
+        "name": name,
+        "case": case,
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+        **extra,
+    }
+
+
+def bench_is_blank(repeat):
+    for resolution in RESOLUTIONS:
+        for kind in KINDS:
+            page = make_page(kind, resolution)
+            samples = time_call(lambda: image_manipulation.is_blank(page, 0.006), repeat)
+            yield result("is_blank", f"{kind}@{resolution}", samples)
+
+
+def bench_compare_images(repeat):
+    for resolution in RESOLUTIONS:
+        for identical in (True, False):
+            first, second = make_pair("text", resolution, identical=identical)
+            samples = time_call(lambda: image_manipulation.compare_images(first, second), repeat)
+            yield result("compare_images", f"{'identical' if identical else 'different'}@{resolution}", samples)
+
+
+def bench_pil_to_cv2(repeat):
+    for resolution in RESOLUTIONS:
+        page = make_page("text", resolution)
+        samples = time_call(lambda: image_manipulation.pil_to_cv2(page), repeat)
+        yield result("pil_to_cv2", f"text@{resolution}", samples)
+
+
+def bench_page_hash(repeat):
+    for resolution in RESOLUTIONS:
+        page = make_page("text", resolution)
+        samples = time_call(lambda: image_manipulation.page_hash(page), repeat)
+        yield result("page_hash", f"text@{resolution}", samples)
+
+
+def bench_encode_image(repeat):
+    for resolution in RESOLUTIONS:
+        for kind in ("text", "photo"):
+            page = make_page(kind, resolution)
+            encoded = pdf_maker.encode_image(page)
+            samples = time_call(lambda: pdf_maker.encode_image(page), max(3, repeat // 4))
+            yield result("encode_image", f"{kind}@{resolution}", samples, bytes_per_page=len(encoded.data))
+
+
+def bench_add_image_to_pdf(repeat):
+    kind, resolution = BATCH_PAGE
+    # Pre-encoded like PDFManager's batches, different pages so nothing is shared between them
+    pages = [pdf_maker.encode_image(make_page(kind, resolution, seed=seed)) for seed in range(max(BATCH_SIZES))]
+    with tempfile.TemporaryDirectory() as folder:
+        for batch_size in BATCH_SIZES:
+            batch = pages[:batch_size]
+            samples = []
+            pdf_bytes = 0
+            for run in range(max(3, repeat // 4)):
+                pdf_path = os.path.join(folder, f"batch_{batch_size}_{run}.pdf")
+                started = time.perf_counter()
+                pdf_maker.add_image_to_pdf(batch, pdf_path)
+                samples.append(time.perf_counter() - started)
+                pdf_bytes = os.path.getsize(pdf_path)
+                os.remove(pdf_path)
+            yield result("add_image_to_pdf", f"batch={batch_size}@{resolution}", samples,
+                         per_page_ms=round(statistics.median(samples) * 1000 / batch_size, 3),
+                         bytes_per_page=pdf_bytes // batch_size)
+
+            # Appending the same batch to a pdf that already holds one, the incremental save path
+            pdf_path = os.path.join(folder, f"append_{batch_size}.pdf")
+            pdf_maker.add_image_to_pdf(batch, pdf_path)
+            samples = time_call(lambda: pdf_maker.add_image_to_pdf(batch, pdf_path), max(3, repeat // 4), warmup=0)
+            yield result("add_image_to_pdf", f"append batch={batch_size}@{resolution}", samples,
+                         per_page_ms=round(statistics.median(samples) * 1000 / batch_size, 3))
+
+
+BENCHMARKS = {
+    "is_blank": bench_is_blank,
+    "compare_images": bench_compare_images,
+    "pil_to_cv2": bench_pil_to_cv2,
+    "page_hash": bench_page_hash,
+    "encode_image": bench_encode_image,
+    "add_image_to_pdf": bench_add_image_to_pdf,
+}
+
+
+def environment():
+    import cv2
+    import fitz
+    import numpy
+    import PIL
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": numpy.__version__,
+        "pillow": PIL.__version__,
+        "pymupdf": fitz.VersionBind,
+    }
+
+
+def run(names, repeat):
+    results = []
+    for name in names:
+        for entry in BENCHMARKS[name](repeat):
+            print(f"  {entry['id']:<45} {entry['median_ms']:10.3f} ms", flush=True)
+            results.append(entry)
+    return {"suite": "micro", "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": repeat,
+            "environment": environment(), "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro",
+                                     description="Time image_manipulation and pdf_maker on synthetic pages")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="Benchmarks to run, all by default")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed calls per case, PDF cases use a quarter")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="JSON results file")
+    args = parser.parse_args(argv)
+
+    report = run(args.only, max(1, args.repeat))
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"{len(report['results'])} results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
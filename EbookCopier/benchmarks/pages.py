@@ -0,0 +1,85 @@
+import numpy as np
+from PIL import Image
+
+"""Synthetic Screenshots For Benchmarks"""
+# Deterministic stand-ins for captured pages, so runs on different machines measure the same pixels.
+# text: dark glyph-like marks in lines on a white page, photo: gradients and noise, blank: a white page,
+# near_blank: a white page with only a page number and a faint rule, which is_blank has to tell apart.
+
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4K": (3840, 2160),
+}
+KINDS = ("text", "photo", "blank", "near_blank")
+
+
+def make_page(kind, resolution, seed=0):
+    """PIL RGB image of a synthetic page
+
+    Args:
+        kind: One of KINDS
+        resolution: Key of RESOLUTIONS or a (width, height) tuple
+        seed: Different seeds give different pages of the same kind
+    """
+    width, height = RESOLUTIONS.get(resolution, resolution)
+    rng = np.random.default_rng(seed)
+    if kind == "text":
+        pixels = _text_page(rng, width, height)
+    elif kind == "photo":
+        pixels = _photo_page(rng, width, height)
+    elif kind == "blank":
+        pixels = np.full((height, width, 3), 255, dtype=np.uint8)
+    elif kind == "near_blank":
+        pixels = _near_blank_page(width, height)
+    else:
+        raise ValueError(f"Unknown page kind: {kind}")
+    return Image.fromarray(pixels, "RGB")
+
+
+def _text_page(rng, width, height):
+    pixels = np.full((height, width, 3), 250, dtype=np.uint8)
+    line_height = max(12, height // 45)
+    glyph_height = line_height * 2 // 3
+    margin = width // 10
+    for top in range(margin // 2, height - line_height - margin // 2, line_height):
+        x = margin
+        line_end = width - margin - int(rng.integers(0, width // 4))
+        while x < line_end:
+            word = int(rng.integers(3, 9)) * glyph_height // 2
+            for glyph_x in range(x, min(x + word, line_end), max(2, glyph_height // 2)):
+                # Glyph strokes of varying height, enough edges for is_blank to see text
+                stroke = int(rng.integers(glyph_height // 2, glyph_height + 1))
+                pixels[top + glyph_height - stroke:top + glyph_height, glyph_x:glyph_x + max(1, glyph_height // 4)] = 30
+            x += word + glyph_height
+    return pixels
+
+
+def _photo_page(rng, width, height):
+    gradient_x = np.linspace(0, 255, width, dtype=np.float32)
+    gradient_y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[..., 0] = gradient_x
+    pixels[..., 1] = gradient_y
+    pixels[..., 2] = (gradient_x + gradient_y) / 2
+    pixels += rng.normal(0, 12, (height, width, 1)).astype(np.float32)
+    return np.clip(pixels, 0, 255).astype(np.uint8)
+
+
+def _near_blank_page(width, height):
+    pixels = np.full((height, width, 3), 255, dtype=np.uint8)
+    # Faint header rule and a small page number block
+    pixels[height // 12, width // 10:width - width // 10] = 235
+    number = max(6, height // 90)
+    pixels[height - 3 * number:height - 2 * number, width // 2 - number:width // 2 + number] = 60
+    return pixels
+
+
+def make_pair(kind, resolution, identical=True):
+    """Two pages for compare_images, identical or differing only near the last pixel, the slowest to tell apart"""
+    first = make_page(kind, resolution)
+    if identical:
+        return first, first.copy()
+    second = np.array(first)
+    second[-2, -2] = 0 if second[-2, -2, 0] else 255
+    return first, Image.fromarray(second, "RGB")
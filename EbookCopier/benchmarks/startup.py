@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+"""Start-Up Import Benchmark"""
+# Imports a module the way the app starts, in a fresh interpreter with -X importtime, and reports where the
+# time goes. Run from the EbookCopier folder:
+#   python -m benchmarks.startup                       # import main, the app's start-up path
+#   python -m benchmarks.startup --module ebook_capture --output startup.json
+# Libraries only needed once a capture starts are listed in DEFERRED, loading any of them at start-up is
+# reported and makes the run exit with 1.
+
+DEFERRED = ("cv2", "numpy", "fitz", "pymupdf", "requests", "pyautogui", "keyboard")
+
+
+def parse_importtime(stderr):
+    """[{"module", "self_us", "cumulative_us", "depth"}] from -X importtime output, in import order"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        imports.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            # Each nested import is indented two more spaces
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    return imports
+
+
+def measure(module, repeat):
+    """Import module in repeat fresh interpreters, returns (wall times in seconds, importtime of the fastest)"""
+    code = f"import {module}"
+    walls = []
+    fastest = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                                capture_output=True, text=True, cwd=os.getcwd())
+        wall = time.perf_counter() - started
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+        walls.append(wall)
+        if fastest is None or wall <= min(walls):
+            fastest = parse_importtime(result.stderr)
+    return walls, fastest
+
+
+def report(module, walls, imports, top):
+    top_level = [i for i in imports if i["depth"] == 0]
+    loaded = {i["module"].split(".")[0] for i in imports}
+    return {
+        "module": module,
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "wall_s": {"min": round(min(walls), 4), "max": round(max(walls), 4), "runs": len(walls)},
+        "import_s": round(sum(i["cumulative_us"] for i in top_level) / 1e6, 4),
+        "modules": len(imports),
+        "deferred_loaded": sorted(loaded.intersection(DEFERRED)),
+        "slowest": sorted(top_level, key=lambda i: i["cumulative_us"], reverse=True)[:top],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="Time the imports done when the app starts")
+    parser.add_argument("--module", default="main", help="Module to import, defaults to the app's main")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to time, the fastest is reported")
+    parser.add_argument("--top", type=int, default=15, help="Slowest top level imports to list")
+    parser.add_argument("--output", default=None, help="Write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    walls, imports = measure(args.module, max(1, args.repeat))
+    result = report(args.module, walls, imports, args.top)
+
+    print(f"import {result['module']}: {result['import_s'] * 1000:.1f} ms in imports, "
+          f"{result['wall_s']['min'] * 1000:.1f} ms wall (best of {result['wall_s']['runs']}), "
+          f"{result['modules']} modules")
+    for entry in result["slowest"]:
+        print(f"  {entry['cumulative_us'] / 1000:8.1f} ms  {entry['module']}")
+    if result["deferred_loaded"]:
+        print(f"Loaded at start-up, should be deferred: {', '.join(result['deferred_loaded'])}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return 1 if result["deferred_loaded"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
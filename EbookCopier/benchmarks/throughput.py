@@ -0,0 +1,278 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from PIL import ImageDraw
+from benchmarks.pages import make_page, KINDS, RESOLUTIONS
+
+"""End-To-End Capture Throughput Benchmark"""
+# Runs the real capture_ebook -> CaptureOrchestrator -> PageProcessor -> PDFManager flow against a scripted
+# reader instead of Edge. Run from the EbookCopier folder:
+#   python -m benchmarks.throughput                         # 100, 1000 and 3000 page books
+#   python -m benchmarks.throughput --pages 200 --resolution 4K --kind photo
+# The reader stands in for the screen (ImageGrab) and the page turns (SimulatedDriver). The pause key is not
+# hooked, and every wait on the PauseManager or time.sleep in the managers only adds to a virtual clock. What
+# is left is the compute a page costs: grabbing, blank and duplicate checks, hashing, journaling, encoding and
+# PDF writes. Each book runs in a fresh interpreter so peak RSS is that book's alone. Linux and macOS report
+# peak RSS, on Windows it is left out.
+
+DEFAULT_SIZES = (100, 1000, 3000)
+DEFAULT_OUTPUT = Path(__file__).parent / "results" / "throughput.json"
+SITE = "Libby"
+# Pages the reader cycles through, each frame is stamped with its page number so no two pages are identical
+POOL_SIZE = 8
+
+
+class VirtualClock:
+    """Stands in for the time module, sleep() moves monotonic() forward instead of sleeping"""
+
+    def __init__(self):
+        self.slept = 0.0
+        self.sleeps = 0
+
+    def sleep(self, seconds):
+        self.slept += max(0.0, seconds)
+        self.sleeps += 1
+
+    def monotonic(self):
+        return time.monotonic() + self.slept
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class ScriptedReader:
+    """Fake screen and reader: shows page `page` of a book of `length` pages, staying on the last one"""
+
+    def __init__(self, length, kind="text", resolution="1080p"):
+        self.length = length
+        self.page = 0
+        self.grabs = 0
+        self.frames = [make_page(kind, resolution, seed=seed) for seed in range(min(POOL_SIZE, length))]
+
+    def grab(self, bbox=None, all_screens=False):
+        # ImageGrab.grab signature, a new image every call like a real screenshot
+        self.grabs += 1
+        page = min(self.page, self.length - 1)
+        frame = self.frames[page % len(self.frames)].copy()
+        self._stamp(frame, page)
+        return frame
+
+    @staticmethod
+    def _stamp(frame, page):
+        # Page number as a row of 16 bit blocks in the bottom margin, the PDF can not share images between pages
+        draw = ImageDraw.Draw(frame)
+        size = max(4, frame.height // 200)
+        top = frame.height - 2 * size
+        for bit in range(16):
+            if page >> bit & 1:
+                left = size * (2 + 2 * bit)
+                draw.rectangle((left, top, left + size - 1, top + size - 1), fill=(40, 40, 40))
+
+    def next_page(self):
+        self.page += 1
+
+
+class StaticTracker:
+    """WindowStateTracker that never sees a change, utils.window_state needs the Windows APIs to import"""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def get_hwnd(self):
+        return None
+
+    def ensure_ready(self):
+        return False
+
+
+@contextmanager
+def simulated_environment(reader, clock):
+    """Point the capture managers at reader and clock for the duration"""
+    from ebook_capture import managers, navigation, timing
+
+    async def wait(pause_manager, timer=None):
+        clock.sleep(pause_manager.timer if timer is None else timer)
+        await asyncio.sleep(0)
+        return pause_manager.is_cancelled()
+
+    def check_for_pause(pause_manager, timer=None):
+        clock.sleep(pause_manager.timer if timer is None else timer)
+        return pause_manager.is_cancelled()
+
+    replaced = {
+        (managers, "ImageGrab"): reader,
+        (managers, "time"): clock,
+        # Page turns and page load probes are timed on the virtual clock too
+        (navigation, "time"): clock,
+        (timing, "time"): clock,
+        (managers.PauseManager, "start_listener"): lambda pause_manager: None,
+        (managers.PauseManager, "stop_listener"): lambda pause_manager: None,
+        (managers.PauseManager, "wait"): wait,
+        (managers.PauseManager, "check_for_pause"): check_for_pause,
+    }
+    originals = {key: getattr(*key) for key in replaced}
+    try:
+        for (owner, name), value in replaced.items():
+            setattr(owner, name, value)
+        yield
+    finally:
+        for (owner, name), value in originals.items():
+            setattr(owner, name, value)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, None where the resource module is missing"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_book(pages, kind, resolution, max_images, log, collect_memory=False, profile=None):
+    """Capture a book of pages in this process, returns its result entry
+
+    profile: Write the sampled stacks of the capture to this path
+    """
+    from ebook_capture import capture
+    from ebook_capture.navigation import SimulatedDriver
+    from settings.config import Book, UserSettings
+    from utils.logs import setup_logging, stop_logging
+    from utils import profiler
+
+    reader = ScriptedReader(pages, kind, resolution)
+    clock = VirtualClock()
+    with tempfile.TemporaryDirectory() as folder:
+        if log:
+            # The app logs everything to file, that cost is part of a page
+            setup_logging(log_dir=os.path.join(folder, "logs"))
+        settings = UserSettings(path=os.path.join(folder, "config.toml"), save_delay=0)
+        settings.max_images = max_images
+        width, height = RESOLUTIONS[resolution]
+        book = Book()
+        book.file_path = os.path.join(folder, "book.pdf")
+        book.timer = "3"
+        book.book_length = str(pages)
+        book.selected_site = SITE
+        book.page_view = "single"
+        book.capture_box = {"x1": 0, "y1": 0, "x2": width, "y2": height, "monitor": 1}
+
+        rss_before = peak_rss_mb()
+        sampling = profiler.profiled(profile) if profile else nullcontext()
+        with simulated_environment(reader, clock), sampling:
+            cpu_started = time.process_time()
+            started = time.perf_counter()
+            finished = capture.capture_ebook(book, settings, driver=SimulatedDriver(reader), tracker=StaticTracker(),
+                                             headless=True, collect_metrics=True, collect_memory=collect_memory)
+            wall = time.perf_counter() - started
+            cpu = time.process_time() - cpu_started
+        if not finished:
+            raise RuntimeError(f"Capture of {pages} pages did not finish")
+
+        pdf_bytes = os.path.getsize(book.file_path)
+        with open(f"{book.file_path}.metrics.json", encoding="utf-8") as f:
+            report = json.load(f)
+        kept = report["pages"]
+        # Closes the log file before its folder is removed
+        stop_logging()
+
+    return {
+        "id": f"capture[{pages} pages {kind}@{resolution}]",
+        "name": "capture",
+        "case": f"{pages} pages {kind}@{resolution}",
+        "pages": kept,
+        "grabs": reader.grabs,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "pages_per_min": round(kept / wall * 60, 1),
+        "pages_per_sec": round(kept / wall, 3),
+        "cpu_s_per_page": round(cpu / kept, 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "start_rss_mb": rss_before,
+        "bytes_per_page": pdf_bytes // kept,
+        "log_bytes_per_page": report["log_bytes_per_page"],
+        "virtual_wait_s": round(clock.slept, 1),
+        "stages": report["stages"],
+        "counters": report["counters"],
+        **({"memory": report["memory"]} if collect_memory else {}),
+        **({"profile": profile} if profile else {}),
+    }
+
+
+def profile_path(pages, args):
+    """Profile of a book, next to the JSON results"""
+    return str(Path(args.output).parent / f"profile-{pages}-{args.kind}@{args.resolution}.collapsed")
+
+
+def run_in_subprocess(pages, args):
+    """run_book in a fresh interpreter, so memory held by an earlier book does not count"""
+    command = [sys.executable, "-m", "benchmarks.throughput", "--single", "--pages", str(pages),
+               "--kind", args.kind, "--resolution", args.resolution, "--max-images", str(args.max_images)]
+    if args.no_log:
+        command.append("--no-log")
+    if args.memory:
+        command.append("--memory")
+    if args.profile:
+        command += ["--profile-to", profile_path(pages, args)]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.getcwd())
+    if result.returncode != 0:
+        raise RuntimeError(f"{pages} page run failed:\n{result.stderr.strip()}")
+    # Libraries may print warnings to stdout, the result is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.throughput",
+                                     description="Capture synthetic books end to end and report throughput")
+    parser.add_argument("--pages", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Book sizes to capture")
+    parser.add_argument("--kind", choices=[k for k in KINDS if k not in ("blank", "near_blank")], default="text")
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="1080p", help="Capture box size")
+    parser.add_argument("--max-images", type=int, default=50, help="PDF batch size, the settings default")
+    parser.add_argument("--no-log", action="store_true", help="Leave logging unconfigured instead of logging to file")
+    parser.add_argument("--memory", action="store_true",
+                        help="Add the memory profile to each result, tracemalloc makes the timings meaningless")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write the sampled stacks of each book next to the output, opens in speedscope.app")
+    parser.add_argument("--profile-to", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="JSON results file")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        # One book, result on stdout for the parent process
+        profile = args.profile_to or (profile_path(args.pages[0], args) if args.profile else None)
+        print(json.dumps(run_book(args.pages[0], args.kind, args.resolution, args.max_images, not args.no_log,
+                                  args.memory, profile)))
+        return 0
+
+    from benchmarks.micro import environment
+    results = []
+    for pages in args.pages:
+        entry = run_in_subprocess(pages, args)
+        print(f"  {entry['id']:<40} {entry['pages_per_min']:8.1f} pages/min  {entry['cpu_s_per_page'] * 1000:7.1f} ms CPU/page"
+              f"  {entry['peak_rss_mb']} MB peak  {entry['bytes_per_page'] / 1024:7.1f} KiB/page", flush=True)
+        results.append(entry)
+
+    report = {"suite": "throughput", "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+              "results": results}
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"{len(results)} results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,33 @@
-from ebook_capture.capture import capture_ebook
-from ebook_capture.managers import CaptureConfig, PauseManager, PDFManager, ScreenshotManger, PageProcessor
\ No newline at end of file
+import importlib
+
+"""Capture Package"""
+# Names are resolved on first access, so importing the package does not load the capture modules and the
+# screenshot, PDF and Windows libraries behind them. The app only pays for them once a capture starts.
+
+_EXPORTS = {
+    "capture_ebook": "ebook_capture.capture",
+    "resume_ebook": "ebook_capture.capture",
+    "continue_ebook": "ebook_capture.capture",
+    "CaptureJournal": "ebook_capture.journal",
+    "ReviewQueue": "ebook_capture.review",
+    "CaptureConfig": "ebook_capture.managers",
+    "PauseManager": "ebook_capture.managers",
+    "PDFManager": "ebook_capture.managers",
+    "ScreenshotManger": "ebook_capture.managers",
+    "PageProcessor": "ebook_capture.managers",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,161 @@
+import sys
+import json
+import time
+import logging
+import argparse
+from settings.config import Book, UserSettings
+from ebook_capture.capture import capture_ebook, resume_ebook, continue_ebook
+from ebook_capture.journal import CaptureJournal
+from ebook_capture.review import ReviewQueue
+from utils import browser, pdf_maker
+from utils.logs import setup_logging
+logger = logging.getLogger(__name__)
+
+
+"""Headless Command Line Capture"""
+# python -m ebook_capture --site Libby --page-view "One Page" --length 300 --timer 5 --output book.pdf
+# Uses the capture box saved in config.toml for the site, Edge's monitor and the page view. Progress goes
+# to stderr and a JSON run summary to stdout. Qt is never imported on this path, blank and duplicate pages
+# are deferred for review in the app.
+
+EXIT_COMPLETED = 0
+EXIT_CANCELLED = 1
+EXIT_INVALID = 2
+EXIT_FAILED = 3
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ebook_capture", description="Capture an ebook to PDF without the UI")
+    parser.add_argument("--site", required=True, help="Site the book is open on, e.g. Libby or Hoopla")
+    parser.add_argument("--page-view", required=True, help="Page view the capture box was saved for, e.g. 'One Page'")
+    parser.add_argument("--length", required=True, help="Number of pages in the book")
+    parser.add_argument("--timer", default="5", help="Seconds to wait for a page to load, the ceiling for learned waits")
+    parser.add_argument("--output", required=True, help="PDF to save the book to")
+    parser.add_argument("--monitor", type=int, default=None, help="Monitor of the saved capture box, defaults to Edge's")
+    parser.add_argument("--resume", action="store_true",
+                        help="Carry on from the output's capture journal, or after the last page of the output PDF")
+    parser.add_argument("--settings", default=None, help="config.toml to read, defaults to settings/config.toml")
+    parser.add_argument("--metrics", action="store_true", help="Write per stage timings to <output>.metrics.json")
+    parser.add_argument("--trace", action="store_true",
+                        help="Write a timeline of the run to <output>.trace.json, opens in ui.perfetto.dev")
+    parser.add_argument("--memory", action="store_true",
+                        help="Add RSS per page and allocation diffs per batch to <output>.metrics.json, slows the run")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write sampled stacks of the run next to the log file, opens in speedscope.app")
+    parser.add_argument("--verbose", action="store_true", help="Log to stderr as well as the log file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    setup_logging(console_logging=args.verbose, console_level=logging.INFO, console_stream=sys.stderr)
+    started = time.monotonic()
+    summary = {"status": "failed", "output": args.output, "pages": 0, "captured": 0, "duration_s": 0.0,
+               "pages_per_min": 0.0, "review_items": 0, "error": ""}
+    try:
+        settings = UserSettings(args.settings)
+        book = _build_book(args, settings)
+        run = _select_run(book, args.resume)
+    except ValueError as e:
+        summary.update(status="invalid", error=str(e))
+        return _finish(summary, EXIT_INVALID)
+
+    progress = _ConsoleProgress(int(book.book_length))
+    try:
+        if not browser.activate_edge_window() or not browser.enter_fullscreen_if_needed():
+            raise RuntimeError("Microsoft Edge not ready")
+        finished = run(book, settings, headless=True, progress=progress, collect_metrics=args.metrics or None,
+                       collect_trace=args.trace or None, collect_memory=args.memory or None,
+                       profiling=args.profile or None)
+        summary["status"] = "completed" if finished else "cancelled"
+        exit_code = EXIT_COMPLETED if finished else EXIT_CANCELLED
+    except Exception as e:
+        logger.critical(f"Headless capture failed: {str(e)}", exc_info=True)
+        summary["error"] = str(e)
+        exit_code = EXIT_FAILED
+    finally:
+        progress.close()
+
+    duration = time.monotonic() - started
+    pages = pdf_maker.page_count(book.file_path)
+    summary.update(
+        pages=pages,
+        captured=progress.captured,
+        duration_s=round(duration, 1),
+        pages_per_min=round(pages / duration * 60, 1) if pages and duration else 0.0,
+        review_items=len(ReviewQueue(book.file_path).items) if ReviewQueue.exists(book.file_path) else 0,
+    )
+    return _finish(summary, exit_code)
+
+
+def _build_book(args, settings) -> Book:
+    """Book from the arguments, with the capture box saved for its site, monitor and page view"""
+    book = Book()
+    book.file_path = args.output
+    book.selected_site = args.site
+    book.page_view = args.page_view
+    book.book_length = args.length
+    book.timer = args.timer
+    try:
+        book.validate()
+    except ValueError as e:
+        raise ValueError(f"Invalid book parameter: {str(e)}") from e
+
+    monitor = args.monitor if args.monitor is not None else browser.get_edge_display_number()
+    if monitor is None:
+        raise ValueError("Microsoft Edge not found, pass --monitor or open the book in Edge")
+    try:
+        box = settings.saved_capture_boxes[book.selected_site][str(monitor)][book.page_view]
+    except KeyError:
+        raise ValueError(f"No capture box saved for {book.selected_site}, monitor {monitor}, {book.page_view}. "
+                         f"Select one once in the app first") from None
+    book.monitor_display = monitor
+    book.capture_box = {**box, "monitor": monitor}
+    return book
+
+
+def _select_run(book, resume):
+    """capture, resume or continue, refusing to silently append to an existing output"""
+    has_journal = CaptureJournal.exists(book.file_path)
+    has_pages = pdf_maker.page_count(book.file_path) > 0
+    if resume:
+        if has_journal:
+            return resume_ebook
+        if has_pages:
+            return continue_ebook
+        logger.info("Nothing to resume, starting a new capture")
+    elif has_journal or has_pages:
+        raise ValueError(f"{book.file_path} already has an unfinished capture, pass --resume to continue it")
+    return capture_ebook
+
+
+def _finish(summary, exit_code):
+    summary["exit_code"] = exit_code
+    print(json.dumps(summary), flush=True)
+    return exit_code
+
+
+class _ConsoleProgress:
+    """Single updating progress line on stderr"""
+    def __init__(self, book_length):
+        self.book_length = book_length
+        self.captured = 0
+        self.kept = 0
+        self.started = time.monotonic()
+
+    def __call__(self, captured, kept):
+        self.captured = captured
+        self.kept = kept
+        elapsed = time.monotonic() - self.started
+        rate = kept / elapsed * 60 if elapsed else 0.0
+        sys.stderr.write(f"\rPage {kept}/{self.book_length} ({captured} captured, {rate:.1f} pages/min)")
+        sys.stderr.flush()
+
+    def close(self):
+        if self.captured:
+            sys.stderr.write("\n")
+            sys.stderr.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,14 @@
 from ebook_capture.managers import CaptureConfig, PauseManager, PDFManager, ScreenshotManger, PageProcessor, Process
-import keyboard
-from utils import browser
+from ebook_capture import navigation
+from ebook_capture.timing import PageLoadModel, PageLoadTimer
+from ebook_capture.orchestrator import CaptureOrchestrator
+from ebook_capture.journal import CaptureJournal, JournalState
+from ebook_capture.progress import RunProgress
+from ebook_capture import review
+from ui.dialog_result import DialogResult
+from utils import image_manipulation, logs, memory, metrics, pdf_maker, profiler, trace
+from pathlib import Path
+import asyncio
 import logging
 logger = logging.getLogger(__name__)
 
@@ -10,21 +18,109 @@ logger = logging.getLogger(__name__)
 # TODO: Check Raises
 # TODO: Maximum second pass length? To avoit endless run
 
-
-def capture_ebook(book, settings):
-    """Main function to capture an ebook and convert it to PDF"""
-    logger.info(f"Starting ebook capture for {book.selected_site}")
+# Seconds between progress overlay updates
+OVERLAY_INTERVAL = 0.5
+
+
+def capture_ebook(book, settings, profiling=None, **options):
+    """Main function to capture an ebook and convert it to PDF
+
+    Runs capture_ebook_async on a new event loop in the calling thread, which must be the UI thread
+    as the capture dialogs are shown from the loop. options are capture_ebook_async's keyword arguments.
+    profiling: Sample every thread's stack during the run and write them next to the log file as
+        profile-<pdf name>-<time>.collapsed, defaults to settings.profiling
+    """
+    if profiling is None:
+        profiling = settings.profiling
+    if not profiling:
+        return asyncio.run(capture_ebook_async(book, settings, **options))
+    with profiler.profiled(profiler.default_path(Path(book.file_path).stem)):
+        return asyncio.run(capture_ebook_async(book, settings, **options))
+
+
+def resume_ebook(book, settings, **options):
+    """Continue a capture run from the journal it left next to book.file_path"""
+    return capture_ebook(book, settings, resume=True, **options)
+
+
+def continue_ebook(book, settings, **options):
+    """Continue a partial PDF at book.file_path that has no journal, appending from the page after its last"""
+    return capture_ebook(book, settings, continue_pdf=True, **options)
+
+
+async def capture_ebook_async(book, settings, driver=None, tracker=None, resume=False, continue_pdf=False,
+                              review_policy=None, headless=False, progress=None, collect_metrics=None,
+                              collect_trace=None, collect_memory=None):
+    """Capture an ebook and convert it to PDF
+
+    driver: NavigationDriver used to turn pages, defaults to the one named in settings.navigation_driver
+    tracker: WindowStateTracker keeping the reader window ready, defaults to EdgeWindowTracker
+    resume: Continue from the capture journal of book.file_path instead of starting at page one
+    continue_pdf: Continue the partial PDF at book.file_path, the position comes from its last page
+    review_policy: review.ASK to prompt on blank/duplicate pages, review.DEFER to queue them for review
+        after the run, defaults to settings.review_policy
+    headless: No Qt dialogs or progress overlay, pages are deferred for review and a pause asks on the console
+    progress: Called as progress(captured, kept) after each page is analysed
+    collect_metrics: Time each pipeline stage and write <pdf>.metrics.json, defaults to settings.collect_metrics
+    collect_trace: Record a timeline of every thread and write <pdf>.trace.json, defaults to settings.collect_trace
+    collect_memory: Sample RSS per page and trace allocations per batch into the metrics report, slows the run,
+        defaults to settings.collect_memory
+    """
+    logger.info("Starting ebook capture for %s (resume=%s, continue_pdf=%s)", book.selected_site, resume, continue_pdf)
+
+    # Setup only reads and builds, the instrumentation, journal and keyboard hook are started in the try below
+    # so a failure anywhere is cleaned up by its finally
+    if collect_metrics is None:
+        collect_metrics = settings.collect_metrics
+    if collect_memory is None:
+        collect_memory = settings.collect_memory
+    if collect_memory:
+        # Findings go into the metrics report
+        collect_metrics = True
+    # The overlay shows the latest stage timings, those need metrics even when no report is written
+    show_overlay = not headless and settings.progress_overlay
+    if collect_trace is None:
+        collect_trace = settings.collect_trace
+    try:
+        threshold = settings.thresholds[book.selected_site]
+    except KeyError as e:
+        logger.error("No blank page threshold for site: %s", book.selected_site)
+        raise ValueError(f"No blank page threshold for site: {book.selected_site}") from e
+
+    # Every page is journaled before it is batched, so a crashed run can be resumed
+    journal = CaptureJournal(book.file_path)
+    journal_state = None
+    last_page = None
+    if resume:
+        journal_state = journal.load()
+        if journal_state.book.get("capture_box"):
+            # Hashes only match the live screen with the capture box they were taken with
+            book.capture_box = journal_state.book["capture_box"]
+    elif continue_pdf:
+        journal_state, last_page = _read_pdf_position(book.file_path)
 
     # Setup components with detailed configuration logging
     logger.debug("Initializing capture components...")
     capture_config = CaptureConfig(book.capture_box)
+    if tracker is None:
+        from utils.window_state import EdgeWindowTracker
+        tracker = EdgeWindowTracker()
+    if driver is None:
+        driver_options = {"hwnd_provider": tracker.get_hwnd} if settings.navigation_driver == "window_message" else {}
+        driver = navigation.create_driver(settings.navigation_driver, **driver_options)
     pause_manager = PauseManager(timer=int(book.timer))
-    pause_manager.start_listener()
+
+    # Timer is the ceiling, normal waits are learned from this site and page view's load times
+    load_model = PageLoadModel(
+        ceiling=int(book.timer),
+        samples=settings.page_load_samples.get(book.selected_site, {}).get(book.page_view))
 
     screenshot_manager = ScreenshotManger(capture_config=capture_config,
+                                          pause_manager=pause_manager,
                                           blank_attempts=2,
-                                          threshold=settings.thresholds[book.selected_site],
-                                          retry_delay=int(book.timer))
+                                          threshold=threshold,
+                                          retry_delay=int(book.timer),
+                                          load_model=load_model)
 
     pdf_manager = PDFManager(max_img=settings.max_images,
                              max_memory=settings.max_memory_mb,
@@ -34,147 +130,349 @@ def capture_ebook(book, settings):
                               pause_manager,
                               pdf_manager,
                               )
+    if headless:
+        pause_manager.pause_prompt = _console_cancel_prompt
+    review_policy = review_policy or (review.DEFER if headless else settings.review_policy)
+    if review_policy == review.DEFER:
+        review_queue = review.ReviewQueue(book.file_path,
+                                          blank_action=settings.review_blank_action,
+                                          duplicate_action=settings.review_duplicate_action)
+        review_queue.attach(processor)
+    load_timer = PageLoadTimer(load_model, screenshot_manager, pause_manager)
+    run_progress = None
+    if show_overlay:
+        run_progress = progress = RunProgress(book.book_length, forward=progress)
+    orchestrator = CaptureOrchestrator(
+        processor,
+        pause_manager,
+        navigate=lambda executor: navigate_to_next_page(driver, pause_manager, tracker, load_timer, executor),
+        journal=journal,
+        progress=progress)
     logger.info(
-        f"Components initialized with settings:\n"
-        f"- Site: {book.selected_site}\n"
-        f"- Timer: {book.timer}\n"
-        f"- Threshold: {settings.thresholds[book.selected_site]}\n"
-        f"- Max images: {settings.max_images}\n"
-        f"- Max memory: {settings.max_memory_mb}MB\n"
-        f"- Output path: {book.file_path}"
+        "Components initialized with settings:\n"
+        "- Site: %s\n"
+        "- Timer: %s\n"
+        "- Threshold: %s\n"
+        "- Max images: %s\n"
+        "- Max memory: %sMB\n"
+        "- Navigation: %s\n"
+        "- Review policy: %s\n"
+        "- Learned page wait: %.2fs (%s samples)\n"
+        "- Output path: %s",
+        book.selected_site, book.timer, threshold, settings.max_images,
+        settings.max_memory_mb, driver.name, review_policy, load_model.next_wait(), len(load_model.samples),
+        book.file_path
     )
+    finished = False
+    overlay_task = None
     try:
+        if collect_memory:
+            memory.enable()
+        if collect_metrics or show_overlay:
+            metrics.enable()
+        if collect_trace:
+            trace.enable()
+        if resume:
+            journal.append()
+        else:
+            # Started once setup succeeded, a run that fails before it leaves no journal to resume
+            journal.start(book)
+            if review_policy == review.DEFER and not continue_pdf:
+                # Items left by an earlier run of this file no longer match its pages
+                review_queue.clear()
+        pause_manager.start_listener()
+
+        if resume:
+            _recover_journaled_pages(journal, journal_state, pdf_manager, screenshot_manager)
+        if last_page is not None:
+            screenshot_manager.add_previous_screenshot(last_page)
+        processor.pages_kept = pdf_maker.page_count(book.file_path)
+        if journal_state is not None:
+            orchestrator.captured = journal_state.captures
+
+        tracker.start()
+        await orchestrator.start()
+        if run_progress is not None:
+            overlay_task = asyncio.create_task(_show_overlay(book, orchestrator, run_progress), name="overlay")
         # Initial wait before starting capture
         logger.info("Starting initial wait period...")
-        pause_manager.check_for_pause(timer=float(book.timer))
+        await pause_manager.wait(timer=float(book.timer))
         logger.info("Initial wait completed, beginning capture process")
 
+        if journal_state is not None and journal_state.last_hash is not None:
+            if not await _confirm_resume_position(journal_state, orchestrator, headless):
+                logger.warning("Resume cancelled at position check")
+                return False
+
         # First pass - user declared book length
-        logger.info(f"Starting first pass for {book.book_length} pages")
-        first_pass_result = _process_initial_pages(book, processor, pause_manager, int(book.timer))
+        logger.info("Starting first pass for %s pages", book.book_length)
+        first_pass_result = await _process_initial_pages(book, orchestrator, pause_manager)
 
         if first_pass_result != Process.COMPLETED:
-            logger.warning(f"Capture cancelled during first pass with result: {first_pass_result}")
+            logger.warning("Capture cancelled during first pass with result: %s", first_pass_result)
             return False
 
         # Second pass - process remaining pages until duplicate found
         if not processor.end_of_book:
             logger.info("Starting remaining pages processing")
-            second_pass_result = _process_remaining_pages(processor, pause_manager, int(book.timer))
+            second_pass_result = await _process_remaining_pages(orchestrator, pause_manager)
             if second_pass_result != Process.COMPLETED:
-                logger.warning(f"Capture cancelled during remaining pages with result: {second_pass_result}")
+                logger.warning("Capture cancelled during remaining pages with result: %s", second_pass_result)
                 return False
 
         logger.info("Ebook capture completed successfully")
+        finished = True
         return True
 
     except Exception as e:
         # TODO: Ensure we are raising run cancelling errors back to main, for popup_window.messagebox
-        logger.critical(f"Fatal error during ebook capture: {str(e)}", exc_info=True)
+        logger.critical("Fatal error during ebook capture: %s", e, exc_info=True)
         raise RuntimeError(f"Runtime Error during capture: {str(e)}") from e
     finally:
         logger.info("Beginning cleanup process")
-        _cleanup_resources(pause_manager, pdf_manager)
+        if overlay_task is not None:
+            overlay_task.cancel()
+            await asyncio.gather(overlay_task, return_exceptions=True)
+        try:
+            try:
+                await _cleanup_resources(pause_manager, pdf_manager, driver, tracker, orchestrator)
+            finally:
+                # Unfinished runs keep their journal to be resumed or deleted by the user, unless a new run
+                # stopped before journaling a frame and there is nothing to resume
+                if finished or (not resume and not journal.recorded):
+                    journal.discard()
+                else:
+                    journal.close()
+        finally:
+            # A failed cleanup still gets its reports, and the instrumentation is off for the next run
+            _save_load_samples(book, settings, load_model)
+            try:
+                if collect_metrics:
+                    _write_metrics_report(book, processor, orchestrator, finished)
+                elif show_overlay:
+                    metrics.disable()
+            finally:
+                if collect_trace:
+                    _write_trace(book)
         logger.info("Cleanup completed, book finished")
 
 
-def _process_initial_pages(book, processor: PageProcessor, pause_manager: PauseManager, timer):
+async def _process_initial_pages(book, orchestrator: CaptureOrchestrator, pause_manager: PauseManager):
     """Process pages up to user declared book length"""
-    logger.info(f"Processing initial {book.book_length} pages")
+    # A resumed run only captures what the first run had not reached yet
+    pages = max(0, int(book.book_length) - orchestrator.captured)
+    logger.info("Processing initial %s of %s pages", pages, book.book_length)
+    result = await orchestrator.run(should_cancel=lambda: _should_cancel(pause_manager), pages=pages)
 
-    for page in range(int(book.book_length)):
-        if _should_cancel(pause_manager):
-            logger.warning(f"Cancellation detected at page {page}")
-            return Process.CANCELLED
+    if result == Process.CANCELLED:
+        logger.warning("User cancelled during initial pages processing")
+    elif orchestrator.processor.end_of_book:
+        logger.info("Early book end detected during initial processing")
+    else:
+        logger.info("Completed all initial pages")
+    return result
 
-        logger.debug(f"Processing page {page + 1}/{book.book_length}")
-        result = processor.process_page()
-        logger.debug(f"Page processing result: {result}")
 
-        if result == Process.CANCELLED:
-            logger.warning("User cancelled during initial pages processing")
-            return Process.CANCELLED
+async def _process_remaining_pages(orchestrator: CaptureOrchestrator, pause_manager: PauseManager):
+    """Continue processing pages until duplicate found (auto end of book detection)"""
 
-        if result == Process.END:
-            logger.info("Early book end detected during initial processing")
-            return Process.COMPLETED
+    # TODO: Conisder adding a maximum length to run.
+    logger.info("Starting remaining pages processing")
+    result = await orchestrator.run(should_cancel=lambda: _should_cancel(pause_manager), end_of_book_mode=True)
 
-        if result == Process.NEXT:
-            logger.debug("Navigating to next page")
-            navigate_to_next_page(timer, pause_manager)
-        else:
-            logger.error(f"Unexpected processing result: {result}")
-            raise RuntimeError(f"Error processing initial pages: {result}")
+    if result == Process.CANCELLED:
+        logger.warning("User cancelled during remaining pages processing")
+    else:
+        logger.info("Auto-detected book end during remaining pages processing")
+    return result
 
-    logger.info("Completed all initial pages")
-    return Process.COMPLETED
 
+async def _should_cancel(pause_manager):
+    """Check if processing should be cancelled"""
+    cancelled = pause_manager.is_cancelled()
+    # Page load waits are handled after navigation, only look for a pending pause here
+    paused = await pause_manager.wait(timer=0)
 
-def _process_remaining_pages(processor: PageProcessor, pause_manager: PauseManager, timer: float):
-    """Continue processing pages until duplicate found (auto end of book detection)"""
+    if cancelled or paused:
+        logger.debug("Cancellation check - cancelled: %s, paused: %s", cancelled, paused)
+    return cancelled or paused
 
-    # TODO: Conisder adding a maximum length to run.
-    logger.info("Starting remaining pages processing")
-    page_count = 0
 
-    while True:
-        if _should_cancel(pause_manager):
-            logger.warning("Cancellation detected during remaining pages processing")
-            return Process.CANCELLED
+def _read_pdf_position(pdf_path):
+    """Resume point of a partial PDF without a journal: its page count and the hash of its last page
 
-        page_count += 1
-        logger.debug(f"Processing remaining page {page_count}")
-        result = processor.process_page(end_of_book_mode=True)
-        logger.info(f"Remaining page processing result: {result}")
+    Returns:
+        tuple: (JournalState, last page image or None)
+    """
+    pages = pdf_maker.page_count(pdf_path)
+    last_page = pdf_maker.last_page_image(pdf_path)
+    last_hash = image_manipulation.page_hash(last_page) if last_page is not None else None
+    logger.info("Continuing %s after its %s pages", pdf_path, pages)
+    return JournalState({}, [], pages, last_hash), last_page
 
-        if result == Process.CANCELLED:
-            logger.warning("User cancelled during remaining pages processing")
-            return Process.CANCELLED
 
-        if result == Process.END:  # Found final duplicate
-            logger.info("Auto-detected book end during remaining pages processing")
-            return Process.COMPLETED
+def _recover_journaled_pages(journal, state, pdf_manager, screenshot_manager):
+    """Append journaled pages the PDF is missing, and restore the last kept page for duplicate checks"""
+    in_pdf = pdf_maker.page_count(journal.pdf_path) - state.base_pages
+    missing = state.pages[max(0, in_pdf):]
+    if in_pdf > len(state.pages):
+        logger.warning("PDF has %s pages from this run but the journal only %s", in_pdf, len(state.pages))
+    logger.info("Recovering %s journaled pages (%s already in PDF)", len(missing), in_pdf)
+    for entry in missing:
+        pdf_manager.add_to_batch(journal.read_page(entry))
+    pdf_manager.save_batch_to_pdf()
 
-        logger.debug("Navigating to next remaining page")
-        navigate_to_next_page(timer, pause_manager)
+    if state.pages:
+        screenshot_manager.add_previous_screenshot(pdf_maker.decode_page(journal.read_page(state.pages[-1])))
 
 
-def _should_cancel(pause_manager):
-    """Check if processing should be cancelled"""
-    cancelled = pause_manager.is_cancelled()
-    paused = pause_manager.check_for_pause()
+async def _confirm_resume_position(state, orchestrator, headless=False):
+    """Check the reader still shows the last captured page, then turn to the next one
 
-    if cancelled or paused:
-        logger.debug(f"Cancellation check - cancelled: {cancelled}, paused: {paused}")
-    return cancelled or paused
+    Returns False if the user cancelled the resume.
+    """
+    loop = asyncio.get_running_loop()
+    screenshot_manager = orchestrator.processor.screenshot_manager
+    while True:
+        screen = await loop.run_in_executor(orchestrator.capture_executor, screenshot_manager.grab)
+        digest = await loop.run_in_executor(orchestrator.capture_executor, image_manipulation.page_hash, screen)
+        if digest == state.last_hash:
+            logger.info("Screen matches captured page %s, resuming from the next page", state.captures)
+            screenshot_manager.current_screenshot = screen
+            await orchestrator.navigate(orchestrator.capture_executor)
+            return True
+
+        logger.warning("Screen does not match the last journaled page")
+        if headless:
+            logger.error("Resume position could not be confirmed, no one to ask in a headless run")
+            return False
+        from ui.popup_windows import MessageBox
+        response = MessageBox.question(title="Resume Position",
+                                       message=f"The screen does not match the last captured page ({state.captures}).\n"
+                                               f"Go back to that page and Retry, or Continue from the page on screen.",
+                                       button_options=[
+                                           {"text": "Retry", "return": DialogResult.RETRY},
+                                           {"text": "Continue", "return": DialogResult.ACCEPT},
+                                           {"text": "Cancel", "return": DialogResult.REJECT}])
+        if response == DialogResult.ACCEPT:
+            logger.info("User continuing from the page on screen")
+            return True
+        if response != DialogResult.RETRY:
+            return False
+
+
+def _console_cancel_prompt():
+    """Headless pause prompt, DialogResult.ACCEPT cancels the book"""
+    try:
+        answer = input("Processing paused. Cancel the current book? [y/N] ")
+    except EOFError:
+        # No console to answer from, a pause key press in an unattended run means stop
+        return DialogResult.ACCEPT
+    return DialogResult.ACCEPT if answer.strip().lower() in ("y", "yes") else DialogResult.REJECT
 
 
-def _cleanup_resources(pause_manager, pdf_manager):
+async def _cleanup_resources(pause_manager, pdf_manager, driver, tracker, orchestrator):
     """Clean up all resources"""
     logger.debug("Starting resource cleanup")
     try:
+        # Captured pages still in the orchestrator are analysed and written before the final save
+        try:
+            await orchestrator.stop()
+            logger.debug("Capture orchestrator drained")
+        finally:
+            pdf_manager.finalize()
+            logger.debug("PDF manager finalized")
         pause_manager.stop_listener()
         logger.debug("Pause manager stopped")
-        pdf_manager.finalize()
-        logger.debug("PDF manager finalized")
+        driver.close()
+        tracker.stop()
     except Exception as e:
-        logger.error(f"Error during cleanup: {str(e)}", exc_info=True)
+        logger.error("Error during cleanup: %s", e, exc_info=True)
         raise
 
 
-def navigate_to_next_page(timer, pause_manager):
-    """Navigate to next page and wait for page to load"""
+async def _show_overlay(book, orchestrator, run_progress):
+    """Keep the progress overlay up to date until cancelled
+
+    The overlay is only repainted here, on the loop between pages, the capture thread never waits for it.
+    Nothing is shown if there is no room beside the capture box.
+    """
+    from ui.popup_windows import ProgressOverlay
+    overlay = None
+    try:
+        overlay = ProgressOverlay.beside(book.capture_box)
+        if overlay is None:
+            return
+        while True:
+            overlay.refresh(run_progress.snapshot(orchestrator))
+            await asyncio.sleep(OVERLAY_INTERVAL)
+    except Exception as e:
+        # The run carries on without it, cancelling is not an Exception and still ends the task
+        logger.error("Progress overlay failed: %s", e, exc_info=True)
+    finally:
+        if overlay is not None:
+            overlay.close()
+
+
+def _save_load_samples(book, settings, load_model):
+    """Persist the learned page load latencies for the next run"""
+    try:
+        settings.update_page_load_samples(book.selected_site, book.page_view, load_model.to_list())
+        logger.debug("Saved %s page load samples", len(load_model.samples))
+    except Exception as e:
+        logger.error("Failed to save page load samples: %s", e, exc_info=True)
+
+
+def _write_metrics_report(book, processor, orchestrator, finished):
+    """Per stage p50/p95/max of the run, next to the PDF"""
+    try:
+        # Records still queued for the log file count towards this run's log bytes
+        logs.flush_logging()
+        log_bytes = metrics.summary()["counters"].get("log_bytes", 0)
+        extra = {"memory": memory.report()} if memory.is_enabled() else {}
+        metrics.write_report(book.file_path, pages=processor.pages_kept, captured=orchestrator.captured,
+                             finished=finished, log_bytes_per_page=log_bytes // max(1, processor.pages_kept), **extra)
+    except RuntimeError:
+        pass  # Logged by write_report, the capture itself is unaffected
+    finally:
+        metrics.disable()
+        memory.disable()
+
+
+def _write_trace(book):
+    """Timeline of the run for chrome://tracing or ui.perfetto.dev, next to the PDF"""
+    try:
+        trace.write_trace(book.file_path)
+    except RuntimeError:
+        pass  # Logged by write_trace, the capture itself is unaffected
+    finally:
+        trace.disable()
+
+
+async def navigate_to_next_page(driver, pause_manager, tracker, load_timer, executor=None):
+    """Navigate to next page and wait for page to load
+
+    The wait is timed from when the driver delivered the page turn, and learned by load_timer.
+    executor: Executor for the blocking window checks and page turn, the capture stage's executor
+    Returns the delivery timestamp (time.monotonic()).
+    """
     logger.debug("Attempting to navigate to next page")
+    loop = asyncio.get_running_loop()
 
-    if browser.check_environment():
+    with metrics.timed("ensure_ready"):
+        adjusted = await loop.run_in_executor(executor, tracker.ensure_ready)
+    if adjusted:
         logger.debug("Browser environment adjustment detected - applying extended wait")
-        pause_manager.check_for_pause(timer=30)
+        with metrics.timed("environment_wait"):
+            await pause_manager.wait(timer=30)
 
     try:
-        keyboard.press_and_release("right")
+        with metrics.timed("next_page"):
+            delivered = await loop.run_in_executor(executor, driver.next_page)
         logger.info("Navigated to next page")
-        pause_manager.check_for_pause(timer=1)
-        return True
+        with metrics.timed("page_load_wait"):
+            await load_timer.wait(delivered, executor)
+        return delivered
     except Exception as e:
-        logger.error(f"Navigation failed: {str(e)}")
+        logger.error("Navigation failed: %s", e)
         raise
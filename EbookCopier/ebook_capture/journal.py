@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import threading
+import logging
+from utils import pdf_maker
+logger = logging.getLogger(__name__)
+
+
+"""Write Ahead Journal Of A Capture Run"""
+# PDFManager only writes a batch every max_images pages, so a crash loses the pages still in the batch.
+# Every captured page is journaled before it is batched: the PNG goes to <pdf>.journal.blob, then a JSON
+# line with its hash, blob offset and decision goes to <pdf>.journal, both flushed to disk. A resumed run
+# appends any journaled pages the PDF is missing and confirms the reader position with the last hash.
+# Journal line types:
+#   book: book settings the run was started with, and the PDF page count before the run
+#   page: kept page, capture number, hash, blob offset/length, image size, decision
+#   skip: captured frame that was not kept, capture number, hash, decision
+
+
+class JournalState:
+    """What a journal recorded before its run stopped"""
+    def __init__(self, book, pages, captures, last_hash):
+        """
+        Args:
+            book: Book settings from the journal's book line
+            pages: Kept page lines, in capture order
+            captures: Number of frames captured, kept or not
+            last_hash: Hash of the last captured frame, the page the reader was on, None if nothing captured
+        """
+        self.book = book
+        self.pages = pages
+        self.captures = captures
+        self.last_hash = last_hash
+
+    @property
+    def base_pages(self):
+        """Pages the PDF already had when the run started"""
+        return self.book.get("base_pages", 0)
+
+
+class CaptureJournal:
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self.journal_path = f"{pdf_path}.journal"
+        self.blob_path = f"{pdf_path}.journal.blob"
+        self._journal = None
+        self._blob = None
+        self._lock = threading.Lock()
+        # Frames journaled since the journal was started or reopened
+        self.recorded = 0
+
+    @staticmethod
+    def exists(pdf_path):
+        """True if an unfinished run left a journal for this PDF"""
+        return os.path.exists(f"{pdf_path}.journal")
+
+    def start(self, book):
+        """Begin a new journal for book, replacing any old one"""
+        self.close()
+        self.recorded = 0
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        self._blob = open(self.blob_path, "wb")
+        self._write_line({
+            "type": "book",
+            "site": book.selected_site,
+            "page_view": book.page_view,
+            "book_length": int(book.book_length),
+            "timer": int(book.timer),
+            "capture_box": book.capture_box,
+            "base_pages": pdf_maker.page_count(self.pdf_path),
+            "started": time.time(),
+        })
+        logger.info("Capture journal started: %s", self.journal_path)
+
+    def load(self) -> JournalState:
+        """Read the journal without opening it for writing
+
+        Lines cut short by a crash, and pages whose blob was not fully written, are ignored.
+        """
+        book = {}
+        pages = []
+        captures = 0
+        last_hash = None
+        blob_size = os.path.getsize(self.blob_path) if os.path.exists(self.blob_path) else 0
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as file:
+                for number, line in enumerate(file, start=1):
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning("Ignoring unreadable journal line %s", number)
+                        continue
+                    if entry.get("type") == "book":
+                        book = entry
+                        continue
+                    if entry.get("type") == "page":
+                        if entry["offset"] + entry["length"] > blob_size:
+                            logger.warning("Ignoring journaled page %s, blob incomplete", entry['capture'])
+                            continue
+                        pages.append(entry)
+                    if entry.get("capture", 0) > captures:
+                        captures = entry["capture"]
+                        last_hash = entry.get("hash")
+        except OSError as e:
+            logger.error("Failed to read capture journal: %s", e, exc_info=True)
+            raise RuntimeError(f"Failed to read capture journal: {str(e)}") from e
+        logger.info("Journal loaded: %s pages kept of %s captured", len(pages), captures)
+        return JournalState(book, pages, captures, last_hash)
+
+    def reopen(self) -> JournalState:
+        """Load the journal and continue writing to it"""
+        state = self.load()
+        self.append()
+        return state
+
+    def append(self):
+        """Continue writing to the existing journal"""
+        self.close()
+        self.recorded = 0
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._blob = open(self.blob_path, "ab")
+
+    def record_page(self, capture, digest, encoded, decision="Continue"):
+        """Journal a kept page before it is batched
+
+        Args:
+            capture: Capture number of the frame
+            digest: image_manipulation.page_hash of the frame
+            encoded: pdf_maker.EncodedPage of the frame
+        """
+        with self._lock:
+            offset = self._blob.seek(0, os.SEEK_END)
+            self._blob.write(encoded.data)
+            self._sync(self._blob)
+            self._write_line({
+                "type": "page",
+                "capture": capture,
+                "hash": digest,
+                "offset": offset,
+                "length": len(encoded.data),
+                "size": list(encoded.size),
+                "decision": decision,
+            })
+            self.recorded += 1
+        logger.debug("Journaled page %s at blob offset %s", capture, offset)
+
+    def record_skip(self, capture, digest, decision):
+        """Journal a captured frame that was not kept"""
+        with self._lock:
+            self._write_line({"type": "skip", "capture": capture, "hash": digest, "decision": str(decision)})
+            self.recorded += 1
+        logger.debug("Journaled skipped frame %s (%s)", capture, decision)
+
+    def read_page(self, entry) -> pdf_maker.EncodedPage:
+        """Encoded page for a journaled page line"""
+        with open(self.blob_path, "rb") as blob:
+            blob.seek(entry["offset"])
+            data = blob.read(entry["length"])
+        return pdf_maker.EncodedPage(data, tuple(entry["size"]))
+
+    def close(self):
+        for file in (self._journal, self._blob):
+            if file is not None:
+                file.close()
+        self._journal = None
+        self._blob = None
+
+    def discard(self):
+        """Close and delete the journal, the run finished or the book was deleted"""
+        self.close()
+        for path in (self.journal_path, self.blob_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        logger.info("Capture journal removed")
+
+    def _write_line(self, entry):
+        if self._journal is None:
+            raise RuntimeError("Capture journal is not open")
+        self._journal.write(json.dumps(entry) + "\n")
+        self._sync(self._journal)
+
+    @staticmethod
+    def _sync(file):
+        file.flush()
+        os.fsync(file.fileno())
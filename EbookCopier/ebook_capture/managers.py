@@ -1,14 +1,11 @@
-import sys
 import time
+import asyncio
 import logging
-import keyboard
-import threading
 from threading import Event
 from PIL import ImageGrab, Image
 from utils import pdf_maker
-from ui.popup_windows import MessageBox, ImageWindow
-from ui.popup_windows import DialogResult
-from utils import image_manipulation
+from ui.dialog_result import DialogResult
+from utils import image_manipulation, memory, metrics
 from enum import Enum, auto
 logger = logging.getLogger(__name__)
 
@@ -27,6 +24,21 @@ class Process(Enum):
     def __str__(self):
         return self.name.title()  # "Accept", "Reject", etc.
 
+# -------------------------------------------------------------------
+# Default Prompts
+# -------------------------------------------------------------------
+
+
+def _ask_blank(blank_img):
+    # Qt is only loaded when a dialog is actually shown, headless runs replace the prompts
+    from ui.popup_windows import ImageWindow
+    return ImageWindow.blank(blank_img)
+
+
+def _ask_duplicate(previous_img, current_img):
+    from ui.popup_windows import ImageWindow
+    return ImageWindow.duplicate(previous_img=previous_img, current_img=current_img)
+
 # -------------------------------------------------------------------
 # Helper Classes
 # -------------------------------------------------------------------
@@ -56,16 +68,20 @@ class PDFManager:
         self.max_img = max_img
         self.max_memory = max_memory
         self.batch = []
+        self.batch_bytes = 0
         self.output_pdf = output_pdf
-        logger.debug(f"PDFManager initialized with max_img={max_img}, max_memory={max_memory}MB, output_pdf={output_pdf}")
+        logger.debug("PDFManager initialized with max_img=%s, max_memory=%sMB, output_pdf=%s", max_img, max_memory, output_pdf)
 
     def add_to_batch(self, image, force_save=False):
-        """Add image to batch, optionally forceing save"""
-        if not isinstance(image, Image.Image):
+        """Add image to batch, optionally forceing save. Images are PNG encoded as they are added."""
+        if isinstance(image, Image.Image):
+            image = pdf_maker.encode_image(image)
+        elif not isinstance(image, pdf_maker.EncodedPage):
             raise ValueError("Invalid image type")
 
         self.batch.append(image)
-        logger.debug(f"Image added to batch (current size: {len(self.batch)}/{self.max_img})")
+        self.batch_bytes += len(image.data)
+        logger.debug("Image added to batch (current size: %s/%s)", len(self.batch), self.max_img)
 
         if force_save or self._check_limits():
             return self.save_batch_to_pdf()
@@ -77,35 +93,40 @@ class PDFManager:
             logger.debug("Attempted to save empty batch - skipping")
             return True
         try:
-            logger.info(f"Saving batch of {len(self.batch)} images to PDF")
-            success = pdf_maker.add_image_to_pdf(self.batch, self.output_pdf)
+            logger.info("Saving batch of %s images to PDF", len(self.batch))
+            with memory.flush(len(self.batch)):
+                success = pdf_maker.add_image_to_pdf(self.batch, self.output_pdf)
             if not success:
                 logger.error("PDF maker reported failure")
                 raise RuntimeError("PDF maker failed")
+            saved = len(self.batch)
+            metrics.count("pages_written", saved)
+            metrics.count("batches_saved")
             self.batch.clear()
-            logger.info(f"Successfully saved {len(self.batch)} images to PDF")
+            self.batch_bytes = 0
+            logger.info("Successfully saved %s images to PDF", saved)
             return True
         except Exception as e:
-            logger.error(f"Failed to save PDF batch: {str(e)}", exc_info=True)
+            logger.error("Failed to save PDF batch: %s", e, exc_info=True)
             raise RuntimeError(f"Failed to save PDF batch: {str(e)}") from e
 
     def _check_limits(self):
         current_images = len(self.batch)
         current_memory = self._get_memory_usage()
         if current_images >= self.max_img or current_memory >= self.max_memory:
-            logger.debug(f"Batch limits reached - Images: {current_images}/{self.max_img}, Memory: {current_memory:.2f}/{self.max_memory} MB")
+            logger.debug("Batch limits reached - Images: %s/%s, Memory: %.2f/%s MB", current_images, self.max_img, current_memory, self.max_memory)
             return True
         return False
 
     def finalize(self):
-        logger.info(f"Finalizing PDF with {len(self.batch)} remaining images")
+        logger.info("Finalizing PDF with %s remaining images", len(self.batch))
         if self.batch:
             return self.save_batch_to_pdf()
         logger.debug("No remaining images to finalize")
         return True
 
     def _get_memory_usage(self):
-        return sum(sys.getsizeof(img.tobytes()) for img in self.batch) / (1024 * 1024)  # Convert to MB
+        return self.batch_bytes / (1024 * 1024)  # Convert to MB
 
 # -------------------------------------------------------------------
 # PauseManager
@@ -113,96 +134,137 @@ class PDFManager:
 
 
 class PauseManager():
-    def __init__(self, timer=None):
+    def __init__(self, timer=None, pause_key="esc"):
         self.timer = timer
+        self.pause_key = pause_key
         self.cancel_event = Event()
         self.pause_event = Event()
-        self.listener_thread = None
-        self._running = False
-        logger.debug(f"PauseManager initialized with timer={timer}")
+        self._hook = None
+        self._key_down = False
+        self._loop = None
+        self._async_pause = None
+        # Called with no arguments when paused, returns DialogResult.ACCEPT to cancel the book
+        self.pause_prompt = self._ask_to_cancel
+        logger.debug("PauseManager initialized with timer=%s", timer)
+
+    def attach_loop(self, loop):
+        """Let the keyboard hook wake awaitable waits on this event loop"""
+        self._loop = loop
+        self._async_pause = asyncio.Event()
+        logger.debug("Pause manager attached to event loop")
 
     def start_listener(self):
-        if self._running:
+        """Hook the pause key, the hook sets pause_event the moment it is pressed"""
+        if self._hook is not None:
             logger.debug("Listener already running - ignoring start request")
             return
 
-        self._running = True
-        self.listener_thread = threading.Thread(
-            target=self._keyboard_listener,
-            daemon=True)
-        self.listener_thread.start()
-        logger.info("Keyboard listener thread started (ESC to pause)")
+        try:
+            import keyboard
+            self._hook = keyboard.hook_key(self.pause_key, self._on_pause_key)
+        except Exception as e:
+            logger.error("Error starting keyboard hook: %s", e, exc_info=True)
+            raise RuntimeError(f"Error starting keyboard hook: {str(e)}") from e
+        logger.info("Keyboard hook started (%s to pause)", self.pause_key.upper())
 
     def stop_listener(self):
-        """Stop keyboard listener"""
-        if not self._running:
+        """Remove keyboard hook"""
+        if self._hook is None:
             logger.debug("Stop requested but listener not running")
             return
 
-        self._running = False
-        self.cancel_event.set()
-        if self.listener_thread:
-            logger.debug("Joining listener thread...")
-            self.listener_thread.join(timeout=1)
-            if self.listener_thread.is_alive():
-                logger.warning("Listener thread did not terminate cleanly")
-            else:
-                logger.info("Listener thread stopped successfully")
+        try:
+            import keyboard
+            keyboard.unhook(self._hook)
+            logger.info("Keyboard hook removed")
+        except Exception as e:
+            logger.warning("Keyboard hook did not unhook cleanly: %s", e)
+        self._hook = None
+        self._key_down = False
         self.cancel_event.clear()  # Reset for next run
         logger.debug("Pause manager reset")
 
-    def _keyboard_listener(self):
-        """Background thread looking for pause key"""
-        logger.debug("Keyboard listener thread running")
-        while self._running and not self.cancel_event.is_set():
-            try:
-                if keyboard.is_pressed("esc"):
-                    self.pause_event.set()
-                    logger.info("Pause triggered by ESC key")
-                    # Wait for key release to prevent multi triggers
-                    while keyboard.is_pressed("esc") and self._running:
-                        time.sleep(0.1)
-            except Exception as e:
-                logger.error(f"Error in keyboard listener: {str(e)}", exc_info=True)
-                raise RuntimeError(f"Error in keyboard listener: {str(e)}") from e
+    def _on_pause_key(self, event):
+        """Keyboard hook callback, runs on the keyboard library's thread"""
+        import keyboard
+        if event.event_type == keyboard.KEY_UP:
+            self._key_down = False
+            return
+        # Ignore auto repeat while the key is held to prevent multi triggers
+        if self._key_down:
+            return
+        self._key_down = True
+        self.pause_event.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._async_pause.set)
+        logger.info("Pause triggered by %s key", self.pause_key.upper())
 
-            time.sleep(0.1)
+    def check_for_pause(self, timer=None):
+        """
+        replaces time.sleep with a wait that returns the instant the pause key is pressed.
 
-    def check_for_pause(self, interval=0.1, timer=None):
+        Returns True if the user chose to cancel, False otherwise.
         """
-        replaces time.sleep with a wait that checks for pause event at every interval.
+        if timer is None:
+            timer = self.timer
+        logger.debug("Starting check for pause for %s seconds", timer)
+        deadline = time.monotonic() + timer
+        while self.pause_event.wait(timeout=max(0.0, deadline - time.monotonic())):
+            logger.debug("Pause detected during wait period")
+            if self._handle_pause_request():
+                return True
+            # Short settle once the dialog closes before carrying on
+            deadline = max(deadline, time.monotonic() + 1.0)
+        return False
+
+    async def wait(self, timer=None):
+        """Awaitable check_for_pause, must be awaited on the loop given to attach_loop.
 
+        Returns True if the user chose to cancel, False otherwise.
         """
         if timer is None:
             timer = self.timer
-        logger.debug(f"Starting check for pause for {timer} seconds")
-        end_time = time.time() + timer
-        while time.time() < end_time:
+        deadline = time.monotonic() + timer
+        while True:
+            self._async_pause.clear()
             if self.pause_event.is_set():
                 logger.debug("Pause detected during wait period")
-                return self._handle_pause_request()
-            time.sleep(interval)
-        return False
+                if self._handle_pause_request():
+                    return True
+                # Short settle once the dialog closes before carrying on
+                deadline = max(deadline, time.monotonic() + 1.0)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._async_pause.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
 
     def _handle_pause_request(self):
         """Shows pause dialog and return user's choice"""
         self.pause_event.clear()
         logger.info("Processing pause request - showing dialog")
-        response = MessageBox.question(
-            title="Processing Paused",
-            message="Do you want to stop and cancel the current book?",
-        )
-        logger.info(f"User pause response: {response}")
+        response = self.pause_prompt()
+        logger.info("User pause response: %s", response)
         if response == DialogResult.ACCEPT:
             logger.warning("User requested cancellation")
             self.cancel_event.set()
             return True
 
         logger.info("User chose to continue processing")
-        # small wait for recheck
-        self.check_for_pause(timer=1.0)
         return False
 
+    @staticmethod
+    def _ask_to_cancel():
+        # Qt is only loaded when a dialog is actually shown, headless runs replace the prompts
+        from ui.popup_windows import MessageBox
+        return MessageBox.question(
+            title="Processing Paused",
+            message="Do you want to stop and cancel the current book?",
+        )
+
     def is_cancelled(self):
         """checks if cancellation was requested"""
         cancelled = self.cancel_event.is_set()
@@ -222,24 +284,27 @@ class PauseManager():
 
 
 class ScreenshotManger:
-    def __init__(self, capture_config, pause_manager=None, blank_attempts=2, threshold=0.006, retry_delay=5.0):
+    def __init__(self, capture_config, pause_manager=None, blank_attempts=2, threshold=0.006, retry_delay=5.0,
+                 load_model=None):
         self.capture_config = capture_config
         self.pause_manager = pause_manager
         self.blank_attempts = blank_attempts
         self.threshold = threshold
         self.retry_delay = retry_delay
+        self.load_model = load_model
+        # Called with the blank screenshot, returns DialogResult ACCEPT (keep), RETRY or REJECT (discard)
+        self.blank_prompt = _ask_blank
         self.attempt = 0
         self.current_screenshot = None
         self.previous_screenshot = None
         logger.info(
-            f"ScreenshotManager initialized with blank_attempts={blank_attempts}, "
-            f"threshold={threshold}, retry_delay={retry_delay}, "
-            f"monitor_config={capture_config}"
+            "ScreenshotManager initialized with blank_attempts=%s, threshold=%s, retry_delay=%s, monitor_config=%s",
+            blank_attempts, threshold, retry_delay, capture_config
         )
 
     def capture_valid_screenshot(self, end_of_book_mode=False):
         """Main Method to capture screenshot"""
-        logger.debug(f"Starting screenshot capture (end_of_book_mode={end_of_book_mode})")
+        logger.debug("Starting screenshot capture (end_of_book_mode=%s)", end_of_book_mode)
         while True:
             result = self._attempt_capture(end_of_book_mode=end_of_book_mode)
             if result == Process.VALID:
@@ -250,9 +315,17 @@ class ScreenshotManger:
                 return Process.CANCELLED
             elif result == Process.BLANK:
                 if self.attempt >= self.blank_attempts:
-                    logger.warning(f"Max blank attempts reached ({self.blank_attempts})")
+                    logger.warning("Max blank attempts reached (%s)", self.blank_attempts)
                     return self._handle_max_blank_attempts()
-                logger.debug(f"Blank screenshot detected (attempt {self.attempt}/{self.blank_attempts})")
+                logger.debug("Blank screenshot detected (attempt %s/%s)", self.attempt, self.blank_attempts)
+                if self.load_model is not None:
+                    # Page may still be loading, give it another learned wait and re-measure next page
+                    self.load_model.mark_slow()
+                    with metrics.timed("retry_sleep"):
+                        cancelled = self._wait_before_retry()
+                    if cancelled:
+                        logger.warning("Screenshot capture cancelled while waiting to retry")
+                        return Process.CANCELLED
 
     def _attempt_capture(self, end_of_book_mode=False):
         """Attempts a single screenshot capture with pause checking"""
@@ -264,18 +337,20 @@ class ScreenshotManger:
                 return Process.CANCELLED
             # HACK: Setting threshold to 0 for end of book, so if the book ends on a blank page, we dont 2 popups in a row
             threshold = 0.000 if end_of_book_mode else self.threshold
-            logger.debug(f"Checking for blank screenshot (threshold={threshold})")
+            logger.debug("Checking for blank screenshot (threshold=%s)", threshold)
 
-            if not image_manipulation.is_blank(self.current_screenshot, threshold):
+            with metrics.timed("is_blank"):
+                blank = image_manipulation.is_blank(self.current_screenshot, threshold)
+            if not blank:
                 logger.debug("Screenshot is valid")
                 self.attempt = 0
                 return Process.VALID
             self.attempt += 1
-            logger.warning(f"Blank screenshot detected (attempt {self.attempt})")
+            logger.warning("Blank screenshot detected (attempt %s)", self.attempt)
             return Process.BLANK
 
         except Exception as e:
-            logger.error(f"Screenshot attempt failed: {str(e)}", exc_info=True)
+            logger.error("Screenshot attempt failed: %s", e, exc_info=True)
             self.attempt += 1
             return Process.BLANK
 
@@ -283,25 +358,45 @@ class ScreenshotManger:
         """Takes a screenshot, with a maximum rety value of max_retries"""
         for attempt in range(max_retries + 1):
             try:
-                logger.debug(f"Taking screenshot (attempt {attempt + 1}/{max_retries + 1})")
-                screenshot = ImageGrab.grab(
-                    bbox=self.capture_config.bbox,
-                    all_screens=self.capture_config.multi_monitor)
+                logger.debug("Taking screenshot (attempt %s/%s)", attempt + 1, max_retries + 1)
+                with metrics.timed("screenshot"):
+                    screenshot = ImageGrab.grab(
+                        bbox=self.capture_config.bbox,
+                        all_screens=self.capture_config.multi_monitor)
 
                 if screenshot.size == (0, 0):
                     logger.error("Empty screenshot captured (0x0 pixels)")
                     raise ValueError("Empty screenshot captured")
 
-                logger.debug(f"Screenshot captured successfully: {screenshot.size} pixels")
+                logger.debug("Screenshot captured successfully: %s pixels", screenshot.size)
                 return screenshot
 
             except Exception as e:
                 if attempt == max_retries:
-                    logger.critical(f"Failed after {max_retries} retries: {str(e)}")
+                    logger.critical("Failed after %s retries: %s", max_retries, e)
                     raise RuntimeError(f"Max attempts reached for taking a screenshot: {str(e)}")
 
-                logger.warning(f"Screenshot attempt {attempt + 1} failed: {str(e)}")
-                time.sleep(self.retry_delay)
+                logger.warning("Screenshot attempt %s failed: %s", attempt + 1, e)
+                with metrics.timed("retry_sleep"):
+                    time.sleep(self._get_retry_delay())
+
+    def _wait_before_retry(self):
+        """Wait the retry delay, ended early by the pause key. Returns True if the user cancelled"""
+        delay = self._get_retry_delay()
+        if self.pause_manager is None:
+            time.sleep(delay)
+            return False
+        return self.pause_manager.is_cancelled() or self.pause_manager.check_for_pause(timer=delay)
+
+    def _get_retry_delay(self):
+        """Learned page load wait if available, otherwise the fixed retry delay"""
+        if self.load_model is not None:
+            return self.load_model.next_wait()
+        return self.retry_delay
+
+    def grab(self) -> Image.Image:
+        """Single screenshot of the capture area, without blank checks"""
+        return self._take_screenshot()
 
     def _handle_max_blank_attempts(self):
         """Handles the case when maximum blank screenshot attempts are reached.
@@ -320,8 +415,8 @@ class ScreenshotManger:
     """
         # TODO: Do I want a popup for again, telling them to fix the page??
         logger.info("Showing blank screenshot dialog to user")
-        response = ImageWindow.blank(self.current_screenshot)
-        logger.info(f"User response to blank screenshot: {response}")
+        response = self.blank_prompt(self.current_screenshot)
+        logger.info("User response to blank screenshot: %s", response)
 
         self._pause_check()
         if response == DialogResult.ACCEPT:
@@ -336,7 +431,8 @@ class ScreenshotManger:
             logger.info("User discarded blank screenshot")
             return Process.DISCARD
 
-    def _pause_check(self, timer=1.0):
+    def _pause_check(self, timer=0.0):
+        """Handle a pending pause, page load waits are done by the caller"""
         if self.pause_manager:
             logger.debug("Checking for pause state")
             return self.pause_manager.check_for_pause(timer=timer)
@@ -361,8 +457,13 @@ class PageProcessor:
         self.pause_manager = pause_manager
         self.pdf_manager = pdf_manager
         self.end_of_book = False
+        # Pages in the PDF once every kept page is written, including any it had before the run
+        self.pages_kept = 0
+        # Called as duplicate_prompt(previous_img=, current_img=), returns DialogResult ACCEPT (keep),
+        # REJECT (discard) or TERMINATE (end book)
+        self.duplicate_prompt = _ask_duplicate
         logger.info(
-            f"PageProcessor initialized with end_of_book={self.end_of_book}")
+            "PageProcessor initialized with end_of_book=%s", self.end_of_book)
 
     def process_page(self, end_of_book_mode: bool = False) -> Process:
         """Captures and processes a single page screenshot for PDF generation.
@@ -392,7 +493,7 @@ class PageProcessor:
             - Sets end_of_book flag when appropriate
         """
         try:
-            logger.info(f"Starting page processing (end_of_book_mode={end_of_book_mode})")
+            logger.info("Starting page processing (end_of_book_mode=%s)", end_of_book_mode)
 
             # Capture screenshot
             logger.debug("Initiating screenshot capture")
@@ -407,27 +508,44 @@ class PageProcessor:
 
             logger.info("Screenshot validation successful")
             # Process Screenshot
-            should_process = self._evaluate_screenshot(screenshot, end_of_book_mode)
-            logger.debug(f"Screenshot evaluation result: {should_process}")
+            should_process = self.analyse_page(screenshot, end_of_book_mode)
 
             if should_process == Process.CONTINUE:
                 logger.debug("Adding valid screenshot to PDF batch")
                 self.pdf_manager.add_to_batch(screenshot)
-                self.screenshot_manager.add_previous_screenshot(screenshot)
-                logger.debug("Updated previous screenshot reference")
-
-            if should_process == Process.END:
-                logger.info("End of book detected")
-                self.end_of_book = True
 
             completion_status = self._determine_completion_status()
-            logger.info(f"Processing complete, status: {completion_status}")
+            logger.info("Processing complete, status: %s", completion_status)
             return completion_status
 
         except Exception as e:
-            logger.critical(f"Page processing failed: {str(e)}", exc_info=True)
+            logger.critical("Page processing failed: %s", e, exc_info=True)
             raise RuntimeError(f"Page processing failed: {str(e)}") from e
 
+    def analyse_page(self, screenshot: Image.Image, end_of_book_mode: bool = False) -> Process:
+        """Duplicate/end of book decision for a captured screenshot, without writing it.
+
+        Returns:
+            Process: CONTINUE if the screenshot should be written, DONT_CONTINUE or END otherwise
+
+        Side Effects:
+            - Updates screenshot_manager's previous screenshot reference on CONTINUE
+            - Sets end_of_book flag on END
+        """
+        with metrics.timed("analyse_page"):
+            should_process = self._evaluate_screenshot(screenshot, end_of_book_mode)
+        logger.debug("Screenshot evaluation result: %s", should_process)
+
+        if should_process == Process.CONTINUE:
+            self.screenshot_manager.add_previous_screenshot(screenshot)
+            self.pages_kept += 1
+            logger.debug("Updated previous screenshot reference")
+
+        if should_process == Process.END:
+            logger.info("End of book detected")
+            self.end_of_book = True
+        return should_process
+
     def _evaluate_screenshot(self, screenshot: Image.Image, end_of_book_mode: bool) -> Process:
         """Evaluates whether a screenshot should be processed or considered a duplicate.
 
@@ -457,7 +575,7 @@ class PageProcessor:
 
         logger.debug("Checking for duplicate screenshot")
         is_duplicate = self._is_image_duplicate(screenshot, prev)
-        logger.info(f"Duplicate check result: {is_duplicate}")
+        logger.info("Duplicate check result: %s", is_duplicate)
 
         # If True and end of book, a duplicate means we are done, dont ask for user input
         # Applies to capture._process_remaining_pages()
@@ -484,12 +602,12 @@ class PageProcessor:
     def _determine_completion_status(self):
         """Determins if book processing is done or should continue on to a new page"""
         status = Process.END if self.end_of_book else Process.NEXT
-        logger.debug(f"Determined completion status: {status}")
+        logger.debug("Determined completion status: %s", status)
         return status
 
     def _pause_check(self, timer=1.0):
         """Checks for pause state during wait period."""
-        logger.debug(f"Checking for pause state (timeout={timer})")
+        logger.debug("Checking for pause state (timeout=%s)", timer)
         return self.pause_manager.check_for_pause(timer=timer)
 
     def cleanup(self):
@@ -502,11 +620,12 @@ class PageProcessor:
         """Compares current screenshot with previous one."""
         logger.debug("Performing image comparison for duplicates")
         try:
-            result = image_manipulation.compare_images(screenshot, previous_screenshot)
-            logger.debug(f"Image comparison result: {result}")
+            with metrics.timed("compare_images"):
+                result = image_manipulation.compare_images(screenshot, previous_screenshot)
+            logger.debug("Image comparison result: %s", result)
             return result
         except Exception as e:
-            logger.error(f"Image comparison failed: {str(e)}", exc_info=True)
+            logger.error("Image comparison failed: %s", e, exc_info=True)
             raise
 
     def _handle_duplicate(self, screenshot: Image.Image, previous_screenshot: Image.Image) -> Process:
@@ -532,8 +651,8 @@ class PageProcessor:
         """
         logger.info("Presenting duplicate screenshot dialog to user")
         try:
-            response = ImageWindow.duplicate(previous_img=previous_screenshot, current_img=screenshot)
-            logger.info(f"User response to duplicate: {response}")
+            response = self.duplicate_prompt(previous_img=previous_screenshot, current_img=screenshot)
+            logger.info("User response to duplicate: %s", response)
 
             self._pause_check()
 
@@ -547,11 +666,11 @@ class PageProcessor:
                 logger.info("User chose to end book processing")
                 return Process.END
             else:
-                logger.error(f"Invalid dialog response received: {response}")
+                logger.error("Invalid dialog response received: %s", response)
                 raise RuntimeError(f"Unknown duplicate response: {response}")
 
         except Exception as e:
-            logger.error(f"Duplicate handling failed: {str(e)}", exc_info=True)
+            logger.error("Duplicate handling failed: %s", e, exc_info=True)
             raise
 
     # def set_end_of_book(self, value):
@@ -0,0 +1,111 @@
+import time
+from abc import ABC, abstractmethod
+import logging
+logger = logging.getLogger(__name__)
+
+
+"""Drivers For Turning The Page In The Reader"""
+# Every driver reports the time.monotonic() timestamp the page turn was delivered at,
+# so the capture loop can time its wait from delivery instead of from a guessed offset.
+
+
+class NavigationDriver(ABC):
+    """Base class for page turning drivers"""
+    name = "base"
+
+    @abstractmethod
+    def next_page(self) -> float:
+        """Turn to the next page.
+
+        Returns:
+            float: time.monotonic() timestamp of when the action was delivered
+        """
+
+    def close(self):
+        """Release anything the driver is holding"""
+        logger.debug("Navigation driver closed: %s", self.name)
+
+
+class KeyboardDriver(NavigationDriver):
+    """Sends a global key press, the original way of turning pages. Edge must have focus."""
+    name = "keyboard"
+
+    def __init__(self, key="right"):
+        self.key = key
+        logger.debug("KeyboardDriver initialized with key=%s", key)
+
+    def next_page(self):
+        import keyboard
+        keyboard.press_and_release(self.key)
+        delivered = time.monotonic()
+        logger.debug("Key '%s' sent", self.key)
+        return delivered
+
+
+class WindowMessageDriver(NavigationDriver):
+    """Posts key messages straight to the Edge window, does not depend on keyboard focus"""
+    name = "window_message"
+    WM_KEYDOWN = 0x0100
+    WM_KEYUP = 0x0101
+    VK_RIGHT = 0x27
+
+    def __init__(self, hwnd_provider=None, virtual_key=VK_RIGHT):
+        # hwnd_provider returns the window handle to post to, looked up on every page in case Edge was recreated
+        if hwnd_provider is None:
+            from utils import browser
+            hwnd_provider = browser.get_edge_window
+        self.hwnd_provider = hwnd_provider
+        self.virtual_key = virtual_key
+        logger.debug("WindowMessageDriver initialized with virtual_key=%#x", virtual_key)
+
+    def next_page(self):
+        import win32api
+        import win32gui
+        hwnd = self.hwnd_provider()
+        if not hwnd:
+            raise RuntimeError("Edge window not found for page navigation")
+
+        # lParam: repeat count 1, hardware scan code, extended key flag (arrow keys)
+        scan_code = win32api.MapVirtualKey(self.virtual_key, 0)
+        key_down = 1 | (scan_code << 16) | (1 << 24)
+        key_up = key_down | (1 << 30) | (1 << 31)
+        win32gui.PostMessage(hwnd, self.WM_KEYDOWN, self.virtual_key, key_down)
+        win32gui.PostMessage(hwnd, self.WM_KEYUP, self.virtual_key, key_up)
+        delivered = time.monotonic()
+        logger.debug("Key message posted to hwnd %s", hwnd)
+        return delivered
+
+
+class SimulatedDriver(NavigationDriver):
+    """Turns the page of a stand-in reader, any object with a next_page() method
+
+    Only for tests and benchmarks, which build it with their reader, so it is not one of the DRIVERS.
+    """
+    name = "simulated"
+
+    def __init__(self, reader):
+        self.reader = reader
+        logger.debug("SimulatedDriver initialized with reader=%s", reader)
+
+    def next_page(self):
+        self.reader.next_page()
+        return time.monotonic()
+
+
+# Drivers settings.navigation_driver can name
+DRIVERS = {
+    KeyboardDriver.name: KeyboardDriver,
+    WindowMessageDriver.name: WindowMessageDriver,
+}
+DEFAULT_DRIVER = KeyboardDriver.name
+
+
+def create_driver(name, **kwargs):
+    """Create a navigation driver by its settings name"""
+    try:
+        driver_class = DRIVERS[name]
+    except KeyError:
+        logger.error("Unknown navigation driver: %s", name)
+        raise ValueError(f"Unknown navigation driver: {name}")
+    logger.info("Using navigation driver: %s", name)
+    return driver_class(**kwargs)
@@ -0,0 +1,295 @@
+import time
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from ebook_capture.managers import PageProcessor, PauseManager, Process
+from ui.dialog_result import DialogResult
+from utils import image_manipulation, memory, metrics, pdf_maker, trace
+logger = logging.getLogger(__name__)
+
+
+"""Asyncio Orchestration Of The Capture Run"""
+# Stage 1, capture loop: capture (grab + blank checks) -> navigate -> await the next page
+# Stage 2, analysis task: duplicate / end of book decision against the previous kept page
+# Stage 3, writer task: PNG encode and batch save through PDFManager
+# Blocking work runs on one single thread executor per stage, so each manager is only ever used from one
+# thread at a time. Waits and pause/cancel are awaitables on the event loop, and dialogs asked for by the
+# executors are run back on the loop thread, which is the thread that owns the UI.
+# Before each capture the loop awaits the previous page's decision, so duplicate dialogs, end of book
+# and cancellation behave exactly like the one page at a time loop.
+# With a CaptureJournal, every analysed frame is journaled (kept pages by the writer, before batching)
+# so a crashed run can be resumed.
+
+
+class _Frame:
+    """Captured screenshot travelling through the stages"""
+    def __init__(self, index, screenshot, end_of_book_mode):
+        self.index = index
+        self.screenshot = screenshot
+        self.end_of_book_mode = end_of_book_mode
+        self.digest = None
+
+
+class CaptureOrchestrator:
+    _STOP = object()
+
+    def __init__(self, processor: PageProcessor, pause_manager: PauseManager, navigate, queue_size=2, journal=None,
+                 progress=None):
+        """
+        Args:
+            processor: PageProcessor whose screenshot, duplicate and pdf managers the stages use
+            pause_manager: PauseManager providing the awaitable pause/cancel waits
+            navigate: Coroutine function navigate(executor) turning to the next page and awaiting its load
+            queue_size: Maximum frames waiting in front of each stage
+            journal: Optional CaptureJournal every analysed frame is recorded to
+            progress: Optional callable progress(captured, kept), called on the loop after each analysed frame
+        """
+        self.processor = processor
+        self.pause_manager = pause_manager
+        self.navigate = navigate
+        self.queue_size = queue_size
+        self.journal = journal
+        self.progress = progress
+        # Frames captured over every run, carries on from the journal when resuming
+        self.captured = 0
+        self.capture_executor = None
+        self._analysis_executor = None
+        self._write_executor = None
+        self._analysis_queue = None
+        self._write_queue = None
+        self._tasks = []
+        self._error = None
+        self._closing = False
+        self._loop = None
+        self._loop_thread = None
+        self._prompts = {}
+        logger.debug("CaptureOrchestrator initialized with queue_size=%s", queue_size)
+
+    async def start(self):
+        if self._tasks:
+            logger.debug("Orchestrator already running - ignoring start request")
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self.pause_manager.attach_loop(self._loop)
+
+        self.capture_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+        self._analysis_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+        self._analysis_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._write_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._bridge_prompts()
+
+        self._tasks = [
+            asyncio.create_task(self._analysis_task(), name="analysis"),
+            asyncio.create_task(self._write_task(), name="writer"),
+        ]
+        logger.info("Capture orchestrator started")
+
+    async def stop(self):
+        """Finish frames already captured, then stop the stages"""
+        if not self._tasks:
+            return
+        try:
+            if self._error is None:
+                await self._wait_for_analysis()
+        finally:
+            # Any decision still outstanding is answered without a dialog from here on
+            self._closing = True
+            await self._analysis_queue.put(self._STOP)
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+            for executor in (self.capture_executor, self._analysis_executor, self._write_executor):
+                executor.shutdown(wait=True)
+            self._restore_prompts()
+            self._closing = False
+            logger.info("Capture orchestrator stopped")
+        self._raise_stage_error()
+
+    async def run(self, should_cancel, pages=None, end_of_book_mode=False) -> Process:
+        """Capture pages until pages is reached, end of book is decided, or the run is cancelled.
+
+        Args:
+            should_cancel: Coroutine function returning True if the run should stop
+            pages: Number of pages to capture, None to run until end of book
+            end_of_book_mode: Duplicates end the book instead of asking the user
+
+        Returns:
+            Process: COMPLETED or CANCELLED
+        """
+        page = 0
+        last_capture = None
+        while pages is None or page < pages:
+            await self._wait_for_analysis()
+            if self.processor.end_of_book:
+                logger.info("End of book decided by analysis stage")
+                return Process.COMPLETED
+
+            if await should_cancel():
+                logger.warning("Cancellation detected at page %s", page)
+                return Process.CANCELLED
+
+            page += 1
+            self.captured += 1
+            logger.debug("Capturing page %s/%s", page, pages if pages is not None else '?')
+            now = time.perf_counter()
+            if last_capture is not None:
+                # Whole page cycle: capture, page turn and load wait
+                metrics.record("page", now - last_capture)
+            last_capture = now
+            with trace.span("page", page=self.captured):
+                with metrics.timed("capture"):
+                    screenshot = await self._loop.run_in_executor(
+                        self.capture_executor,
+                        lambda: self.processor.screenshot_manager.capture_valid_screenshot(end_of_book_mode=end_of_book_mode))
+                if screenshot == Process.CANCELLED:
+                    logger.warning("Processing cancelled during screenshot capture")
+                    return Process.CANCELLED
+
+                if screenshot == Process.DISCARD:
+                    logger.info("Screenshot discarded by user")
+                else:
+                    self._raise_stage_error()
+                    await self._analysis_queue.put(_Frame(self.captured, screenshot, end_of_book_mode))
+                    logger.debug("Page %s submitted for analysis", page)
+                if memory.is_enabled():
+                    memory.sample_page(self.captured, self._held_frames())
+
+                with metrics.timed("navigate"):
+                    await self.navigate(self.capture_executor)
+
+        await self._wait_for_analysis()
+        logger.info("Capture loop finished %s pages", page)
+        return Process.COMPLETED
+
+    # ---------------------------------------------------------------
+    # Stages
+    # ---------------------------------------------------------------
+
+    def queue_depths(self):
+        """Frames waiting in front of each stage, for progress displays"""
+        if self._analysis_queue is None:
+            return {}
+        return {"analysis": self._analysis_queue.qsize(), "write": self._write_queue.qsize()}
+
+    async def _wait_for_analysis(self):
+        """Waits until every submitted frame has a decision"""
+        await self._analysis_queue.join()
+        self._raise_stage_error()
+
+    async def _analysis_task(self):
+        logger.debug("Analysis task running")
+        while True:
+            frame = await self._analysis_queue.get()
+            try:
+                if frame is self._STOP:
+                    await self._write_queue.put(self._STOP)
+                    return
+                if self.processor.end_of_book:
+                    # Frames captured after the end was decided are not part of the book
+                    logger.debug("Dropping page %s captured after end of book", frame.index)
+                    continue
+                decision = await self._loop.run_in_executor(self._analysis_executor, self._analyse, frame)
+                logger.debug("Page %s analysis result: %s", frame.index, decision)
+                if decision == Process.CONTINUE:
+                    await self._write_queue.put(frame)
+                if self.progress is not None:
+                    self.progress(frame.index, self.processor.pages_kept)
+            except Exception as e:
+                logger.error("Analysis of page %s failed: %s", frame.index, e, exc_info=True)
+                self._error = self._error or e
+            finally:
+                self._analysis_queue.task_done()
+
+    async def _write_task(self):
+        logger.debug("Writer task running")
+        while True:
+            frame = await self._write_queue.get()
+            if frame is self._STOP:
+                return
+            if self._error is not None:
+                # Keep draining so the analysis stage never blocks on a full queue
+                continue
+            try:
+                await self._loop.run_in_executor(self._write_executor, self._write, frame)
+                logger.debug("Page %s written to batch", frame.index)
+            except Exception as e:
+                logger.error("Writing page %s failed: %s", frame.index, e, exc_info=True)
+                self._error = self._error or e
+
+    def _analyse(self, frame):
+        """Analysis executor: decision for a frame, journaled if the frame is not kept"""
+        with trace.span("analysis", page=frame.index):
+            if self.journal is not None:
+                with metrics.timed("page_hash"):
+                    frame.digest = image_manipulation.page_hash(frame.screenshot)
+            decision = self.processor.analyse_page(frame.screenshot, frame.end_of_book_mode)
+            if self.journal is not None and decision != Process.CONTINUE:
+                self.journal.record_skip(frame.index, frame.digest, decision)
+            return decision
+
+    def _write(self, frame):
+        """Writer executor: encode, journal, then batch a kept frame"""
+        with trace.span("write", page=frame.index):
+            encoded = pdf_maker.encode_image(frame.screenshot)
+            if self.journal is not None:
+                with metrics.timed("journal_write"):
+                    self.journal.record_page(frame.index, frame.digest, encoded)
+            self.processor.pdf_manager.add_to_batch(encoded)
+
+    def _held_frames(self):
+        """Screenshots and encoded pages the managers are holding on to, for memory.account"""
+        screenshot_manager = self.processor.screenshot_manager
+        return {
+            "pdf_batch": list(self.processor.pdf_manager.batch),
+            "screenshots": [screenshot_manager.current_screenshot, screenshot_manager.previous_screenshot],
+        }
+
+    def _raise_stage_error(self):
+        if self._error is not None:
+            error = self._error
+            logger.critical("Capture stage failed: %s", error)
+            raise RuntimeError(f"Capture stage failed: {str(error)}") from error
+
+    # ---------------------------------------------------------------
+    # Dialogs
+    # ---------------------------------------------------------------
+
+    def _bridge_prompts(self):
+        """Route the managers' dialogs through the event loop thread"""
+        screenshot_manager = self.processor.screenshot_manager
+        self._prompts = {
+            "blank": screenshot_manager.blank_prompt,
+            "duplicate": self.processor.duplicate_prompt,
+            "pause": self.pause_manager.pause_prompt,
+        }
+        screenshot_manager.blank_prompt = self._on_loop(self._prompts["blank"], name="blank")
+        self.processor.duplicate_prompt = self._on_loop(self._prompts["duplicate"], closing=DialogResult.REJECT,
+                                                        name="duplicate")
+        self.pause_manager.pause_prompt = self._on_loop(self._prompts["pause"], name="pause")
+
+    def _restore_prompts(self):
+        self.processor.screenshot_manager.blank_prompt = self._prompts["blank"]
+        self.processor.duplicate_prompt = self._prompts["duplicate"]
+        self.pause_manager.pause_prompt = self._prompts["pause"]
+
+    def _on_loop(self, prompt, closing=None, name="dialog"):
+        """Wrap a dialog so calls from executor threads run it on the event loop thread.
+
+        closing: Answer given without a dialog once the orchestrator is stopping, None to still ask
+        name: Which dialog, for the trace span covering the wait for its answer
+        """
+        async def ask(args, kwargs):
+            return prompt(*args, **kwargs)
+
+        def call(*args, **kwargs):
+            if self._closing and closing is not None:
+                logger.warning("Orchestrator stopping - answering %s without asking", closing)
+                return closing
+            # Traced on the thread that waits for the answer, which is blocked for as long as the dialog is open
+            with trace.span("dialog_wait", dialog=name):
+                if threading.get_ident() == self._loop_thread:
+                    return prompt(*args, **kwargs)
+                return asyncio.run_coroutine_threadsafe(ask(args, kwargs), self._loop).result()
+        return call
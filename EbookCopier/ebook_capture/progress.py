@@ -0,0 +1,71 @@
+import time
+from collections import deque
+from utils import metrics
+import logging
+logger = logging.getLogger(__name__)
+
+
+"""Run Progress For The Overlay"""
+# RunProgress is the orchestrator's progress callback, it only appends to a short window of recent pages on
+# the event loop. snapshot() turns that window, the orchestrator's queues and the latest stage timings into
+# what the progress overlay shows, and is only called by the overlay's own refresh task.
+
+# Pages the rate and ETA are worked out over, long enough to smooth out page load waits
+RATE_WINDOW = 30
+# Stages shown with their last timing, in pipeline order
+SHOWN_STAGES = ("page_load_wait", "capture", "analyse_page", "encode_png", "pdf_save")
+
+
+class RunProgress:
+    def __init__(self, book_length, forward=None, window=RATE_WINDOW):
+        """
+        Args:
+            book_length: Pages the user declared, what the ETA counts down to
+            forward: Optional progress(captured, kept) callable also given every update
+            window: Pages the rolling rate is measured over
+        """
+        self.book_length = int(book_length)
+        self.forward = forward
+        self.captured = 0
+        self.kept = 0
+        self.started = time.monotonic()
+        # (time, captured, kept) of the last window pages
+        self._recent = deque(maxlen=window)
+
+    def __call__(self, captured, kept):
+        self.captured = captured
+        self.kept = kept
+        self._recent.append((time.monotonic(), captured, kept))
+        if self.forward is not None:
+            self.forward(captured, kept)
+
+    def rate(self):
+        """(kept pages per minute, captured pages per second) over the rolling window, (0.0, 0.0) until known"""
+        if len(self._recent) < 2:
+            return 0.0, 0.0
+        (first, captured_first, kept_first), (last, captured_last, kept_last) = self._recent[0], self._recent[-1]
+        elapsed = last - first
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (kept_last - kept_first) / elapsed * 60, (captured_last - captured_first) / elapsed
+
+    def snapshot(self, orchestrator=None):
+        """What the overlay shows
+
+        Returns:
+            dict: {"kept", "captured", "book_length", "pages_per_min", "eta_s" (None until known),
+                "elapsed_s", "queues": {stage: frames waiting}, "stages": {stage: last ms}}
+        """
+        pages_per_min, captures_per_sec = self.rate()
+        remaining = max(0, self.book_length - self.captured)
+        latest = metrics.latest()
+        return {
+            "kept": self.kept,
+            "captured": self.captured,
+            "book_length": self.book_length,
+            "pages_per_min": pages_per_min,
+            "eta_s": remaining / captures_per_sec if captures_per_sec else None,
+            "elapsed_s": time.monotonic() - self.started,
+            "queues": orchestrator.queue_depths() if orchestrator is not None else {},
+            "stages": {stage: latest[stage] * 1000 for stage in SHOWN_STAGES if stage in latest},
+        }
@@ -0,0 +1,147 @@
+import os
+import json
+import shutil
+import threading
+import logging
+from pathlib import Path
+from PIL import Image
+from ui.dialog_result import DialogResult
+from utils import image_manipulation, pdf_maker
+logger = logging.getLogger(__name__)
+
+
+"""Deferred Review Of Suspicious Pages"""
+# With the "defer" review policy a blank or duplicate page no longer holds the run on a dialog. The page,
+# the kept page before it and its position in the PDF are saved to <pdf>.review/, the configured default
+# action is applied and capture carries on. After the run the user goes through the items, and pages whose
+# decision changed are removed from or inserted into the PDF in place.
+
+ASK = "ask"
+DEFER = "defer"
+KEEP = "keep"
+DISCARD = "discard"
+BLANK = "blank"
+DUPLICATE = "duplicate"
+
+
+class ReviewQueue:
+    def __init__(self, pdf_path, blank_action=KEEP, duplicate_action=DISCARD):
+        """
+        Args:
+            pdf_path: PDF the reviewed pages belong to
+            blank_action: KEEP or DISCARD, applied to blank pages during the run
+            duplicate_action: KEEP or DISCARD, applied to duplicate pages during the run
+        """
+        self.pdf_path = pdf_path
+        self.review_dir = Path(f"{pdf_path}.review")
+        self.manifest_path = self.review_dir / "review.json"
+        self.blank_action = blank_action
+        self.duplicate_action = duplicate_action
+        self.processor = None
+        self.items = []
+        self._lock = threading.Lock()
+        self._load()
+        logger.debug("ReviewQueue initialized with blank_action=%s, duplicate_action=%s, items=%s",
+                     blank_action, duplicate_action, len(self.items))
+
+    @staticmethod
+    def exists(pdf_path):
+        """True if a run left pages to review for this PDF"""
+        return (Path(f"{pdf_path}.review") / "review.json").exists()
+
+    def attach(self, processor):
+        """Answer processor's blank and duplicate prompts with the default actions, recording each one"""
+        self.processor = processor
+        processor.screenshot_manager.blank_prompt = self._on_blank
+        processor.duplicate_prompt = self._on_duplicate
+        logger.info("Deferred review attached, blank and duplicate pages will not prompt")
+
+    def _on_blank(self, blank_img):
+        previous = self.processor.screenshot_manager.get_previous_screenshot()
+        self._record(BLANK, blank_img, previous, self.blank_action)
+        return DialogResult.ACCEPT if self.blank_action == KEEP else DialogResult.REJECT
+
+    def _on_duplicate(self, previous_img, current_img):
+        self._record(DUPLICATE, current_img, previous_img, self.duplicate_action)
+        return DialogResult.ACCEPT if self.duplicate_action == KEEP else DialogResult.REJECT
+
+    def _record(self, kind, image, previous, action):
+        """Save a suspicious page and the decision made for it"""
+        with self._lock:
+            item_id = len(self.items) + 1
+            self.review_dir.mkdir(parents=True, exist_ok=True)
+            item = {
+                "id": item_id,
+                "kind": kind,
+                # Position the page has in the PDF if kept, or would have had if discarded
+                "page": self.processor.pages_kept,
+                "action": action,
+                "hash": image_manipulation.page_hash(image),
+                "image": f"{item_id:05d}_{kind}.png",
+                "previous": f"{item_id:05d}_previous.png" if previous is not None else None,
+            }
+            image.save(self.review_dir / item["image"], format="PNG")
+            if previous is not None:
+                previous.save(self.review_dir / item["previous"], format="PNG")
+            self.items.append(item)
+            self._save()
+        logger.info("Deferred %s page at PDF page %s, applied %s", kind, item['page'] + 1, action)
+
+    def load_images(self, item):
+        """(page image, previous kept page image or None) for an item"""
+        image = Image.open(self.review_dir / item["image"])
+        previous = Image.open(self.review_dir / item["previous"]) if item["previous"] else None
+        return image, previous
+
+    def apply(self, decisions):
+        """Patch the PDF where the user's decision differs from the action applied during the run
+
+        Args:
+            decisions: {item id: KEEP or DISCARD}, items missing keep their applied action
+
+        Returns:
+            int: Number of pages changed
+        """
+        edits = []
+        # Later pages first, so earlier positions are unchanged by each edit
+        for item in sorted(self.items, key=lambda i: (i["page"], i["id"]), reverse=True):
+            decision = decisions.get(item["id"], item["action"])
+            if decision == item["action"]:
+                continue
+            if decision == DISCARD:
+                edits.append(("delete", item["page"], item["hash"]))
+            else:
+                image, _ = self.load_images(item)
+                edits.append(("insert", item["page"], image))
+        if not edits:
+            logger.info("Review made no changes")
+            return 0
+        try:
+            changed = pdf_maker.edit_pages(self.pdf_path, edits)
+        except Exception as e:
+            logger.error("Failed to patch reviewed pages: %s", e, exc_info=True)
+            raise RuntimeError(f"Failed to patch reviewed pages: {str(e)}") from e
+        logger.info("Review changed %s pages of %s", changed, self.pdf_path)
+        return changed
+
+    def clear(self):
+        """Remove the saved review items"""
+        self.items = []
+        shutil.rmtree(self.review_dir, ignore_errors=True)
+        logger.debug("Review queue cleared")
+
+    def _load(self):
+        if not self.manifest_path.exists():
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.items = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Failed to read review queue: %s", e, exc_info=True)
+            raise RuntimeError(f"Failed to read review queue: {str(e)}") from e
+
+    def _save(self):
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.items, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
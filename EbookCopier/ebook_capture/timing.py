@@ -0,0 +1,139 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from utils import image_manipulation, metrics
+logger = logging.getLogger(__name__)
+
+
+"""Page Load Timing Learned Per Site And Page View"""
+# The user's timer is only the ceiling. Normal waits come from the measured time between a page turn
+# being delivered and the reader showing a stable frame, kept as a short rolling window so it follows
+# the site when it slows down or speeds up during a run.
+
+
+class PageLoadModel:
+    """Rolling distribution of page turn -> stable frame latencies for one site and page view"""
+
+    def __init__(self, ceiling, samples=None, window=30, margin=0.25, floor=0.1, min_samples=5, probe_every=5):
+        self.ceiling = float(ceiling)
+        self.margin = margin
+        self.floor = floor
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self.samples = deque((float(s) for s in samples or []), maxlen=window)
+        self._pages_since_probe = 0
+        self._force_probe = False
+        logger.debug("PageLoadModel initialized with ceiling=%s, samples=%s", ceiling, len(self.samples))
+
+    def record(self, latency):
+        """Add a measured latency in seconds"""
+        self.samples.append(float(latency))
+        self._pages_since_probe = 0
+        self._force_probe = False
+        logger.debug("Page load latency recorded: %.3fs, next wait: %.3fs", latency, self.next_wait())
+
+    def percentile(self, pct):
+        """Percentile of the current window as the run report works it out, None if there are no samples"""
+        if not self.samples:
+            return None
+        return metrics.percentile(sorted(self.samples), pct)
+
+    def next_wait(self):
+        """Seconds to wait after a page turn, p95 plus a margin, never more than the ceiling"""
+        if len(self.samples) < self.min_samples:
+            return self.ceiling
+        return min(self.ceiling, max(self.floor, self.percentile(95) + self.margin))
+
+    def should_probe(self):
+        """True if the next page should be measured instead of waited out"""
+        self._pages_since_probe += 1
+        return (self._force_probe
+                or len(self.samples) < self.min_samples
+                or self._pages_since_probe >= self.probe_every)
+
+    def mark_slow(self):
+        """A page was not ready after the learned wait, measure the next one"""
+        self._force_probe = True
+        logger.debug("Page load marked slow, probing next page")
+
+    def to_list(self):
+        """Compact form for saving to settings"""
+        return [round(sample, 3) for sample in self.samples]
+
+
+class StableFrameDetector:
+    """Finds the first frame of the new page that holds still for one poll"""
+
+    def __init__(self, before, delivered):
+        """
+        Args:
+            before: Frame on screen before the page turn, None if unknown
+            delivered: time.monotonic() timestamp the page turn was delivered at
+        """
+        self.before = before
+        self.delivered = delivered
+        self._last_frame = None
+        self._last_grabbed = None
+
+    def feed(self, frame, grabbed):
+        """Add a polled frame grabbed at time.monotonic() grabbed.
+
+        Returns:
+            float | None: Seconds from delivery to the first frame of the stable pair, None if not stable yet
+        """
+        if self.before is not None and image_manipulation.compare_images(frame, self.before):
+            # Page has not turned yet
+            self._last_frame = None
+            return None
+        if self._last_frame is not None and image_manipulation.compare_images(frame, self._last_frame):
+            return self._last_grabbed - self.delivered
+        self._last_frame, self._last_grabbed = frame, grabbed
+        return None
+
+
+class PageLoadTimer:
+    """Waits for a page to load after a page turn, using and training a PageLoadModel"""
+
+    def __init__(self, model: PageLoadModel, screenshot_manager, pause_manager, poll_interval=0.1):
+        self.model = model
+        self.screenshot_manager = screenshot_manager
+        self.pause_manager = pause_manager
+        self.poll_interval = poll_interval
+
+    async def wait(self, delivered, executor=None):
+        """Wait for the page turned at delivered (time.monotonic()). Returns True if cancelled during the wait
+
+        executor: Executor used for the screenshot grabs and comparisons while probing
+        """
+        if self.model.should_probe():
+            latency = await self._probe(delivered, executor)
+            if latency is not None:
+                self.model.record(latency)
+            return self.pause_manager.is_cancelled()
+
+        remaining = self.model.next_wait() - (time.monotonic() - delivered)
+        return await self.pause_manager.wait(timer=max(0.0, remaining))
+
+    async def _probe(self, delivered, executor):
+        """Polls the capture area until the new page holds still, returns the latency or None"""
+        loop = asyncio.get_running_loop()
+        detector = StableFrameDetector(self.screenshot_manager.current_screenshot, delivered)
+        ceiling = self.model.ceiling
+        while True:
+            elapsed = time.monotonic() - delivered
+            if elapsed >= ceiling:
+                logger.debug("No stable frame within ceiling (%ss)", ceiling)
+                return None
+            if await self.pause_manager.wait(timer=min(self.poll_interval, ceiling - elapsed)):
+                return None
+
+            frame, grabbed = await loop.run_in_executor(executor, self._timed_grab)
+            latency = await loop.run_in_executor(executor, detector.feed, frame, grabbed)
+            if latency is not None:
+                self.screenshot_manager.current_screenshot = frame
+                return latency
+
+    def _timed_grab(self):
+        frame = self.screenshot_manager.grab()
+        return frame, time.monotonic()
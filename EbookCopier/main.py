@@ -2,18 +2,22 @@ from utils.logs import setup_logging
 import logging
 import os
 import time
-from utils import browser
+from utils import browser, pdf_maker
 from ui.popup_windows import DialogResult
-from ui.popup_windows import MessageBox, continuation
+from ui.popup_windows import MessageBox, ImageWindow, continuation
 from ui.help import cont_message
 from ui.main_ui import BookCopierUI
-from ui.rectangle_drawer import RectangleEditor
-from ebook_capture import capture_ebook
+import ebook_capture
+from ebook_capture import CaptureJournal, ReviewQueue, review
 from settings.config import UserSettings
+from settings import jobs
 from PySide6.QtWidgets import QApplication, QDialog
 from ui.styles import pyside_themes
 logger = logging.getLogger(__name__)
 
+# Seconds given to a queued book's url to open before the browser is prepared
+QUEUE_OPEN_WAIT = 10
+
 # TODO: Proper checking of user response, proper user response values(enums)
 # TODO: Edit Book Length After Continuation
 # TODO: Do I want to overwrite the file if it exists, when user choses a file path?
@@ -32,17 +36,25 @@ logger = logging.getLogger(__name__)
 
 class BookCopier:
     """Validates/gathers user inputs, prepares enviroment, handles the starting and finishing of the automated capture proocess."""
-    def __init__(self, main_window, settings):
+    def __init__(self, main_window, settings, job_queue=None):
         self.main_window = main_window
         self.settings = settings
+        self.job_queue = job_queue if job_queue is not None else jobs.JobQueue()
         self.overlay = None
         self.book = None
+        # None for a new book, "journal" to resume from a capture journal, "pdf" to continue a partial pdf
+        self.resume_mode = None
+        self.resume_page = 0
 
     def start(self, book_param):
         if not self._validate_inputs(book_param):
             return
         self.book = book_param
+        self.resume_mode = None
+        self.resume_page = 0
         try:
+            if not self._check_unfinished_run():
+                return
             if not self._prepare_browser_enviroment():
                 return
             self.book.monitor_display = browser.get_edge_display_number()
@@ -51,15 +63,17 @@ class BookCopier:
             if not self._confirm_continuation():
                 return
             # Lets user ensure on they are on starting page, and double check page count
+            start_page = "PAGE ONE" if self.resume_mode is None else f"the LAST CAPTURED PAGE ({self.resume_page})"
             user_check_length = MessageBox.information(title="Check Webpage",
-                                                       message=f"Make sure the book is on PAGE ONE, and that {book_param.book_length} is the correct length of the book while in FN+F11 MODE!",
+                                                       message=f"Make sure the book is on {start_page}, and that {book_param.book_length} is the correct length of the book while in FN+F11 MODE!",
                                                        button_options=[
                                                            {"text": "Continue", "return": DialogResult.ACCEPT},
                                                            {"text": "Cancel", "return": DialogResult.REJECT}])
             if user_check_length != DialogResult.ACCEPT:
                 return
 
-            if not self._process_capture_box():
+            # A resumed run keeps the capture box it was journaled with
+            if self.resume_mode != "journal" and not self._process_capture_box():
                 return
             # Withdraw main ui window, and begin book processing
             self.main_window.hide_window()
@@ -85,6 +99,80 @@ class BookCopier:
             # Restore/Reset
             self.main_window.restore_window()
 
+    def add_to_queue(self, book_param):
+        """Validate a book and its capture box now, so the queue can run it later without asking"""
+        if not self._validate_inputs(book_param):
+            return
+        self.book = book_param
+        try:
+            if not self._prepare_browser_enviroment():
+                return
+            self.book.monitor_display = browser.get_edge_display_number()
+            if not self._process_capture_box():
+                return
+            self.job_queue.add(self.book)
+            self.main_window.set_queue_count(len(self.job_queue.pending()))
+            MessageBox.information("Book Queued", f"{self.book.file_path}\nAdded to the queue")
+            self._reset_application()
+        except Exception as e:
+            logger.error(f"Failed to queue book: {str(e)}")
+            MessageBox.error("Queue Error", f"Unable to queue book\nError: {str(e)}")
+        finally:
+            self.main_window.restore_window()
+
+    def run_queue(self):
+        """Capture every pending book back to back, without the between book dialogs"""
+        pending = self.job_queue.pending()
+        if not pending:
+            MessageBox.information("Queue Empty", "Add books to the queue before running it.")
+            return
+        logger.info(f"Running queue of {len(pending)} books")
+        self.main_window.hide_window()
+        try:
+            for job in pending:
+                if self._run_job(job) == jobs.CANCELLED:
+                    logger.info("Queue stopped by user")
+                    break
+        finally:
+            self.main_window.set_queue_count(len(self.job_queue.pending()))
+            self.main_window.restore_window()
+
+        report = self.job_queue.write_report()
+        counts = {}
+        for entry in report:
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        summary = ", ".join(f"{count} {status}" for status, count in counts.items())
+        MessageBox.information("Queue Finished", f"{summary}\nReport saved to:\n{self.job_queue.report_path}")
+        # Pages deferred during the unattended run are reviewed now that someone is back
+        for job in pending:
+            self._review_deferred_pages(job.file_path)
+
+    def _run_job(self, job):
+        """Run one queued book, returns the status it finished with"""
+        book = job.to_book()
+        self.job_queue.mark_running(job)
+        logger.info(f"Queue starting {book.file_path}")
+        try:
+            if book.url:
+                browser.open_in_edge(book.url)
+                time.sleep(QUEUE_OPEN_WAIT)
+            if not browser.activate_edge_window() or not browser.enter_fullscreen_if_needed():
+                raise RuntimeError("Microsoft Edge not ready")
+            # A job interrupted in an earlier queue run carries on from its journal
+            # Nobody is there to answer blank/duplicate dialogs, those pages are reviewed after the queue
+            if CaptureJournal.exists(book.file_path):
+                finished_book = ebook_capture.resume_ebook(book, self.settings, review_policy=review.DEFER)
+            else:
+                finished_book = ebook_capture.capture_ebook(book, self.settings, review_policy=review.DEFER)
+            status = jobs.COMPLETED if finished_book else jobs.CANCELLED
+            self.job_queue.mark_finished(job, status, pages=pdf_maker.page_count(book.file_path))
+        except Exception as e:
+            logger.error(f"Queued book failed: {str(e)}", exc_info=True)
+            status = jobs.FAILED
+            self.job_queue.mark_finished(job, status, pages=pdf_maker.page_count(book.file_path), error=str(e))
+        logger.info(f"Queue finished {book.file_path}: {status} in {job.duration:.0f}s")
+        return status
+
     def _validate_inputs(self, book):
         """Validate user inputs"""
 
@@ -118,6 +206,58 @@ class BookCopier:
                 MessageBox.information(title, message)
             return False
 
+    def _check_unfinished_run(self):
+        """Offer to resume if an earlier run of this file left a capture journal, or to continue the pdf"""
+        if not CaptureJournal.exists(self.book.file_path):
+            return self._check_partial_pdf()
+        journal = CaptureJournal(self.book.file_path)
+        state = journal.load()
+        response = MessageBox.question(title="Unfinished Book",
+                                       message=f"An unfinished capture of this file stopped after page {state.captures}.\n"
+                                               f"Resume it, or start over and replace the unfinished PDF?",
+                                       button_options=[
+                                           {"text": "Resume", "return": DialogResult.ACCEPT},
+                                           {"text": "Start Over", "return": DialogResult.DELETE},
+                                           {"text": "Cancel", "return": DialogResult.REJECT}])
+        if response == DialogResult.ACCEPT:
+            self.resume_mode = "journal"
+            self.resume_page = state.captures
+            self.book.capture_box = state.book.get("capture_box")
+            logger.info(f"Resuming unfinished book after page {state.captures}")
+            return True
+        if response == DialogResult.DELETE:
+            journal.discard()
+            try:
+                os.remove(self.book.file_path)
+            except FileNotFoundError:
+                pass
+            logger.info("Unfinished book removed, starting over")
+            return True
+        return False
+
+    def _check_partial_pdf(self):
+        """Offer to continue a pdf kept from an earlier cancelled run"""
+        pages = pdf_maker.page_count(self.book.file_path)
+        if pages == 0:
+            return True
+        response = MessageBox.question(title="Existing PDF",
+                                       message=f"{self.book.file_path} already has {pages} pages.\n"
+                                               f"Continue the book after its last page, or replace it?",
+                                       button_options=[
+                                           {"text": "Continue", "return": DialogResult.ACCEPT},
+                                           {"text": "Replace", "return": DialogResult.DELETE},
+                                           {"text": "Cancel", "return": DialogResult.REJECT}])
+        if response == DialogResult.ACCEPT:
+            self.resume_mode = "pdf"
+            self.resume_page = pages
+            logger.info(f"Continuing existing pdf after page {pages}")
+            return True
+        if response == DialogResult.DELETE:
+            os.remove(self.book.file_path)
+            logger.info("Existing pdf removed, starting over")
+            return True
+        return False
+
     def _prepare_browser_enviroment(self):
         """Check and Setup browser"""
         logger.info("Activate Edge")
@@ -153,6 +293,7 @@ class BookCopier:
     def _process_capture_box(self):
         # TODO: consider adding a raise to popup if failure
         """Sets/saves selection area of screen"""
+        from ui.rectangle_drawer import RectangleEditor
         starting_bounding_box = self._get_saved_bounding_box()
         logger.debug(f"Rectangle Editors starting bounding box: {starting_bounding_box}")
         rect_drawer = RectangleEditor(coords=starting_bounding_box, monitor_num=self.book.monitor_display)
@@ -183,10 +324,42 @@ class BookCopier:
         # TODO: Add a else raise?
         if self.book.capture_box:
             logger.info("Ebook capture started..")
-            recorded_book = capture_ebook(self.book, self.settings)
+            if self.resume_mode == "journal":
+                recorded_book = ebook_capture.resume_ebook(self.book, self.settings)
+            elif self.resume_mode == "pdf":
+                recorded_book = ebook_capture.continue_ebook(self.book, self.settings)
+            else:
+                recorded_book = ebook_capture.capture_ebook(self.book, self.settings)
             logger.info(f"recorded book: {recorded_book}")
             return recorded_book
 
+    def _review_deferred_pages(self, file_path):
+        """Let the user go through the pages deferred during a run, and patch the PDF with their choices"""
+        if not ReviewQueue.exists(file_path):
+            return
+        review_queue = ReviewQueue(file_path)
+        items = review_queue.items
+        decisions = {}
+        for number, item in enumerate(items, start=1):
+            page_img, previous_img = review_queue.load_images(item)
+            response = ImageWindow.review(page_img, previous_img, kind=item["kind"],
+                                          position=f"{number} of {len(items)} - {file_path}", applied=item["action"])
+            if response == DialogResult.ACCEPT:
+                decisions[item["id"]] = review.KEEP
+            elif response == DialogResult.REJECT:
+                decisions[item["id"]] = review.DISCARD
+            else:
+                logger.info(f"Accepting remaining {len(items) - number + 1} review items as applied")
+                break
+        try:
+            changed = review_queue.apply(decisions)
+            review_queue.clear()
+            if changed:
+                MessageBox.information("Review Applied", f"{changed} pages changed in:\n{file_path}")
+        except RuntimeError as e:
+            logger.error(f"Review failed: {str(e)}")
+            MessageBox.error("Review Failed", f"Unable to update the PDF, review items kept\nError: {str(e)}")
+
     def _handle_cancelled_book(self):
         """Handles capture process being cancelled"""
         logger.info("Run cancelled")
@@ -196,6 +369,8 @@ class BookCopier:
                                                   {"text": "Delete", "return": DialogResult.ACCEPT},
                                                   {"text": "Keep", "return": DialogResult.REJECT}])
         if delete_response == DialogResult.ACCEPT:
+            CaptureJournal(self.book.file_path).discard()
+            ReviewQueue(self.book.file_path).clear()
             try:
                 os.remove(self.book.file_path)
             except FileNotFoundError:
@@ -210,6 +385,7 @@ class BookCopier:
 
     def _handle_completed_book(self):
         """handle capture process successfully completing"""
+        self._review_deferred_pages(self.book.file_path)
         MessageBox.information("Finished", f"PDF saved too:\n{self.book.file_path}")
 
         completed_path = os.path.dirname(self.book.file_path)
@@ -274,6 +450,8 @@ if __name__ == "__main__":
     book_copier = BookCopier(main_window, user_settings)
     # set start button command
     main_window.set_start_command(book_copier.start)
+    main_window.set_queue_commands(book_copier.add_to_queue, book_copier.run_queue)
+    main_window.set_queue_count(len(book_copier.job_queue.pending()))
     # show main window
     main_window.show()
     app.exec()
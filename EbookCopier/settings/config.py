@@ -1,12 +1,34 @@
+import os
+import copy
+import atexit
 import tomllib
 import tomli_w
+import threading
 from pathlib import Path
+from ebook_capture.navigation import DRIVERS, DEFAULT_DRIVER
 import logging
 logger = logging.getLogger(__name__)
 
 """Book/User Settings"""
-# TODO:
-# After popuplate settings, add a check to see if any settings were missing, and save if so.
+# config.toml is only written when the settings differ from what was last read or saved, so missing settings
+# are added once and an untouched config is never rewritten. A save copies the settings on the thread asking
+# for it, the one that changed them. The copies are coalesced on a short timer and the latest is written off
+# the UI thread, to a temp file that replaces config.toml, a crash mid-write leaves the old file.
+
+# Seconds a save waits for further changes before writing
+SAVE_DELAY = 0.5
+
+
+def write_atomic(path, data: bytes):
+    """Write data to a temp file next to path, then replace path with it. A crash mid-write leaves the old file"""
+    path = Path(path)
+    temp_path = path.with_name(f"{path.name}.tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
 
 
 class Book:
@@ -18,6 +40,7 @@ class Book:
         self.page_view = None
         self.capture_box = None
         self.monitor_display = None
+        self.url = ""
 
     def clear_values(self):
         self.file_path = None
@@ -27,6 +50,7 @@ class Book:
         self.page_view = None
         self.capture_box = None
         self.monitor_display = None
+        self.url = ""
 
     def validate(self):
         if not self.file_path:
@@ -46,10 +70,21 @@ class Book:
 
 
 class UserSettings:
-    def __init__(self, path=None):
-        """Read settings from config.toml if exists, if not create it with defualt settings"""
+    def __init__(self, path=None, save_delay=SAVE_DELAY):
+        """Read settings from config.toml if exists, if not create it with defualt settings
+
+        Args:
+            path: config.toml to use, defaults to settings/config.toml
+            save_delay: Seconds save_user_settings waits to coalesce changes, 0 writes immediately
+        """
 
         self.settings_path = Path(path if path is not None else "settings/config.toml")
+        self.save_delay = save_delay
+        self._saved_config = None
+        self._save_timer = None
+        # Settings copied by the last save_user_settings, waiting for the timer
+        self._pending_config = None
+        self._lock = threading.RLock()
         self.info = True
         self.debug = True
         self.console_logging = False
@@ -62,8 +97,23 @@ class UserSettings:
         self.saved_capture_boxes = {}
         self.thresholds = {"Libby": 0.006, "Hoopla": 0.006}
         self.last_save_dir = ""
+        self.navigation_driver = DEFAULT_DRIVER
+        self.collect_metrics = False
+        self.collect_trace = False
+        self.collect_memory = False
+        self.profiling = False
+        self.progress_overlay = True
+        self.page_load_samples = {}
+        self.review_policy = "ask"
+        self.review_blank_action = "keep"
+        self.review_duplicate_action = "discard"
+        self.update_check_interval = 24
+        self.update_cache = {}
         self.__populate_settings()
-        self.save_user_settings()
+        # Adds any settings missing from config.toml, nothing is written if none are
+        self.flush()
+        # Settings changed since the last save are written before the app exits
+        atexit.register(self._save_later, False)
 
     def __safe_get(self, config, *keys, default=None):
         for key in keys:
@@ -77,16 +127,15 @@ class UserSettings:
         output_path = self.settings_path.resolve()
 
         if not output_path.exists():
+            # Written with the default settings once populated
             logger.info("No config.toml")
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            output_path.touch()
-
-            # Initialize with defualt content
-            self.save_user_settings()
-            logger.info("config.toml created with default settings")
+            return {}
 
         with open(output_path, "rb") as f:
-            return tomllib.load(f)
+            config = tomllib.load(f)
+        # Settings keep references into config, the snapshot must not change with them
+        self._saved_config = copy.deepcopy(config)
+        return config
 
     def __populate_settings(self):
         config = self.__read_user_settings()
@@ -101,6 +150,22 @@ class UserSettings:
         self.thresholds = self.__safe_get(config, "settings", "threshold", default={"Libby": 0.006, "Hoopla": 0.006})
         self.auto_update = self.__safe_get(config, "settings", "auto_update", default=True)
         self.last_save_dir = self.__safe_get(config, "settings", "last_save_dir", default="")
+        self.navigation_driver = self.__safe_get(config, "settings", "navigation_driver", default=DEFAULT_DRIVER)
+        if self.navigation_driver not in DRIVERS:
+            logger.warning("Unknown navigation driver %r in config.toml, using %s",
+                           self.navigation_driver, DEFAULT_DRIVER)
+            self.navigation_driver = DEFAULT_DRIVER
+        self.collect_metrics = self.__safe_get(config, "settings", "collect_metrics", default=False)
+        self.collect_trace = self.__safe_get(config, "settings", "collect_trace", default=False)
+        self.collect_memory = self.__safe_get(config, "settings", "collect_memory", default=False)
+        self.profiling = self.__safe_get(config, "settings", "profiling", default=False)
+        self.progress_overlay = self.__safe_get(config, "settings", "progress_overlay", default=True)
+        self.page_load_samples = self.__safe_get(config, "page_load", default={})
+        self.review_policy = self.__safe_get(config, "review", "policy", default="ask")
+        self.review_blank_action = self.__safe_get(config, "review", "blank_action", default="keep")
+        self.review_duplicate_action = self.__safe_get(config, "review", "duplicate_action", default="discard")
+        self.update_check_interval = self.__safe_get(config, "update", "check_interval_hours", default=24)
+        self.update_cache = self.__safe_get(config, "update", "cache", default={})
         for site in self.websites:
             site_config = self.__safe_get(config, site, default={})
             if not site_config:  # Skip if site doesnt exist in config
@@ -122,7 +187,67 @@ class UserSettings:
                     }
 
     def save_user_settings(self):
-        config = {
+        """Schedule a save, changes made within save_delay of each other are written together
+
+        The settings are copied now, the timer thread never reads them while they may be half changed.
+        """
+        if not self.save_delay:
+            self.flush()
+            return
+        with self._lock:
+            self._pending_config = copy.deepcopy(self._build_config())
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.save_delay, self._save_later)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_later(self, pending=True):
+        try:
+            self.flush(pending=pending)
+        except RuntimeError:
+            pass  # Logged by flush, the next save tries again
+
+    def flush(self, pending=False):
+        """Write config.toml now if the settings changed since it was last read or saved
+
+        Args:
+            pending: Write the copy taken by save_user_settings instead of the current settings, nothing if
+                there is none
+
+        Returns:
+            bool: True if config.toml was written
+        """
+        with self._lock:
+            if pending and self._pending_config is None:
+                return False
+            snapshot = self._pending_config if pending else self._build_config()
+            # The current settings include any pending copy
+            self._pending_config = None
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            text = tomli_w.dumps(snapshot)
+            # Parsed back so the snapshot compares equal to config.toml as read, and shares no tables
+            config = tomllib.loads(text)
+            saved = self._saved_config or {}
+            changed = sorted(key for key in config.keys() | saved.keys() if config.get(key) != saved.get(key))
+            if self._saved_config is not None and not changed:
+                logger.debug("Settings unchanged, config.toml not written")
+                return False
+            data = b"# Main application settings\n" + text.encode("utf-8")
+
+            try:
+                write_atomic(self.settings_path.resolve(), data)
+            except OSError as e:
+                logger.error(f"Failed to save config.toml: {str(e)}", exc_info=True)
+                raise RuntimeError(f"Failed to save config.toml: {str(e)}") from e
+            self._saved_config = config
+            logger.info(f"Saving to config.toml, changed: {', '.join(changed)}")
+            return True
+
+    def _build_config(self):
+        return {
             "settings": {
                 "auto_update": self.auto_update,
                 "picture_format": self.picture_format,
@@ -130,25 +255,39 @@ class UserSettings:
                 "max_images": self.max_images,
                 "max_memory_mb": self.max_memory_mb,
                 "threshold": self.thresholds,
-                "last_save_dir": self.last_save_dir},
+                "last_save_dir": self.last_save_dir,
+                "navigation_driver": self.navigation_driver,
+                "collect_metrics": self.collect_metrics,
+                "collect_trace": self.collect_trace,
+                "collect_memory": self.collect_memory,
+                "profiling": self.profiling,
+                "progress_overlay": self.progress_overlay},
             "logging": {
                 "info": self.info,
                 "debug": self.debug,
                 "console_logging": self.console_logging,
                 "console_level": self.console_level},
+            "page_load": self.page_load_samples,
+            "review": {
+                "policy": self.review_policy,
+                "blank_action": self.review_blank_action,
+                "duplicate_action": self.review_duplicate_action},
+            "update": {
+                "check_interval_hours": self.update_check_interval,
+                "cache": self.update_cache},
             **self.saved_capture_boxes}
 
-        output_path = self.settings_path.resolve()
-
-        with open(output_path, "wb") as f:
-            f.write(b"# Main application settings\n")
-            tomli_w.dump(config, f)
-            logger.info("Saving to config.toml")
-
     def update_saved_capture_box(self, site, page, my_dict):
         # Update Bounding Box For Current Site Based On Monitor, And Page View.
         box = my_dict.copy()
         box.pop("monitor", None)
         monitor = str(my_dict["monitor"])
-        self.saved_capture_boxes.setdefault(site, {}).setdefault(monitor, {}).setdefault(page, {}).update(box)
+        with self._lock:
+            self.saved_capture_boxes.setdefault(site, {}).setdefault(monitor, {}).setdefault(page, {}).update(box)
+        self.save_user_settings()
+
+    def update_page_load_samples(self, site, page_view, samples):
+        # Learned page turn -> stable frame latencies, per site and page view
+        with self._lock:
+            self.page_load_samples.setdefault(site, {})[page_view] = list(samples)
         self.save_user_settings()
@@ -0,0 +1,148 @@
+import json
+import time
+import tomllib
+import tomli_w
+from pathlib import Path
+from settings.config import Book, write_atomic
+import logging
+logger = logging.getLogger(__name__)
+
+"""Persistent Queue Of Books To Capture Back To Back"""
+# Each job holds everything a run needs without asking: site, page view, length, timer, output path,
+# capture box and an optional url to open the book. Status and timings are saved after every change,
+# so a queue interrupted overnight carries on with the jobs it had not finished. The queue and its report are
+# written to a temp file that replaces them, a crash mid-save leaves the previous version.
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+
+class BookJob:
+    def __init__(self, file_path, selected_site, page_view, book_length, timer, capture_box, url=""):
+        self.file_path = file_path
+        self.selected_site = selected_site
+        self.page_view = page_view
+        self.book_length = int(book_length)
+        self.timer = int(timer)
+        self.capture_box = capture_box
+        self.url = url or ""
+        self.status = PENDING
+        self.started = 0.0
+        self.finished = 0.0
+        self.pages = 0
+        self.error = ""
+
+    @classmethod
+    def from_book(cls, book):
+        return cls(book.file_path, book.selected_site, book.page_view, book.book_length, book.timer,
+                   dict(book.capture_box), getattr(book, "url", ""))
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data["file_path"], data["selected_site"], data["page_view"], data["book_length"],
+                  data["timer"], data["capture_box"], data.get("url", ""))
+        job.status = data.get("status", PENDING)
+        job.started = data.get("started", 0.0)
+        job.finished = data.get("finished", 0.0)
+        job.pages = data.get("pages", 0)
+        job.error = data.get("error", "")
+        return job
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def to_book(self) -> Book:
+        book = Book()
+        book.file_path = self.file_path
+        book.selected_site = self.selected_site
+        book.page_view = self.page_view
+        book.book_length = str(self.book_length)
+        book.timer = str(self.timer)
+        book.capture_box = dict(self.capture_box)
+        book.monitor_display = self.capture_box.get("monitor")
+        book.url = self.url
+        return book
+
+    @property
+    def duration(self):
+        if not self.started:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobQueue:
+    def __init__(self, path=None):
+        self.path = Path(path if path is not None else "settings/jobs.toml")
+        self.report_path = self.path.with_name(f"{self.path.stem}_report.json")
+        self.jobs = []
+        self.load()
+
+    def load(self):
+        if not self.path.exists():
+            self.jobs = []
+            return
+        try:
+            with open(self.path, "rb") as f:
+                config = tomllib.load(f)
+            self.jobs = [BookJob.from_dict(data) for data in config.get("job", [])]
+            logger.info("Loaded %s queued books", len(self.jobs))
+        except (tomllib.TOMLDecodeError, KeyError, ValueError) as e:
+            logger.error("Failed to read job queue: %s", e, exc_info=True)
+            raise RuntimeError(f"Failed to read job queue: {str(e)}") from e
+
+    def save(self):
+        text = tomli_w.dumps({"job": [job.to_dict() for job in self.jobs]})
+        write_atomic(self.path, b"# Books queued for unattended capture\n" + text.encode("utf-8"))
+        logger.debug("Saved %s queued books", len(self.jobs))
+
+    def add(self, book):
+        """Queue a validated book with its capture box"""
+        if not book.capture_box:
+            raise ValueError("Book has no capture box")
+        job = BookJob.from_book(book)
+        self.jobs.append(job)
+        self.save()
+        logger.info("Queued %s (%s pending)", job.file_path, len(self.pending()))
+        return job
+
+    def pending(self):
+        """Jobs still to run. A job left running was interrupted and runs again"""
+        return [job for job in self.jobs if job.status in (PENDING, RUNNING)]
+
+    def clear_finished(self):
+        self.jobs = [job for job in self.jobs if job.status in (PENDING, RUNNING)]
+        self.save()
+
+    def mark_running(self, job):
+        job.status = RUNNING
+        job.started = time.time()
+        job.finished = 0.0
+        job.error = ""
+        self.save()
+
+    def mark_finished(self, job, status, pages=0, error=""):
+        job.status = status
+        job.finished = time.time()
+        job.pages = pages
+        job.error = error
+        self.save()
+        self.write_report()
+
+    def write_report(self):
+        """Per book status and timing report, next to the queue file"""
+        report = [{
+            "file_path": job.file_path,
+            "site": job.selected_site,
+            "status": job.status,
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job.started)) if job.started else "",
+            "duration_s": round(job.duration, 1),
+            "pages": job.pages,
+            "pages_per_min": round(job.pages / job.duration * 60, 1) if job.pages and job.duration else 0.0,
+            "error": job.error,
+        } for job in self.jobs]
+        write_atomic(self.report_path, json.dumps(report, indent=2).encode("utf-8"))
+        logger.debug("Queue report written to %s", self.report_path)
+        return report
@@ -0,0 +1,3 @@
+"""Unit Tests"""
+# Run from the EbookCopier folder:
+#   python -m unittest discover -s tests -t .
@@ -0,0 +1,77 @@
+import tomllib
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from settings.config import UserSettings
+
+
+"""User Settings Tests"""
+
+
+class TestNavigationDriverSetting(unittest.TestCase):
+    def settings_with(self, text):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        path = Path(folder.name) / "config.toml"
+        path.write_text(text, encoding="utf-8")
+        return UserSettings(path=path, save_delay=0)
+
+    def test_known_driver_is_kept(self):
+        settings = self.settings_with('[settings]\nnavigation_driver = "window_message"\n')
+        self.assertEqual(settings.navigation_driver, "window_message")
+
+    def test_unknown_driver_falls_back_to_keyboard(self):
+        for name in ("simulated", "telepathy"):
+            with self.subTest(name=name), self.assertLogs("settings.config", "WARNING"):
+                settings = self.settings_with(f'[settings]\nnavigation_driver = "{name}"\n')
+            self.assertEqual(settings.navigation_driver, "keyboard")
+
+
+class TestDebouncedSave(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = Path(folder.name) / "config.toml"
+        self.settings = UserSettings(path=self.path, save_delay=0.05)
+        self.addCleanup(self.settings.flush)
+
+    def saved(self):
+        with open(self.path, "rb") as f:
+            return tomllib.load(f)
+
+    def wait_for_timer(self):
+        timer = self.settings._save_timer
+        if timer is not None:
+            timer.join(5)
+
+    def test_settings_are_copied_on_the_calling_thread(self):
+        build_threads = []
+        build_config = self.settings._build_config
+
+        def recording_build():
+            build_threads.append(threading.current_thread())
+            return build_config()
+
+        self.settings._build_config = recording_build
+        self.settings.last_save_dir = "first"
+        self.settings.save_user_settings()
+        self.settings.last_save_dir = "second"
+        self.settings.save_user_settings()
+        self.wait_for_timer()
+        self.assertEqual(build_threads, [threading.main_thread()] * 2)
+        self.assertEqual(self.saved()["settings"]["last_save_dir"], "second")
+
+    def test_change_after_the_save_waits_for_the_next_one(self):
+        self.settings.last_save_dir = "saved"
+        self.settings.save_user_settings()
+        # Changed without asking for a save, the timer writes the copy it was given
+        self.settings.last_save_dir = "unsaved"
+        self.wait_for_timer()
+        self.assertEqual(self.saved()["settings"]["last_save_dir"], "saved")
+        self.assertTrue(self.settings.flush())
+        self.assertEqual(self.saved()["settings"]["last_save_dir"], "unsaved")
+
+
+if __name__ == "__main__":
+    unittest.main()
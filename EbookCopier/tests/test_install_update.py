@@ -0,0 +1,62 @@
+import sys
+import threading
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from update import install_update
+from update.install_update import CURRENT_POINTER, PREVIOUS_POINTER, VERSIONS_DIR
+
+
+"""Staged Install Tests"""
+
+
+class TestCollectOldVersions(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.root = Path(folder.name)
+        for version in ("1.4.0", "1.4.1", "1.4.2", "_staging-1"):
+            (self.root / VERSIONS_DIR / version / "EbookCopier").mkdir(parents=True)
+        install_update.write_pointer(self.root, CURRENT_POINTER, "1.4.2")
+        install_update.write_pointer(self.root, PREVIOUS_POINTER, "1.4.1")
+
+    @unittest.skipIf(sys.version_info < (3, 12), "shutil.rmtree onexc needs Python 3.12")
+    def test_keeps_current_and_previous(self):
+        install_update.collect_old_versions(self.root)
+        remaining = sorted(folder.name for folder in (self.root / VERSIONS_DIR).iterdir())
+        self.assertEqual(remaining, ["1.4.1", "1.4.2"])
+
+    def test_runs_after_the_restart_without_holding_it(self):
+        events = []
+        release = threading.Event()
+
+        def restart(bat_path):
+            events.append("restart")
+            return True
+
+        def slow_collect(root):
+            release.wait(5)
+            events.append("collected")
+
+        argv = ["install_update.py", "-p", str(self.root / "Ebook-1.4.2.zip"),
+                "-r", str(self.root / "EbookCopier.bat")]
+        with mock.patch.object(sys, "argv", argv), \
+                mock.patch.object(install_update, "install_version", return_value=True), \
+                mock.patch.object(install_update, "restart_main", side_effect=restart), \
+                mock.patch.object(install_update, "collect_old_versions", side_effect=slow_collect), \
+                mock.patch.object(install_update.time, "sleep"):
+            with self.assertRaises(SystemExit) as exit_code:
+                install_update.main()
+            # main is done while the cleanup is still running
+            self.assertEqual(events, ["restart"])
+            cleanup = next(thread for thread in threading.enumerate() if thread.name == "collect_old_versions")
+            self.assertFalse(cleanup.daemon)
+            release.set()
+            cleanup.join(5)
+        self.assertEqual(exit_code.exception.code, 0)
+        self.assertEqual(events, ["restart", "collected"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from settings import jobs
+from settings.config import Book
+
+
+"""Job Queue Tests"""
+
+
+def make_book(folder, name):
+    book = Book()
+    book.file_path = os.path.join(folder, f"{name}.pdf")
+    book.selected_site = "Libby"
+    book.page_view = "single"
+    book.book_length = "120"
+    book.timer = "2"
+    book.capture_box = {"x1": 0, "y1": 0, "x2": 10, "y2": 10, "monitor": 1}
+    return book
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = Path(folder.name)
+        self.queue = jobs.JobQueue(self.folder / "jobs.toml")
+
+    def test_saved_queue_loads_back(self):
+        job = self.queue.add(make_book(self.folder, "first"))
+        self.queue.add(make_book(self.folder, "second"))
+        self.queue.mark_running(job)
+
+        loaded = jobs.JobQueue(self.folder / "jobs.toml")
+        self.assertEqual([job.to_dict() for job in loaded.jobs], [job.to_dict() for job in self.queue.jobs])
+        self.assertEqual(len(loaded.pending()), 2)
+        self.assertEqual(sorted(path.name for path in self.folder.iterdir()), ["jobs.toml"])
+
+    def test_failed_save_keeps_the_previous_queue(self):
+        self.queue.add(make_book(self.folder, "first"))
+        before = (self.folder / "jobs.toml").read_bytes()
+        with mock.patch("settings.config.os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.queue.add(make_book(self.folder, "second"))
+        self.assertEqual((self.folder / "jobs.toml").read_bytes(), before)
+        self.assertEqual(len(jobs.JobQueue(self.folder / "jobs.toml").jobs), 1)
+
+    def test_report_written_next_to_the_queue(self):
+        job = self.queue.add(make_book(self.folder, "first"))
+        self.queue.mark_running(job)
+        self.queue.mark_finished(job, jobs.COMPLETED, pages=120)
+        with open(self.folder / "jobs_report.json", encoding="utf-8") as f:
+            report = json.load(f)
+        self.assertEqual([(entry["status"], entry["pages"]) for entry in report], [(jobs.COMPLETED, 120)])
+        self.assertFalse((self.folder / "jobs_report.json.tmp").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+from ebook_capture.journal import CaptureJournal
+from settings.config import Book
+from utils.pdf_maker import EncodedPage
+
+
+"""Capture Journal Tests"""
+
+
+class TestCaptureJournal(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.book = Book()
+        self.book.file_path = os.path.join(folder.name, "book.pdf")
+        self.book.selected_site = "Libby"
+        self.book.page_view = "single"
+        self.book.book_length = "10"
+        self.book.timer = "1"
+        self.book.capture_box = {"x1": 0, "y1": 0, "x2": 10, "y2": 10, "monitor": 1}
+        self.journal = CaptureJournal(self.book.file_path)
+        self.addCleanup(self.journal.close)
+
+    def test_counts_frames_journaled_since_start(self):
+        self.journal.start(self.book)
+        self.assertEqual(self.journal.recorded, 0)
+        self.journal.record_page(1, "aa", EncodedPage(b"png", (10, 10)))
+        self.journal.record_skip(2, "aa", "Duplicate")
+        self.assertEqual(self.journal.recorded, 2)
+
+        state = self.journal.reopen()
+        self.assertEqual(self.journal.recorded, 0)
+        self.assertEqual((len(state.pages), state.captures, state.last_hash), (1, 2, "aa"))
+
+    def test_discard_removes_both_files(self):
+        self.journal.start(self.book)
+        self.journal.discard()
+        self.assertFalse(CaptureJournal.exists(self.book.file_path))
+        self.assertFalse(os.path.exists(self.journal.blob_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import time
+import threading
+import unittest
+from unittest import mock
+from PIL import Image
+from ebook_capture.managers import CaptureConfig, PauseManager, ScreenshotManger, Process
+from ui.dialog_result import DialogResult
+
+
+"""Capture Manager Tests"""
+
+
+class SlowPageModel:
+    """Stand-in PageLoadModel with a long learned wait"""
+    def __init__(self, wait):
+        self.wait = wait
+        self.slow = 0
+
+    def next_wait(self):
+        return self.wait
+
+    def mark_slow(self):
+        self.slow += 1
+
+
+class TestBlankRetryWait(unittest.TestCase):
+    def make_manager(self, pause_manager):
+        manager = ScreenshotManger(CaptureConfig({"x1": 0, "y1": 0, "x2": 10, "y2": 10, "monitor": 1}),
+                                   pause_manager=pause_manager, blank_attempts=3, load_model=SlowPageModel(30))
+        manager._take_screenshot = lambda: Image.new("RGB", (10, 10), "white")
+        return manager
+
+    def test_pause_key_cancels_the_retry_wait(self):
+        pause_manager = PauseManager(timer=30)
+        pause_manager.pause_prompt = lambda: DialogResult.ACCEPT
+        manager = self.make_manager(pause_manager)
+        threading.Timer(0.1, pause_manager.pause_event.set).start()
+
+        started = time.monotonic()
+        with mock.patch("ebook_capture.managers.image_manipulation.is_blank", return_value=True):
+            result = manager.capture_valid_screenshot()
+        self.assertEqual(result, Process.CANCELLED)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertTrue(pause_manager.is_cancelled())
+
+    def test_cancelled_run_does_not_wait(self):
+        pause_manager = PauseManager(timer=30)
+        pause_manager.cancel_event.set()
+        manager = self.make_manager(pause_manager)
+        started = time.monotonic()
+        with mock.patch("ebook_capture.managers.image_manipulation.is_blank", return_value=True):
+            self.assertEqual(manager.capture_valid_screenshot(), Process.CANCELLED)
+        self.assertLess(time.monotonic() - started, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from ebook_capture.timing import PageLoadModel
+from utils import metrics
+
+
+"""Metrics Tests"""
+
+
+class TestPercentile(unittest.TestCase):
+    def test_nearest_rank(self):
+        ordered = list(range(1, 21))
+        self.assertEqual(metrics.percentile(ordered, 50), 10)
+        self.assertEqual(metrics.percentile(ordered, 95), 19)
+        self.assertEqual(metrics.percentile(ordered, 100), 20)
+        self.assertEqual(metrics.percentile(ordered, 0), 1)
+        self.assertEqual(metrics.percentile([7], 95), 7)
+
+    def test_report_and_page_load_model_agree(self):
+        samples = [0.8, 0.3, 1.9, 0.4, 0.35, 0.5, 0.45, 0.6, 0.33, 0.41, 0.52, 0.39]
+        model = PageLoadModel(ceiling=5, samples=samples)
+        metrics.enable()
+        try:
+            for sample in samples:
+                metrics.record("page_load", sample)
+            p95_ms = metrics.summary()["stages"]["page_load"]["p95_ms"]
+        finally:
+            metrics.disable()
+        self.assertEqual(p95_ms, round(model.percentile(95) * 1000, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
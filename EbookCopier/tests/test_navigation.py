@@ -0,0 +1,57 @@
+import unittest
+from ebook_capture import navigation
+
+
+"""Navigation Driver Registry Tests"""
+
+
+class Reader:
+    def __init__(self):
+        self.turns = 0
+
+    def next_page(self):
+        self.turns += 1
+
+
+class TestCreateDriver(unittest.TestCase):
+    def test_every_registered_driver_is_named_after_its_key(self):
+        for name, driver_class in navigation.DRIVERS.items():
+            self.assertEqual(driver_class.name, name)
+            self.assertTrue(issubclass(driver_class, navigation.NavigationDriver))
+
+    def test_creates_driver_with_options(self):
+        driver = navigation.create_driver("keyboard", key="left")
+        self.assertIsInstance(driver, navigation.KeyboardDriver)
+        self.assertEqual(driver.key, "left")
+
+    def test_simulated_driver_is_not_selectable(self):
+        # It needs a reader, only tests and benchmarks can give it one
+        self.assertNotIn("simulated", navigation.DRIVERS)
+        with self.assertRaises(ValueError):
+            navigation.create_driver("simulated")
+
+    def test_simulated_driver_turns_its_reader(self):
+        reader = Reader()
+        driver = navigation.SimulatedDriver(reader)
+        delivered = driver.next_page()
+        self.assertEqual(reader.turns, 1)
+        self.assertIsInstance(delivered, float)
+
+    def test_window_message_driver_takes_hwnd_provider(self):
+        driver = navigation.create_driver("window_message", hwnd_provider=lambda: 42)
+        self.assertEqual(driver.hwnd_provider(), 42)
+
+    def test_unknown_driver(self):
+        with self.assertRaises(ValueError):
+            navigation.create_driver("telepathy")
+
+    def test_driver_without_next_page_can_not_be_created(self):
+        class Incomplete(navigation.NavigationDriver):
+            name = "incomplete"
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+if __name__ == "__main__":
+    unittest.main()
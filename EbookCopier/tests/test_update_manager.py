@@ -0,0 +1,220 @@
+import io
+import json
+import time
+import hashlib
+import zipfile
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from update.update_manager import UpdateManger, REQUEST_TIMEOUT
+
+
+"""Update Manager Tests"""
+# The update manager talks to a real HTTP server on localhost, so requests, headers and timeouts are the ones
+# GitHub would see.
+
+VERSION_FILE = b'__version__ = "1.4.2"\n'
+ETAG = '"v142"'
+LAST_MODIFIED = "Mon, 19 Oct 2026 12:00:00 GMT"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        self.server.respond(self)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """HTTP server on a free localhost port, respond(handler) answers every GET"""
+    def __init__(self, respond):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.requests = []
+        self.httpd.respond = respond
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def version_file(handler):
+    """200 with validators, 304 when the request carries them"""
+    if handler.headers.get("If-None-Match") == ETAG:
+        handler.send_response(304)
+        handler.end_headers()
+        return
+    handler.send_response(200)
+    handler.send_header("ETag", ETAG)
+    handler.send_header("Last-Modified", LAST_MODIFIED)
+    handler.send_header("Content-Length", str(len(VERSION_FILE)))
+    handler.end_headers()
+    handler.wfile.write(VERSION_FILE)
+
+
+class TestSourceVersion(unittest.TestCase):
+    def test_fetch_then_not_modified_then_cached(self):
+        with LocalServer(version_file) as server:
+            cache = {}
+            manager = UpdateManger(version_url=server.url("/__init__.py"), cache=cache)
+
+            self.assertEqual(manager._check_source_version(), ["1", "4", "2"])
+            self.assertEqual(len(server.requests), 1)
+            self.assertNotIn("If-None-Match", server.requests[0][1])
+            self.assertEqual(cache["etag"], ETAG)
+            self.assertEqual(cache["last_modified"], LAST_MODIFIED)
+
+            # Past the check interval the cached validators go with the request
+            cache["checked_at"] = time.time() - 25 * 3600
+            self.assertEqual(manager._check_source_version(), ["1", "4", "2"])
+            self.assertEqual(len(server.requests), 2)
+            headers = server.requests[1][1]
+            self.assertEqual(headers["If-None-Match"], ETAG)
+            self.assertEqual(headers["If-Modified-Since"], LAST_MODIFIED)
+            self.assertLess(time.time() - cache["checked_at"], 60)
+
+            # Within the interval the server is not asked
+            self.assertEqual(manager._check_source_version(), ["1", "4", "2"])
+            self.assertEqual(len(server.requests), 2)
+
+    def test_slow_server_times_out(self):
+        def stall(handler):
+            time.sleep(1)
+            version_file(handler)
+
+        self.assertEqual(UpdateManger().timeout, REQUEST_TIMEOUT)
+        self.assertEqual(REQUEST_TIMEOUT, 5)
+        with LocalServer(stall) as server:
+            manager = UpdateManger(version_url=server.url("/__init__.py"), timeout=0.2)
+            started = time.monotonic()
+            with self.assertLogs("update.update_manager", "WARNING"):
+                self.assertIsNone(manager._check_source_version())
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertEqual(manager.cache, {})
+
+
+def release_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("EbookCopier-main/EbookCopier/__init__.py", VERSION_FILE)
+        # Incompressible, so the zip is large enough to cut in half
+        archive.writestr("EbookCopier-main/EbookCopier/data.bin", bytes(range(256)) * 4096,
+                         compress_type=zipfile.ZIP_STORED)
+    return buffer.getvalue()
+
+
+class Release:
+    """Serves /release.zip with Range support and /update_manifest.json, or a 404 for it if manifest is None"""
+    def __init__(self, payload, manifest):
+        self.payload = payload
+        self.manifest = manifest
+
+    def __call__(self, handler):
+        if handler.path == "/update_manifest.json":
+            if self.manifest is None:
+                handler.send_error(404)
+                return
+            self.send(handler, 200, json.dumps(self.manifest).encode())
+            return
+        start = 0
+        byte_range = handler.headers.get("Range")
+        if byte_range:
+            start = int(byte_range.removeprefix("bytes=").rstrip("-"))
+            self.send(handler, 206, self.payload[start:],
+                      {"Content-Range": f"bytes {start}-{len(self.payload) - 1}/{len(self.payload)}"})
+            return
+        self.send(handler, 200, self.payload)
+
+    @staticmethod
+    def send(handler, status, body, headers=None):
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+class TestDownload(unittest.TestCase):
+    def setUp(self):
+        self.payload = release_zip()
+        self.sha256 = hashlib.sha256(self.payload).hexdigest()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.root = Path(folder.name)
+        patcher = mock.patch("update.update_manager.install_root", return_value=self.root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def download(self, server):
+        manager = UpdateManger(zip_url=server.url("/release.zip"), manifest_url=server.url("/update_manifest.json"))
+        manager.source_version = ["1", "4", "2"]
+        return manager, manager.download_repo()
+
+    def test_resumes_a_partial_download(self):
+        half = len(self.payload) // 2
+        (self.root / "Ebook-1.4.2.zip.part").write_bytes(self.payload[:half])
+        release = Release(self.payload, {"version": "1.4.2", "sha256": self.sha256, "size": len(self.payload)})
+        with LocalServer(release) as server:
+            manager, downloaded = self.download(server)
+        self.assertTrue(downloaded)
+        self.assertEqual(server.requests[-1][1]["Range"], f"bytes={half}-")
+        self.assertEqual(manager.zip_path.read_bytes(), self.payload)
+        self.assertFalse((self.root / "Ebook-1.4.2.zip.part").exists())
+
+    def test_hash_mismatch_is_discarded(self):
+        release = Release(self.payload, {"version": "1.4.2", "sha256": "0" * 64})
+        with LocalServer(release) as server:
+            with self.assertLogs("update.update_manager", "WARNING") as logs:
+                manager, downloaded = self.download(server)
+        self.assertFalse(downloaded)
+        self.assertIn("does not match", "\n".join(logs.output))
+        self.assertFalse(manager.zip_path.exists())
+        self.assertFalse((self.root / "Ebook-1.4.2.zip.part").exists())
+
+    def test_manifest_for_another_version_is_refused(self):
+        release = Release(self.payload, {"version": "1.5.0", "sha256": self.sha256})
+        with LocalServer(release) as server:
+            with self.assertLogs("update.update_manager", "WARNING"):
+                _, downloaded = self.download(server)
+        self.assertFalse(downloaded)
+        self.assertEqual([path for path, _ in server.requests], ["/update_manifest.json"])
+
+    def test_without_manifest_downloads_unverified_from_the_start(self):
+        # A part from an earlier archive build is not resumed, it could not be told apart once spliced
+        (self.root / "Ebook-1.4.2.zip.part").write_bytes(b"stale archive bytes")
+        with LocalServer(Release(self.payload, None)) as server:
+            with self.assertLogs("update.update_manager", "WARNING") as logs:
+                manager, downloaded = self.download(server)
+        self.assertTrue(downloaded)
+        self.assertNotIn("Range", server.requests[-1][1])
+        self.assertEqual(manager.zip_path.read_bytes(), self.payload)
+        self.assertIn("unverified", "\n".join(logs.output))
+
+    def test_without_manifest_a_non_zip_is_discarded(self):
+        with LocalServer(Release(b"<html>rate limited</html>", None)) as server:
+            with self.assertLogs("update.update_manager", "WARNING"):
+                manager, downloaded = self.download(server)
+        self.assertFalse(downloaded)
+        self.assertFalse(manager.zip_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
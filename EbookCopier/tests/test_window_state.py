@@ -0,0 +1,126 @@
+import sys
+import types
+import ctypes
+import importlib
+import unittest
+from unittest import mock
+
+
+"""Window State Tracker Tests"""
+# The Windows modules are replaced with stand-ins, so the dirty/revalidate logic is tested without a desktop.
+# ensure_ready is driven directly, the WinEvent hook thread is never started.
+
+
+def _windows_modules():
+    win32gui = types.ModuleType("win32gui")
+    win32gui.IsWindow = lambda hwnd: True
+    win32api = types.ModuleType("win32api")
+    win32api.GetCursorPos = lambda: (960, 1080)
+    win32api.GetCurrentThreadId = lambda: 1
+    win32process = types.ModuleType("win32process")
+    win32process.GetWindowThreadProcessId = lambda hwnd: (1, 4242)
+    pyautogui = types.ModuleType("pyautogui")
+    pyautogui.size = lambda: (1920, 1080)
+    pyautogui.moveTo = mock.Mock()
+    pyautogui.FailSafeException = type("FailSafeException", (Exception,), {})
+    win32con = types.ModuleType("win32con")
+    return {"win32gui": win32gui, "win32api": win32api, "win32process": win32process, "pyautogui": pyautogui,
+            "win32con": win32con}
+
+
+class WindowStateTestCase(unittest.TestCase):
+    def setUp(self):
+        modules = mock.patch.dict(sys.modules, _windows_modules())
+        modules.start()
+        self.addCleanup(modules.stop)
+        for name in ("utils.window_state", "utils.browser"):
+            sys.modules.pop(name, None)
+        # WINFUNCTYPE only exists on Windows, the calling convention does not matter here
+        if not hasattr(ctypes, "WINFUNCTYPE"):
+            patcher = mock.patch.object(ctypes, "WINFUNCTYPE", ctypes.CFUNCTYPE, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.window_state = importlib.import_module("utils.window_state")
+        self.addCleanup(sys.modules.pop, "utils.window_state", None)
+        self.addCleanup(sys.modules.pop, "utils.browser", None)
+
+    def make_tracker(self, check_environment=False):
+        browser = self.window_state.browser
+        self.check_environment = mock.patch.object(browser, "check_environment", return_value=check_environment).start()
+        mock.patch.object(browser, "get_edge_window", return_value=100).start()
+        self.addCleanup(mock.patch.stopall)
+        tracker = self.window_state.EdgeWindowTracker()
+        tracker._resolve_window()
+        tracker._mouse_target = (960, 1080)
+        # As if the hook thread were running
+        tracker._hooks_ready.set()
+        return tracker
+
+
+class TestEdgeWindowTracker(WindowStateTestCase):
+    def test_clean_page_skips_revalidation(self):
+        tracker = self.make_tracker()
+        self.assertFalse(tracker.ensure_ready())
+        self.check_environment.assert_not_called()
+
+    def test_foreground_event_forces_one_revalidation(self):
+        tracker = self.make_tracker(check_environment=True)
+        tracker._on_win_event(None, self.window_state.EVENT_SYSTEM_FOREGROUND, 555, 0, 0, 0, 0)
+        self.assertTrue(tracker.ensure_ready())
+        self.assertFalse(tracker.ensure_ready())
+        self.assertEqual(self.check_environment.call_count, 1)
+
+    def test_location_change_of_other_window_is_ignored(self):
+        tracker = self.make_tracker()
+        tracker._on_win_event(None, self.window_state.EVENT_OBJECT_LOCATIONCHANGE, 555,
+                              self.window_state.OBJID_WINDOW, 0, 0, 0)
+        tracker.ensure_ready()
+        self.check_environment.assert_not_called()
+
+        tracker._on_win_event(None, self.window_state.EVENT_OBJECT_LOCATIONCHANGE, 100,
+                              self.window_state.OBJID_WINDOW, 0, 0, 0)
+        tracker.ensure_ready()
+        self.check_environment.assert_called_once()
+
+    def test_revalidates_without_hooks(self):
+        tracker = self.make_tracker()
+        tracker._hooks_ready.clear()
+        tracker.ensure_ready()
+        tracker.ensure_ready()
+        self.assertEqual(self.check_environment.call_count, 2)
+
+    def test_closed_window_is_resolved_again(self):
+        tracker = self.make_tracker()
+        with mock.patch.object(sys.modules["win32gui"], "IsWindow", return_value=False):
+            tracker.ensure_ready()
+        self.check_environment.assert_called_once()
+        self.assertEqual(self.window_state.browser.get_edge_window.call_count, 2)
+
+    def test_foreground_hook_includes_own_process(self):
+        # Focus taken by our own dialogs must mark the window dirty
+        calls = []
+        user32 = mock.Mock()
+        user32.SetWinEventHook.side_effect = lambda *args: calls.append(args) or len(calls)
+        user32.GetMessageW.return_value = 0
+        tracker = self.make_tracker()
+        with mock.patch.object(ctypes, "windll", types.SimpleNamespace(user32=user32), create=True):
+            tracker._hook_loop()
+        foreground = [args for args in calls if args[0] == self.window_state.EVENT_SYSTEM_FOREGROUND]
+        self.assertEqual(len(foreground), 1)
+        self.assertFalse(foreground[0][-1] & self.window_state.WINEVENT_SKIPOWNPROCESS)
+
+
+class TestStaticWindowTracker(WindowStateTestCase):
+    def test_returns_scripted_adjustments(self):
+        tracker = self.window_state.StaticWindowTracker(hwnd=7, adjustments=[True, False])
+        self.assertEqual(tracker.get_hwnd(), 7)
+        self.assertEqual([tracker.ensure_ready() for _ in range(3)], [True, False, False])
+        self.assertEqual(tracker.checks, 3)
+
+    def test_base_class_requires_ensure_ready(self):
+        with self.assertRaises(TypeError):
+            self.window_state.WindowStateTracker()
+
+
+if __name__ == "__main__":
+    unittest.main()
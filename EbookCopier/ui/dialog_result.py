@@ -0,0 +1,16 @@
+from enum import (Enum, auto)
+
+"""Dialog Results, Kept Free Of Qt So Headless Code Can Use Them"""
+
+
+class DialogResult(Enum):
+    ACCEPT = auto()
+    REJECT = auto()
+    TERMINATE = auto()
+    RETRY = auto()
+    DELETE = auto()
+    KEEP = auto()
+    HELP = auto()
+
+    def __str__(self):
+        return self.name.title()  # "Accept", "Reject", etc.
@@ -10,18 +10,21 @@ from PySide6.QtWidgets import (
     QPushButton,
     QFileDialog,
     QSizePolicy,
-    QApplication
+    QApplication,
+    QProgressDialog
 
 
 
 )
 from PySide6.QtCore import (
     Qt,
+    Signal,
 )
 from PySide6.QtGui import (
     QIntValidator
 )
 import logging
+from threading import Thread
 # from ui.styles import pyside_styles
 from utils.logs import setup_logging
 from settings.config import Book
@@ -38,22 +41,33 @@ class BookCopierUI(QMainWindow):
     Main application window for BookCopier
     Handles all UI components and user interactions
     """
+    # Emitted from the update check and download threads, handled on the UI thread
+    update_checked = Signal(bool)
+    download_progress = Signal(object, object)
+    download_finished = Signal(bool)
 
     def __init__(self, settings, start_command=None):
         super().__init__()
         self.settings = settings
         self.start_command = start_command
+        self.queue_command = None
+        self.run_queue_command = None
+        self.update_manager = None
+        self.download_dialog = None
         self._setup_logger()
         self._init_ui()
         # self._check_for_update()
 
         # connect signals
         self.site_selector.currentTextChanged.connect(self._handle_site_change)
+        self.update_checked.connect(self._handle_update_checked)
+        self.download_progress.connect(self._handle_download_progress)
+        self.download_finished.connect(self._handle_download_finished)
 
     def _init_ui(self):
         """Initialize the main UI components"""
         self.setWindowTitle("Book Copier")
-        self.setFixedSize(450, 260)
+        self.setFixedSize(450, 320)
 
         # center widget and main layouot
         central_widget = QWidget()
@@ -69,6 +83,16 @@ class BookCopierUI(QMainWindow):
         start_btn.clicked.connect(lambda: self.start_command(self.get_book_params()))
         main_layout.addWidget(start_btn)
 
+        # Queue buttons, books added here run back to back without dialogs
+        queue_layout = QHBoxLayout()
+        queue_btn = QPushButton("Add To Queue")
+        queue_btn.clicked.connect(lambda: self.queue_command(self.get_book_params()))
+        queue_layout.addWidget(queue_btn)
+        self.run_queue_btn = QPushButton("Run Queue")
+        self.run_queue_btn.clicked.connect(lambda: self.run_queue_command())
+        queue_layout.addWidget(self.run_queue_btn)
+        main_layout.addLayout(queue_layout)
+
     def _create_form_widgets(self, layout):
         """Create all the form widgetse and their layouots"""
         """Create all the form widgets and their layouts"""
@@ -143,6 +167,14 @@ class BookCopierUI(QMainWindow):
         file_layout.addWidget(browse_btn)
         layout.addLayout(file_layout)
 
+        # Book url, optional, lets a queued book be opened without anyone at the machine
+        url_layout = QHBoxLayout()
+        url_layout.addWidget(QLabel("Book URL:"))
+        self.url_entry = QLineEdit()
+        self.url_entry.setPlaceholderText("Optional, used by the queue to open the book")
+        url_layout.addWidget(self.url_entry)
+        layout.addLayout(url_layout)
+
     def get_book_params(self):
         """Returns all parameters as a Book Object"""
         book = Book()
@@ -151,12 +183,14 @@ class BookCopierUI(QMainWindow):
         book.timer = self.timer_entry.text()
         book.book_length = self.page_count.text()
         book.page_view = self.page_view_selector.currentText()
+        book.url = self.url_entry.text().strip()
         return book
 
     def reset_ui(self):
         """Reset all UI fields to their default values"""
         self.path_label.clear()
         self.page_count.clear()
+        self.url_entry.clear()
         self.site_selector.setCurrentIndex(0)
 
     def hide_window(self):
@@ -172,6 +206,13 @@ class BookCopierUI(QMainWindow):
     def set_start_command(self, value):
         self.start_command = value
 
+    def set_queue_commands(self, queue_command, run_queue_command):
+        self.queue_command = queue_command
+        self.run_queue_command = run_queue_command
+
+    def set_queue_count(self, pending):
+        self.run_queue_btn.setText(f"Run Queue ({pending})" if pending else "Run Queue")
+
     def closeEvent(self, event):
         logger.info("Application shutting down...")
         QApplication.instance().quit()
@@ -188,23 +229,67 @@ class BookCopierUI(QMainWindow):
             self.page_count.setToolTip("")
 
     def _check_for_update(self):
-        """check for application updates"""
+        """check for application updates in the background, the window stays responsive while it runs"""
         if not self.settings.auto_update:
             return False
 
-        update_manager = UpdateManger()
+        self.update_manager = UpdateManger(cache=dict(self.settings.update_cache),
+                                           check_interval_hours=self.settings.update_check_interval)
+        Thread(target=self._update_check_worker, daemon=True).start()
+        return True
+
+    def _update_check_worker(self):
+        try:
+            available = self.update_manager.check_for_update()
+        except Exception as e:
+            logger.error(f"Update check failed {str(e)}", exc_info=True)
+            available = False
+        self.update_checked.emit(available)
+
+    def _handle_update_checked(self, available):
+        """Save the check's cached result and offer the update"""
+        update_manager = self.update_manager
+        if update_manager.cache != self.settings.update_cache:
+            self.settings.update_cache = update_manager.cache
+            self.settings.save_user_settings()
+        if not available:
+            return False
         try:
-            if not update_manager.check_for_update():
-                return False
             logger.info("Update available")
             response = MessageBox.question("Update Available", "Would you like to download and install the new update?")
             logger.debug(f"User update response: {response}")
             if response != DialogResult.ACCEPT:
                 return False
-            if not update_manager.download_repo():
-                return False
-            logger.info("Update downloaded")
-            update_manager.start_install()
+            self.download_dialog = QProgressDialog("Downloading update...", None, 0, 100, self)
+            self.download_dialog.setWindowTitle("Updating")
+            self.download_dialog.setMinimumDuration(0)
+            self.download_dialog.setValue(0)
+            Thread(target=self._download_worker, daemon=True).start()
+            return True
+        except Exception as e:
+            logger.error(f"Update Failed {str(e)}")
+            MessageBox.error("Update Failed", "Unable to update, please try again later")
+
+    def _download_worker(self):
+        try:
+            downloaded = self.update_manager.download_repo(progress=self.download_progress.emit)
+        except Exception as e:
+            logger.error(f"Update download failed {str(e)}", exc_info=True)
+            downloaded = False
+        self.download_finished.emit(downloaded)
+
+    def _handle_download_progress(self, downloaded, total):
+        if total:
+            self.download_dialog.setValue(min(100, downloaded * 100 // total))
+
+    def _handle_download_finished(self, downloaded):
+        self.download_dialog.close()
+        if not downloaded:
+            MessageBox.error("Update Failed", "Unable to download the update, please try again later")
+            return False
+        logger.info("Update downloaded")
+        try:
+            self.update_manager.start_install()
         except Exception as e:
             logger.error(f"Update Failed {str(e)}")
             MessageBox.error("Update Failed", "Unable to update, please try again later")
@@ -247,6 +332,7 @@ class BookCopierUI(QMainWindow):
 
         setup_logging(
             log_dir="logs",
+            ignore_levels=log_level,
             console_logging=self.settings.console_logging,
             console_level=console_level
         )
@@ -16,13 +16,17 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import (
     Qt,
     QSize,
+    QRect,
+    QPoint,
+    QEventLoop,
     QPropertyAnimation,
 )
 from PySide6.QtGui import (QPixmap, QImage,)
 from PIL import Image
-from enum import (Enum, auto)
+from ui.dialog_result import DialogResult  # noqa: F401 - re-exported for the ui modules
 import winsound
 import ctypes
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,6 +62,16 @@ def apply_non_focus_style(hwnd):
         raise RuntimeError(f"Failed to apply window styles: {e}") from e
 
 
+def exclude_from_capture(hwnd):
+    """Leave the window out of screenshots and recordings, returns False where Windows can not (before 10 2004)"""
+    WDA_EXCLUDEFROMCAPTURE = 0x00000011
+    try:
+        return bool(ctypes.windll.user32.SetWindowDisplayAffinity(hwnd, WDA_EXCLUDEFROMCAPTURE))
+    except Exception as e:
+        logger.warning(f"Failed to exclude window from capture: {e}")
+        return False
+
+
 def get_styled_text_width(widget, text):
     widget.style().unpolish(widget)  # Clear existing styles
     widget.style().polish(widget)    # Reapply stylesheet
@@ -83,19 +97,6 @@ def calculate_button_size(button_data: list[dict], padding: int = 20):
     return max_width, max_height
 
 
-class DialogResult(Enum):
-    ACCEPT = auto()
-    REJECT = auto()
-    TERMINATE = auto()
-    RETRY = auto()
-    DELETE = auto()
-    KEEP = auto()
-    HELP = auto()
-
-    def __str__(self):
-        return self.name.title()  # "Accept", "Reject", etc.
-
-
 class NoFocusDialogBase(QDialog):
     """Base QDialog widget for a non focusable interactive window with custom button setup"""
     BUTTON_SPACING = 20
@@ -591,6 +592,23 @@ class ImageWindow(NoFocusDialogBase):
         )
 
 
+    @staticmethod
+    def review(page_img: Image.Image, previous_img: Image.Image, kind: str, position: str, applied: str) -> DialogResult:
+        """Static method for reviewing a deferred page after the run, returning user choice"""
+        return ImageWindow.show(
+            image1=(previous_img, "Previous Page"),
+            image2=(page_img, f"{kind.title()} Page"),
+            title=f"Review {position}",
+            message=f"This {kind} page was {'kept' if applied == 'keep' else 'discarded'} during the run.\n"
+                    f"Keep it in the book, or remove it?",
+            button_options=[
+                {"text": "Keep", "return": DialogResult.ACCEPT},
+                {"text": "Remove", "return": DialogResult.REJECT},
+                {"text": "Accept Rest", "return": DialogResult.TERMINATE}
+            ],
+        )
+
+
 def continuation(title: str, message: str, help_items: list = None, parent: QWidget = None) -> DialogResult:
     """Display a (Wrapper) confirmation dialog with Continue/Cancel/Help options.
 
@@ -756,6 +774,108 @@ class ConfirmationDialog(NoFocusDialogBase):
         help_dialog.exec()
 
 
+class ProgressOverlay(NoFocusDialogBase):
+    """Small always on top window showing how a capture run is going, placed beside the capture box"""
+    WIDTH = 340
+    # Lines kept for the stage timings, the overlay never grows into the capture box after it is placed
+    STAGE_LINES = 3
+    SCREEN_MARGIN = 12
+    CONTENTS_MARGIN = (10, 8, 10, 8)
+    LINE_SPACING = 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Capture Progress")
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.setFocusPolicy(Qt.NoFocus)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(self.LINE_SPACING)
+        layout.setContentsMargins(*self.CONTENTS_MARGIN)  # * unpacks tuple
+        self.pages_label = QLabel()
+        self.rate_label = QLabel()
+        self.queue_label = QLabel()
+        self.stage_label = QLabel()
+        self.stage_label.setWordWrap(True)
+        self.stage_label.setAlignment(Qt.AlignmentFlag.AlignTop)
+        self.stage_label.setMinimumHeight(self.stage_label.fontMetrics().lineSpacing() * self.STAGE_LINES)
+        for label in (self.pages_label, self.rate_label, self.queue_label, self.stage_label):
+            layout.addWidget(label)
+        self.setFixedWidth(self.WIDTH)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Placed outside the capture box either way, this also keeps it out of full screen grabs
+        if not exclude_from_capture(self._hwnd):
+            logger.info("Progress overlay can not be excluded from capture, relying on its position")
+
+    def place_beside(self, capture_box):
+        """Move to a screen corner clear of the capture box, the box's screen first
+
+        Args:
+            capture_box: {"x1", "y1", "x2", "y2", ...} in desktop coordinates
+
+        Returns:
+            bool: False if no corner of any screen is clear of the box
+        """
+        margin = self.SCREEN_MARGIN
+        box = QRect(QPoint(capture_box["x1"], capture_box["y1"]), QPoint(capture_box["x2"], capture_box["y2"]))
+        box = box.adjusted(-margin, -margin, margin, margin)
+        self.adjustSize()
+        size = self.size()
+
+        screens = QApplication.screens()
+        box_screen = QApplication.screenAt(box.center())
+        if box_screen in screens:
+            screens.remove(box_screen)
+            screens.insert(0, box_screen)
+        for screen in screens:
+            area = screen.availableGeometry().adjusted(margin, margin, -margin, -margin)
+            corners = (
+                QPoint(area.right() - size.width(), area.top()),
+                QPoint(area.right() - size.width(), area.bottom() - size.height()),
+                QPoint(area.left(), area.top()),
+                QPoint(area.left(), area.bottom() - size.height()),
+            )
+            for corner in corners:
+                placed = QRect(corner, size)
+                if area.contains(placed) and not placed.intersects(box):
+                    self.move(corner)
+                    self.setFixedSize(size)
+                    return True
+        return False
+
+    def refresh(self, status):
+        """Show a RunProgress snapshot and repaint, without handling input"""
+        pages = f"Page {status['kept']} of {status['book_length']}"
+        if status["captured"] != status["kept"]:
+            pages += f" ({status['captured']} captured)"
+        self.pages_label.setText(pages)
+
+        eta = status["eta_s"]
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta is not None else "--"
+        self.rate_label.setText(f"{status['pages_per_min']:.1f} pages/min, ETA {eta_text}")
+        queues = ", ".join(f"{stage} {depth}" for stage, depth in status["queues"].items())
+        self.queue_label.setText(f"Queued: {queues or '-'}")
+        stages = ", ".join(f"{stage} {ms:.0f}ms" for stage, ms in status["stages"].items())
+        self.stage_label.setText(f"Last: {stages or '-'}")
+        # The capture runs on this thread's event loop, Qt only gets to paint when asked
+        QApplication.processEvents(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+
+    @staticmethod
+    def beside(capture_box):
+        """Show an overlay clear of capture_box, None if there is no room for one"""
+        overlay = ProgressOverlay()
+        overlay.refresh({"kept": 0, "captured": 0, "book_length": 0, "pages_per_min": 0.0, "eta_s": None,
+                         "queues": {}, "stages": {}})
+        if not overlay.place_beside(capture_box):
+            logger.warning("No room for the progress overlay outside the capture box")
+            overlay.close()
+            return None
+        overlay.show()
+        return overlay
+
+
 if __name__ == "__main__":
     # Themes
     # dark_theme, warm_sand, midnight_theme, solar_cream, moon_parchemnt, autumn_ember, winter_ash,
@@ -1,15 +1,33 @@
+import os
 import sys
 import zipfile
 import shutil
 import time
 import stat
 import argparse
+import threading
 import subprocess
 from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
+"""Staged Install"""
+# Each version lives in its own folder, versions/<version>/, with the zip's contents. The launcher bat
+# runs versions/<current_version>/EbookCopier, or the flat EbookCopier folder of an install from before
+# versions existed. An update is extracted next to the running version, checked, and given the user's
+# settings. Only then does current_version switch to it, with one file replace. previous_version points
+# back, so a rollback is another replace. Versions other than those two are deleted after the restart.
+
+VERSIONS_DIR = "versions"
+CURRENT_POINTER = "current_version"
+PREVIOUS_POINTER = "previous_version"
+APP_FOLDER = "EbookCopier"
+# Files a version must contain to be switched to
+REQUIRED_FILES = ("EbookCopier/main.py", "EbookCopier/__init__.py")
+# User files carried from the running version into the new one, relative to its app folder
+USER_FILES = ("settings/config.toml", "settings/jobs.toml", "settings/jobs_report.json")
+
 
 def validate_zip_path(path_str):
     if not Path(path_str).exists:
@@ -71,14 +89,18 @@ def start_logger():
 def main():
     try:
         parser = argparse.ArgumentParser(
-            description="Unzip EbookCopier Zip and merge with existing directory"
+            description="Install an EbookCopier zip as a new version, or roll back to the previous one"
         )
         parser.add_argument(
             "-p", "--zip_path",
             type=validate_zip_path,
-            required=True,
             help="Path to the zip file to extract and install"
         )
+        parser.add_argument(
+            "--rollback",
+            action="store_true",
+            help="Switch back to the previously installed version instead of installing"
+        )
         parser.add_argument(
             "-r", "--restart_path",
             required=True,
@@ -91,16 +113,26 @@ def main():
         )
         # Parse args, and set type
         args = parser.parse_args()
-        args.zip_path = Path(args.zip_path)
+        if not args.zip_path and not args.rollback:
+            parser.error("one of --zip_path or --rollback is required")
         args.restart_path = Path(args.restart_path)
-        logger.debug(f"zip path: {args.zip_path}, restart path: {args.restart_path}, delete zip: {args.delete}")
-        # unzip and move the zip file
-        if not unzip_and_merge(args.zip_path, delete_after=args.delete):
+        root = args.restart_path.parent.resolve()
+        logger.debug(f"zip path: {args.zip_path}, restart path: {args.restart_path}, delete zip: {args.delete}, "
+                     f"rollback: {args.rollback}")
+        if args.rollback:
+            if not rollback(root):
+                logger.error("Failed to roll back")
+                return False
+        # stage the zip as a new version and switch to it
+        elif not install_version(Path(args.zip_path), root, delete_after=args.delete):
             logger.error("Failed to unzip and install update")
             return False
 
         if restart_main(args.restart_path):
             logger.info("Restarting main application")
+            # Old versions are removed while the app starts, so they never delay it. The thread is not a
+            # daemon, the installer exits once it is done
+            threading.Thread(target=collect_old_versions, args=(root,), name="collect_old_versions").start()
             time.sleep(1)
             sys.exit(0)
         else:
@@ -162,88 +194,155 @@ def delete_zip_file(zip_path: Path, max_retries=3, delay=1) -> bool:
     return False
 
 
-def unzip_and_merge(zip_path: Path, delete_after=True) -> bool:
-    """
-    Unzips a file and merges the contents of the 'EbookCopier-main' folder
-    with the existing directory where the zip file is located.
-    """
-    try:
-        # Get the parent directory of the zip file
-        zip_dir = zip_path.parent.resolve()
-
-        # Temporary extraction directory
-        temp_extract = zip_dir / '_temp_extract'
-
-        # Remove any existing temp directory using onexc
-        if temp_extract.exists():
-            shutil.rmtree(temp_extract, onexc=handle_remove_error)
-
-        # Extract the entire zip to a temporary directory
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_extract)
-
-        # Path to the EbookCopier-main folder inside the extracted contents
-        source_folder = temp_extract / 'EbookCopier-main'
+def read_pointer(root: Path, name: str) -> str:
+    """Version a pointer file names, "" if there is none"""
+    pointer = root / name
+    if not pointer.exists():
+        return ""
+    return pointer.read_text(encoding="utf-8").strip()
+
+
+def write_pointer(root: Path, name: str, version: str):
+    """Point name at version with a single replace, an empty version removes the pointer"""
+    pointer = root / name
+    if not version:
+        pointer.unlink(missing_ok=True)
+        return
+    temp = root / f"{name}.tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, pointer)
+
+
+def app_dir(root: Path, version: str) -> Path:
+    """App folder of a version, "" is the flat install from before versions existed"""
+    if not version:
+        return root / APP_FOLDER
+    return root / VERSIONS_DIR / version / APP_FOLDER
+
+
+def extract_version(zip_path: Path, staging: Path):
+    """Stream the zip's members into staging, without the archive's top folder (EbookCopier-main/)"""
+    staging_root = staging.resolve()
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for member in zip_ref.infolist():
+            parts = Path(member.filename).parts[1:]
+            if not parts:
+                continue
+            target = staging.joinpath(*parts)
+            if not target.resolve().is_relative_to(staging_root):
+                raise ValueError(f"Unsafe path in zip: {member.filename}")
+            if member.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Reading a member to the end checks its CRC
+            with zip_ref.open(member) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
 
-        if not source_folder.exists():
-            logger.error("EbookCopier-main folder not found in the zip file")
-            shutil.rmtree(temp_extract, onexc=handle_remove_error)
-            return False
 
-        def move_with_retry(src: Path, dst: Path, max_retries=3, delay=1) -> bool:
-            """Move files with retry logic for permission issues"""
-            for attempt in range(max_retries):
-                try:
-                    if dst.exists():
-                        if dst.is_dir():
-                            shutil.rmtree(dst, onexc=handle_remove_error)
-                        else:
-                            dst.chmod(stat.S_IWRITE)
-                            dst.unlink()
-                    shutil.move(str(src), str(dst))  # shutil still needs strings
-                    return True
-                except PermissionError:
-                    if attempt == max_retries - 1:
-                        raise
-                    time.sleep(delay)
-            return False
+def staged_version(staging: Path) -> str:
+    """Version string of a staged folder, raises ValueError if it is incomplete"""
+    for required in REQUIRED_FILES:
+        if not (staging / required).is_file():
+            raise ValueError(f"{required} missing from the update")
+    line = (staging / APP_FOLDER / "__init__.py").read_text(encoding="utf-8").splitlines()[0]
+    if "__version__" not in line:
+        raise ValueError("No __version__ in the update")
+    return line.split("=", 1)[1].strip().strip("\"'")
 
-        # Move all contents from EbookCopier-main to the zip directory
-        for item in source_folder.iterdir():
-            src = item
-            dst = zip_dir / item.name
-
-            try:
-                # If it's a directory that exists in both places, merge contents
-                if src.is_dir() and dst.exists():
-                    for sub_item in src.iterdir():
-                        sub_src = sub_item
-                        sub_dst = dst / sub_item.name
-                        move_with_retry(sub_src, sub_dst)
-                else:
-                    move_with_retry(src, dst)
-
-            except Exception as e:
-                logger.warning(f"Warning could not move {item.name}: {str(e)}")
-                continue
-        logger.info("Successfully merged contents from EbookCopier-main")
 
-        # Clean up temporary directory with onexc
-        shutil.rmtree(temp_extract, onexc=handle_remove_error)
+def install_version(zip_path: Path, root: Path, delete_after=True) -> bool:
+    """
+    Extracts the zip into versions/, carries over the user's settings and switches the current version
+    to it. The running version is untouched until the pointer is replaced.
+    """
+    versions = root / VERSIONS_DIR
+    staging = versions / f"_staging-{int(time.time())}"
+    try:
+        current = read_pointer(root, CURRENT_POINTER)
+        versions.mkdir(exist_ok=True)
+        extract_version(zip_path, staging)
+        version = staged_version(staging)
+        logger.info(f"Staged version {version}")
+
+        for user_file in USER_FILES:
+            source = app_dir(root, current) / user_file
+            if source.exists():
+                destination = staging / APP_FOLDER / user_file
+                destination.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(source, destination)
+                logger.debug(f"Carried over {user_file}")
+
+        name = version
+        if (versions / name).exists():
+            # Reinstalling a version keeps the existing folder until collected
+            name = f"{version}-{int(time.time())}"
+        staging.rename(versions / name)
+
+        write_pointer(root, PREVIOUS_POINTER, current)
+        write_pointer(root, CURRENT_POINTER, name)
+        logger.info(f"Switched from {current or 'the flat install'} to {name}")
+        update_launcher(root, versions / name)
 
         # Delete the zip file if requested
         if delete_after:
-            return delete_zip_file(zip_path)
-
+            delete_zip_file(zip_path)
         return True
 
     except Exception as e:
         logger.error(f"An error occurred: {e}")
-        if 'temp_extract' in locals() and temp_extract.exists():
-            shutil.rmtree(temp_extract, onexc=handle_remove_error)
+        if staging.exists():
+            shutil.rmtree(staging, onexc=handle_remove_error)
         return False
 
 
+def update_launcher(root: Path, version_dir: Path):
+    """Replace the launcher bat if the new version ships a different one"""
+    source = version_dir / "EbookCopier.bat"
+    launcher = root / "EbookCopier.bat"
+    if not source.exists() or (launcher.exists() and launcher.read_bytes() == source.read_bytes()):
+        return
+    temp = root / "EbookCopier.bat.tmp"
+    shutil.copy2(source, temp)
+    os.replace(temp, launcher)
+    logger.info("Launcher updated")
+
+
+def rollback(root: Path) -> bool:
+    """Swap the current and previous versions"""
+    current = read_pointer(root, CURRENT_POINTER)
+    previous = read_pointer(root, PREVIOUS_POINTER)
+    if not current:
+        logger.error("No installed version to roll back from")
+        return False
+    if not app_dir(root, previous).exists():
+        logger.error(f"Previous version {previous or 'the flat install'} is missing")
+        return False
+    write_pointer(root, CURRENT_POINTER, previous)
+    write_pointer(root, PREVIOUS_POINTER, current)
+    logger.info(f"Rolled back from {current} to {previous or 'the flat install'}")
+    return True
+
+
+def collect_old_versions(root: Path):
+    """Delete versions and leftover staging folders that are neither current nor previous"""
+    keep = {read_pointer(root, CURRENT_POINTER), read_pointer(root, PREVIOUS_POINTER)}
+    versions = root / VERSIONS_DIR
+    if not versions.exists():
+        return
+    for folder in versions.iterdir():
+        if folder.name in keep or not folder.is_dir():
+            continue
+        try:
+            shutil.rmtree(folder, onexc=handle_remove_error)
+            logger.info(f"Removed old version {folder.name}")
+        except OSError as e:
+            logger.warning(f"Could not remove {folder.name}: {str(e)}")
+
+
 if __name__ == "__main__":
     logger = start_logger()
     logger.info("Preparing to install...")
@@ -1,11 +1,39 @@
-import requests
-import subprocess
+import os
 import sys
 import time
+import hashlib
+import zipfile
+import subprocess
 from pathlib import Path
+from update.install_update import VERSIONS_DIR
 import logging
 logger = logging.getLogger(__name__)
 
+# requests is imported on first use, it is only needed when checking for an update.
+# The published version is cached with its ETag/Last-Modified and the time it was checked. Within
+# check_interval_hours no request is made, after that a conditional request usually gets a 304.
+
+# Downloads are checked against update_manifest.json published next to the version, a JSON object with the
+# zip's "sha256", and optionally its "size", "version" and a "url" to download it from instead of zip_url.
+# The branch archive GitHub builds on request is not byte for byte stable, so it has no hash to publish. With
+# no manifest, or one without a sha256, the zip is downloaded from the start with a warning and only checked
+# to be a zip, the installer still checks every member's CRC while staging it.
+
+# Seconds a request waits on the server before giving up
+REQUEST_TIMEOUT = 5
+# Bytes read from the connection and hashed at a time
+DOWNLOAD_CHUNK = 1024 * 1024
+# Attempts to finish a download, each continues where the last stopped
+DOWNLOAD_RETRIES = 3
+
+
+def install_root(app_dir=None):
+    """Folder holding the launcher bat, for a flat install or a version under versions/"""
+    app_dir = Path(app_dir or Path.cwd()).resolve()
+    if app_dir.parent.parent.name == VERSIONS_DIR:
+        return app_dir.parent.parent.parent
+    return app_dir.parent
+
 
 class UpdateManger:
     def __init__(self,
@@ -13,7 +41,22 @@ class UpdateManger:
                  owner="GoobersGaming",
                  name="EbookCopier", branch="main",
                  source_path="EbookCopier/__init__.py",
-                 restart_file="EbookCopier.bat"):
+                 restart_file="EbookCopier.bat",
+                 version_url=None,
+                 zip_url=None,
+                 manifest_url=None,
+                 cache=None,
+                 check_interval_hours=24,
+                 timeout=REQUEST_TIMEOUT):
+        """
+        Args:
+            version_url: Url of the file holding __version__, defaults to the branch's raw __init__.py
+            zip_url: Url of the release zip, defaults to the branch's archive
+            manifest_url: Url of the release manifest, defaults to the branch's update_manifest.json
+            cache: Dict of the last check's result, updated in place so the caller can save it
+            check_interval_hours: Hours a cached version is used without asking the server
+            timeout: Seconds a request waits on the server
+        """
 
         self.path = path
         self.repo_owner = owner
@@ -24,8 +67,12 @@ class UpdateManger:
         self.local_version = []
         self.source_version = []
         self.zip_path = None
-        self.git_raw_url = f"https://raw.githubusercontent.com/{self.repo_owner}/{self.repo_name}/{self.branch}/{self.source_path}"
-        self.zip_url = f"https://github.com/{self.repo_owner}/{self.repo_name}/archive/refs/heads/{self.branch}.zip"
+        self.git_raw_url = version_url or f"https://raw.githubusercontent.com/{self.repo_owner}/{self.repo_name}/{self.branch}/{self.source_path}"
+        self.zip_url = zip_url or f"https://github.com/{self.repo_owner}/{self.repo_name}/archive/refs/heads/{self.branch}.zip"
+        self.manifest_url = manifest_url or f"https://raw.githubusercontent.com/{self.repo_owner}/{self.repo_name}/{self.branch}/update_manifest.json"
+        self.cache = cache if cache is not None else {}
+        self.check_interval_hours = check_interval_hours
+        self.timeout = timeout
 
     def check_for_update(self):
         self.source_version = self._check_source_version()
@@ -54,12 +101,36 @@ class UpdateManger:
         return None
 
     def _check_source_version(self):
+        """Published version, from the cache while it is fresh, otherwise from a conditional request"""
+        cached = self.cache.get("source_version")
+        age = time.time() - self.cache.get("checked_at", 0)
+        if cached and age < self.check_interval_hours * 3600:
+            logger.debug(f"Using cached source version, checked {age / 3600:.1f} hours ago")
+            return list(cached)
+
+        import requests
+        headers = {}
+        if cached and self.cache.get("etag"):
+            headers["If-None-Match"] = self.cache["etag"]
+        if cached and self.cache.get("last_modified"):
+            headers["If-Modified-Since"] = self.cache["last_modified"]
         try:
-            response = requests.get(self.git_raw_url)
+            response = requests.get(self.git_raw_url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                logger.debug("Source version not modified since last check")
+                self.cache["checked_at"] = time.time()
+                return list(cached)
             response.raise_for_status()
             version = str(response.text)
             if version:
-                return self._parse_version(version)
+                source_version = self._parse_version(version)
+                if source_version:
+                    self.cache.update(
+                        source_version=source_version,
+                        etag=response.headers.get("ETag", ""),
+                        last_modified=response.headers.get("Last-Modified", ""),
+                        checked_at=time.time())
+                return source_version
         except requests.RequestException as e:
             logger.warning(f"Error reaching the url: {str(e)}")
 
@@ -81,27 +152,117 @@ class UpdateManger:
                 return True
         return False
 
-    def download_repo(self):
+    def download_repo(self, progress=None):
+        """Download the release zip and verify it against the published manifest
+
+        A download cut short is kept as <zip>.part and continued with a Range request, on the next
+        attempt or the next time the update is downloaded. Without a published sha256 a spliced file
+        could not be caught, so the download starts over instead.
+
+        Args:
+            progress: Optional callable(downloaded bytes, total bytes, 0 if unknown)
+
+        Returns:
+            bool: True if self.zip_path holds the downloaded zip
+        """
         # Convert version to string
         version_str = ".".join(map(str, self.source_version))
         # Path for zip to be saved to
-        self.zip_path = Path.cwd().parent / f"Ebook-{version_str}.zip"
+        self.zip_path = install_root() / f"Ebook-{version_str}.zip"
+        part_path = self.zip_path.with_name(f"{self.zip_path.name}.part")
+
+        import requests
+        try:
+            manifest = self._fetch_manifest()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Update manifest unavailable, not downloading: {str(e)}")
+            return False
+
+        url = manifest.get("url") or self.zip_url
+        verified = bool(manifest.get("sha256"))
+        if not verified:
+            logger.warning("No sha256 published for version %s, downloading %s unverified", version_str, url)
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            try:
+                self._download_part(url, part_path, manifest.get("size", 0), progress, resume=verified)
+                break
+            except requests.RequestException as e:
+                logger.warning(f"Download interrupted, attempt {attempt}/{DOWNLOAD_RETRIES}: {str(e)}")
+        else:
+            logger.warning(f"Failed to download file, {part_path.name} kept to resume later")
+            return False
+
+        if not self._verify_download(part_path, manifest):
+            part_path.unlink(missing_ok=True)
+            return False
+        os.replace(part_path, self.zip_path)
+        logger.debug(f"File downloaded succesfully do {self.zip_path}")
+        return True
 
-        # Open site and grab download
-        response = requests.get(self.zip_url, stream=True)
+    def _fetch_manifest(self):
+        """{"version", "sha256", "size", "url"} of the published release, {} if none is published"""
+        import requests
+        response = requests.get(self.manifest_url, timeout=self.timeout)
+        if response.status_code == 404:
+            logger.info("No update manifest published at %s", self.manifest_url)
+            return {}
+        response.raise_for_status()
+        manifest = response.json()
+        if not isinstance(manifest, dict):
+            raise ValueError("manifest is not a JSON object")
+        version = manifest.get("version")
+        if version and self._parse_version(f'__version__ = "{version}"') != list(self.source_version):
+            raise ValueError(f"manifest is for version {version}")
+        return manifest
 
-        if response.status_code == 200:
-            with open(self.zip_path, "wb") as f:
-                for chunk in response.iter_content(1024):
+    def _download_part(self, url, part_path, total, progress, resume=True):
+        """Append the rest of url to part_path, starting over if the server ignores the range or not resume"""
+        import requests
+        offset = part_path.stat().st_size if resume and part_path.exists() else 0
+        if total and offset >= total:
+            return
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with requests.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if offset and response.status_code == 416:
+                return  # Nothing past offset, the part is checked as it is
+            response.raise_for_status()
+            if offset and response.status_code != 206:
+                logger.info("Server ignored the range request, downloading from the start")
+                offset = 0
+            elif offset:
+                logger.info(f"Resuming download at {offset} bytes")
+            if not total:
+                total = offset + int(response.headers.get("Content-Length", 0))
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK):
                     f.write(chunk)
-                logger.debug(f"File downloaded succesfully do {self.zip_path}")
-                return True
-        else:
-            logger.warning(f"Failed to download file. status code: {response.status_code}")
+                    offset += len(chunk)
+                    if progress:
+                        progress(offset, total)
+
+    def _verify_download(self, path, manifest):
+        size = path.stat().st_size
+        if manifest.get("size") and size != manifest["size"]:
+            logger.warning(f"Downloaded {size} bytes, manifest lists {manifest['size']}")
+            return False
+        if not manifest.get("sha256"):
+            if not zipfile.is_zipfile(path):
+                logger.warning("Downloaded file is not a zip")
+                return False
+            logger.warning("Download is a zip but was not verified, no sha256 was published")
+            return True
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(DOWNLOAD_CHUNK), b""):
+                digest.update(block)
+        if digest.hexdigest() != manifest["sha256"].lower():
+            logger.warning("Downloaded file does not match the manifest's sha256")
             return False
+        logger.info("Download verified against the manifest")
+        return True
 
     def start_install(self):
-        cwd_dir = Path.cwd().parent
+        cwd_dir = install_root()
         venv_path = Path(sys.executable)
         install_script = Path.cwd() / "update" / "install_update.py"
         restart_path = cwd_dir / self.restart_file
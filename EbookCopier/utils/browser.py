@@ -1,20 +1,21 @@
+import os
 import win32gui
 import win32con
 import win32api
 import time
-import keyboard
 import logging
 import win32process
-import pyautogui
 logger = logging.getLogger(__name__)
 
 # TODO:
 # Add Logging
 # Check tghe different focus options
+# pyautogui and keyboard are imported on first use, they slow down starting the app.
 
 
 def check_environment():
     """Ensures Edge Is Active, and Fullscreen, and will move mouse out of the way"""
+    import pyautogui
     try:
         response = None
         if not is_edge_window_active_and_focused():
@@ -145,6 +146,7 @@ def enter_fullscreen_if_needed():
     activate_edge_window()  # Use your existing activation function
     time.sleep(0.2)
 
+    import keyboard
     attempts = 0
     max_attempts = 3
 
@@ -160,6 +162,26 @@ def enter_fullscreen_if_needed():
     return False
 
 
+def open_in_edge(url):
+    """Open url in Microsoft Edge through its protocol handler, the queue uses it to switch books"""
+    logger.info(f"Opening in Edge: {url}")
+    os.startfile(f"microsoft-edge:{url}")
+
+
+def get_edge_window():
+    """Returns the handle of the first visible Edge window, or None if Edge not found."""
+    def callback(hwnd, hwnds):
+        if win32gui.IsWindowVisible(hwnd):
+            title = win32gui.GetWindowText(hwnd)
+            if "Microsoft Edge" in title or "Edge" in title:
+                hwnds.append(hwnd)
+        return True
+
+    hwnds = []
+    win32gui.EnumWindows(callback, hwnds)
+    return hwnds[0] if hwnds else None
+
+
 def get_edge_display_number():
     """Returns which display/monitor Edge is currently on (1-based index). Returns None if Edge not found."""
     def callback(hwnd, hwnds):
@@ -1,5 +1,4 @@
-import cv2
-import numpy as np
+import hashlib
 from PIL import Image
 import logging
 logger = logging.getLogger(__name__)
@@ -8,9 +7,12 @@ logger = logging.getLogger(__name__)
 """Functions For Comparing And Manipulating Images"""
 # TODO:Compare Images, Should Be Is It An Exact Copy And Not A %ALIKE.
 # convert_to_pil needed?
+# cv2 and numpy are imported on first use, they are only needed once a capture starts.
 
 
 def pil_to_cv2(image):
+    import cv2
+    import numpy as np
     if isinstance(image, Image.Image):
         img_np = np.array(image)
         img_cv2 = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
@@ -26,6 +28,8 @@ def is_blank(image, edge_threshold=0.01):
     # edge_threshold: Ratio of edge pixels (e.g., 0.01 = 1% edges).
     if image is None:
         return True
+    import cv2
+    import numpy as np
     image_cv2 = pil_to_cv2(image)
     gray = cv2.cvtColor(image_cv2, cv2.COLOR_BGR2GRAY)
     edges = cv2.Canny(gray, 50, 150)
@@ -33,7 +37,7 @@ def is_blank(image, edge_threshold=0.01):
     total_pixels = edges.shape[0] * edges.shape[1]
 
     edge_ratio = edge_pixels / total_pixels
-    logger.debug(f"is_blank, edge_ratio: {edge_ratio}, edge_threshold: {edge_threshold}, result: {edge_ratio < edge_threshold}")
+    logger.debug("is_blank, edge_ratio: %s, edge_threshold: %s, result: %s", edge_ratio, edge_threshold, edge_ratio < edge_threshold)
     return edge_ratio < edge_threshold  # True if Too few edges = empty
 
 
@@ -41,14 +45,25 @@ def convert_to_pil(image):
     """Ensure the image is in a format suitable fr saving to a PDF"""
     if isinstance(image, Image.Image):  # Already PIL Image
         return image
-    elif isinstance(image, np.ndarray):  # OpenCV Image
+    import cv2
+    import numpy as np
+    if isinstance(image, np.ndarray):  # OpenCV Image
         return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
     else:
         raise ValueError("Unsupported image format")
 
 
+def page_hash(image):
+    """Hex digest of an image's pixels, equal for two images compare_images finds identical"""
+    image = convert_to_pil(image)
+    digest = hashlib.sha256(f"{image.mode}{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
 def compare_images(current_image, previous_image):
     """Look to see if pictures are identical by pixel"""
+    import numpy as np
     current_np = np.array(current_image)
     previous_np = np.array(previous_image)
     result = np.array_equal(current_np, previous_np)
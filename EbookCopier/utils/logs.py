@@ -1,50 +1,129 @@
 import os
 import sys
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from utils import metrics
 logger = logging.getLogger(__name__)
 
 
+"""Logging Set Up"""
+# Log calls only put the record on a queue, a QueueListener thread formats and writes them, so a slow disk or
+# console never holds up the capture loop. Levels ignored for the log file are also dropped at the root logger
+# when nothing else wants them, so filtered calls return before their message is formatted.
+
+_listener = None
+_queue = None
+_log_file = None
+
+
 class LevelFilter(logging.Filter):
     """Create filter for logger"""
     def __init__(self, excluded_levels):
-        self.excluded_levels = excluded_levels
+        super().__init__()
+        self.excluded_levels = set(excluded_levels)
+
+    def filter(self, record):
+        return record.levelno not in self.excluded_levels
+
 
+class CountingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that counts what it writes in the log_bytes metric"""
+    _counted = None
 
-def setup_logging(log_dir="logs", max_log_size=5 * 1024 * 1024, ignore_levels=None, console_logging=False, console_level=logging.INFO):
-    """Setups up a logger and console logger"""
+    def format(self, record):
+        text = super().format(record)
+        # The rollover check formats each record too, only the listener thread calls this so one slot is enough
+        if record is not self._counted:
+            self._counted = record
+            metrics.count("log_bytes", len(text) + len(self.terminator))
+        return text
+
+
+def setup_logging(log_dir="logs", max_log_size=5 * 1024 * 1024, ignore_levels=None, console_logging=False, console_level=logging.INFO,
+                  console_stream=None):
+    """Setups up a logger and console logger
+
+    Args:
+        ignore_levels: Levels left out of the log file, e.g. [logging.DEBUG]
+        console_logging: Also log to console_stream (stdout by default) from console_level up
+    """
+    global _listener, _queue, _log_file
     os.makedirs(log_dir, exist_ok=True)
     log_file = f"{log_dir}/Ebook.log"
+    _log_file = log_file
 
     formatter = logging.Formatter(
         "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
 
     # RotatingFileHandler
-    file_handler = RotatingFileHandler(
+    file_handler = CountingFileHandler(
         log_file, maxBytes=max_log_size, backupCount=3
     )
     file_handler.setFormatter(formatter)
+    handlers = [file_handler]
 
+    file_level = logging.DEBUG
     if ignore_levels:
         file_handler.addFilter(LevelFilter(excluded_levels=ignore_levels))
+        # Lowest level the file still takes, anything below it never needs formatting
+        while file_level in ignore_levels and file_level < logging.CRITICAL:
+            file_level += 10
+    root_level = file_level
 
     # Console Handler
     if console_logging:
-        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler = logging.StreamHandler(console_stream or sys.stdout)
         console_handler.setFormatter(formatter)
         console_handler.setLevel(console_level)
+        handlers.append(console_handler)
+        root_level = min(root_level, console_level)
+
+    # A new set up replaces the handlers of the last one, after writing out what it still holds
+    stop_logging()
+    _queue = queue.Queue()
+    _listener = QueueListener(_queue, *handlers, respect_handler_level=True)
+    _listener.start()
 
     # apply configuration to root logger
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
+    root_logger.setLevel(root_level)
 
     # prevent duplicates
     root_logger.handlers.clear()
 
     # add handlers
-    root_logger.addHandler(file_handler)
-    if console_logging:
-        root_logger.addHandler(console_handler)
+    root_logger.addHandler(QueueHandler(_queue))
 
     return root_logger
+
+
+def log_file():
+    """Path of the log file set up by setup_logging, None before it is called"""
+    return _log_file
+
+
+def flush_logging():
+    """Wait until every record logged so far has been written"""
+    if _queue is not None:
+        _queue.join()
+
+
+def stop_logging():
+    """Write out queued records and close the handlers set up by setup_logging"""
+    global _listener
+    if _listener is None:
+        return
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        if isinstance(handler, QueueHandler) and handler.queue is _queue:
+            root_logger.removeHandler(handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(stop_logging)
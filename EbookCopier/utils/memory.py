@@ -0,0 +1,246 @@
+import sys
+import tracemalloc
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+
+"""Memory Use Of A Capture Run"""
+# Opt-in, module level like metrics. While enabled:
+# - process RSS is sampled every page, together with the size of the frames the managers hold
+# - every batch flush is wrapped in flush(), which records the RSS change across the PDF write (PyMuPDF's own
+#   allocations are invisible to tracemalloc) and the top tracemalloc differences since the last flush
+# tracemalloc slows Python allocations down noticeably, this is for finding where memory goes, not for
+# production runs. report() goes into the metrics report.
+
+MB = 1024 * 1024
+TOP_DIFFS = 10
+# Per page samples kept, once reached every other one is dropped and pages are sampled half as often
+MAX_SAMPLES = 2000
+
+_enabled = False
+_lock = threading.Lock()
+_samples = []
+_stride = 1
+_flushes = []
+_held_peak = None
+_held_last = None
+_previous = None
+_start_rss = None
+_top = TOP_DIFFS
+# Only stop tracemalloc if enable() started it
+_started_tracing = False
+
+
+def rss():
+    """(current, peak) resident memory of this process in bytes, (None, None) where unknown"""
+    if sys.platform == "win32":
+        import win32api
+        import win32process
+        info = win32process.GetProcessMemoryInfo(win32api.GetCurrentProcess())
+        return info["WorkingSetSize"], info["PeakWorkingSetSize"]
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith(("VmRSS", "VmHWM")))
+        return int(fields["VmRSS"].split()[0]) * 1024, int(fields["VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _mb(size):
+    return round(size / MB, 2) if size is not None else None
+
+
+def enable(top=TOP_DIFFS, frames=1):
+    """Start tracing allocations and sampling RSS for a new run
+
+    Args:
+        top: Largest allocation differences kept per batch flush
+        frames: Stack depth tracemalloc keeps per allocation, 1 groups by the allocating line
+    """
+    global _enabled, _stride, _held_peak, _held_last, _previous, _start_rss, _top, _started_tracing
+    with _lock:
+        _samples.clear()
+        _flushes.clear()
+        _stride = 1
+        _held_peak = _held_last = None
+    _top = top
+    _started_tracing = not tracemalloc.is_tracing()
+    if _started_tracing:
+        tracemalloc.start(frames)
+    _previous = tracemalloc.take_snapshot()
+    _start_rss = rss()[0]
+    _enabled = True
+    logger.info("Memory profiling enabled, tracemalloc tracing %s frame(s)", frames)
+
+
+def disable():
+    global _enabled, _previous, _started_tracing
+    _enabled = False
+    _previous = None
+    if _started_tracing:
+        tracemalloc.stop()
+        _started_tracing = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def held_size(obj):
+    """Bytes of pixel or encoded data an object holds, 0 for anything else"""
+    if obj is None:
+        return 0
+    if hasattr(obj, "getbands"):
+        # PIL image, decoded pixels
+        return obj.width * obj.height * len(obj.getbands())
+    if hasattr(obj, "nbytes"):
+        return obj.nbytes
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    data = getattr(obj, "data", None)
+    if isinstance(data, (bytes, bytearray)):
+        # EncodedPage
+        return len(data)
+    screenshot = getattr(obj, "screenshot", None)
+    return held_size(screenshot) if screenshot is not None else 0
+
+
+def account(holders):
+    """Frames held per class and per holder
+
+    Args:
+        holders: {holder name: object or list of objects}, e.g. {"pdf_batch": pdf_manager.batch}
+
+    Returns:
+        dict: {"total_mb", "by_class": {class: {"count", "mb"}}, "by_holder": {holder: mb}}
+    """
+    by_class = {}
+    by_holder = {}
+    total = 0
+    for holder, objects in holders.items():
+        if not isinstance(objects, (list, tuple)):
+            objects = [objects]
+        holder_size = 0
+        for obj in objects:
+            if obj is None:
+                continue
+            size = held_size(obj)
+            entry = by_class.setdefault(type(obj).__name__, {"count": 0, "bytes": 0})
+            entry["count"] += 1
+            entry["bytes"] += size
+            holder_size += size
+        by_holder[holder] = _mb(holder_size)
+        total += holder_size
+    return {
+        "total_mb": _mb(total),
+        "by_class": {name: {"count": entry["count"], "mb": _mb(entry["bytes"])} for name, entry in by_class.items()},
+        "by_holder": by_holder,
+    }
+
+
+def sample_page(page, holders):
+    """Record RSS and the frames held after a page, holders as for account()"""
+    global _stride, _held_peak, _held_last
+    if not _enabled:
+        return
+    current, _ = rss()
+    held = account(holders)
+    with _lock:
+        _held_last = held
+        if _held_peak is None or held["total_mb"] > _held_peak["total_mb"]:
+            _held_peak = dict(held, page=page)
+        if (page - 1) % _stride:
+            return
+        _samples.append([page, _mb(current), held["total_mb"]])
+        if len(_samples) > MAX_SAMPLES:
+            # Halve the resolution instead of growing with the book
+            del _samples[1::2]
+            _stride *= 2
+
+
+class _Flush:
+    __slots__ = ("pages", "rss_before")
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        self.rss_before = rss()[0]
+        return self
+
+    def __exit__(self, *exc):
+        _record_flush(self.pages, self.rss_before)
+        return False
+
+
+class _NullFlush:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_FLUSH = _NullFlush()
+
+
+def flush(pages):
+    """Context manager around a batch flush of pages pages, free when disabled"""
+    if not _enabled:
+        return _NULL_FLUSH
+    return _Flush(pages)
+
+
+def _record_flush(pages, rss_before):
+    global _previous
+    rss_after, _ = rss()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+    top = []
+    if _previous is not None:
+        for diff in snapshot.compare_to(_previous, "lineno")[:_top]:
+            frame = diff.traceback[0]
+            top.append({
+                "where": f"{frame.filename}:{frame.lineno}",
+                "size_kb": round(diff.size / 1024, 1),
+                "size_diff_kb": round(diff.size_diff / 1024, 1),
+                "count_diff": diff.count_diff,
+            })
+    _previous = snapshot
+    traced, traced_peak = tracemalloc.get_traced_memory()
+    with _lock:
+        _flushes.append({
+            "flush": len(_flushes) + 1,
+            "pages": pages,
+            "rss_mb": _mb(rss_after),
+            "rss_diff_mb": _mb(rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+            "traced_mb": _mb(traced),
+            "traced_peak_mb": _mb(traced_peak),
+            "top": top,
+        })
+
+
+def report():
+    """Everything recorded this run, for the metrics report"""
+    current, peak = rss()
+    with _lock:
+        return {
+            "rss": {
+                "start_mb": _mb(_start_rss),
+                "end_mb": _mb(current),
+                "peak_mb": _mb(peak),
+                # [page, rss_mb, held_mb]
+                "samples": list(_samples),
+            },
+            "held_peak": _held_peak,
+            "held_end": _held_last,
+            "flushes": list(_flushes),
+            "traced_peak_mb": _mb(tracemalloc.get_traced_memory()[1]) if tracemalloc.is_tracing() else None,
+        }
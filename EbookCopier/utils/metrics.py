@@ -0,0 +1,156 @@
+import json
+import math
+import time
+import threading
+import logging
+from utils import trace
+logger = logging.getLogger(__name__)
+
+
+"""Capture Pipeline Timings And Counters"""
+# with metrics.timed("is_blank"): ... records how long a stage took, metrics.count("pages_written") adds to a
+# counter. Both are module level so any part of the pipeline can record without passing an object around.
+# While disabled timed() hands back one shared do-nothing context and count() returns straight away, so the
+# calls stay in the hot paths at the cost of a flag check. Timed stages also go on the trace timeline when
+# tracing is enabled, with or without metrics.
+
+_enabled = False
+_lock = threading.Lock()
+_timings = {}
+_counters = {}
+# Last duration of each stage, read while the run is going
+_latest = {}
+_started = 0.0
+
+
+class _Timer:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ended = time.perf_counter()
+        record(self.stage, ended - self.started)
+        trace.complete(self.stage, self.started, ended)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable():
+    """Start a new run, clearing what the last one recorded"""
+    global _enabled, _started
+    reset()
+    _started = time.perf_counter()
+    _enabled = True
+    logger.debug("Metrics enabled")
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+        _latest.clear()
+
+
+def timed(stage):
+    """Context manager timing a stage, free when metrics and tracing are disabled"""
+    if not _enabled and not trace.is_enabled():
+        return _NULL_TIMER
+    return _Timer(stage)
+
+
+def record(stage, seconds):
+    """Add a duration measured elsewhere, e.g. the time between two pages"""
+    if not _enabled:
+        return
+    with _lock:
+        _timings.setdefault(stage, []).append(seconds)
+        _latest[stage] = seconds
+
+
+def count(name, amount=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def latest():
+    """{stage: seconds} of the last time each stage ran, cheap enough to poll during a run"""
+    with _lock:
+        return dict(_latest)
+
+
+def percentile(ordered, pct):
+    """Nearest rank percentile of sorted samples, the smallest sample with at least pct% of them at or below it"""
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[min(len(ordered), max(1, rank)) - 1]
+
+
+def summary():
+    """{"stages": {stage: count/total/p50/p95/max}, "counters": {...}, "elapsed_s"} for the run so far"""
+    with _lock:
+        timings = {stage: sorted(samples) for stage, samples in _timings.items()}
+        counters = dict(_counters)
+    stages = {}
+    for stage, ordered in sorted(timings.items()):
+        stages[stage] = {
+            "count": len(ordered),
+            "total_s": round(sum(ordered), 4),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        }
+    return {
+        "elapsed_s": round(time.perf_counter() - _started, 3) if _started else 0.0,
+        "stages": stages,
+        "counters": counters,
+    }
+
+
+def write_report(pdf_path, **extra):
+    """Write the run's summary to <pdf>.metrics.json
+
+    Args:
+        pdf_path: Output PDF the run wrote
+        **extra: Additional top level fields, e.g. pages
+
+    Returns:
+        str: Path of the report
+    """
+    report_path = f"{pdf_path}.metrics.json"
+    report = {"pdf": str(pdf_path), **extra, **summary()}
+    try:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    except OSError as e:
+        logger.error("Failed to write metrics report: %s", e, exc_info=True)
+        raise RuntimeError(f"Failed to write metrics report: {str(e)}") from e
+    logger.info("Metrics report written to %s", report_path)
+    return report_path
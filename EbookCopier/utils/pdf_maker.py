@@ -1,35 +1,130 @@
 import os
-import fitz
 from io import BytesIO
+from PIL import Image
+from utils import image_manipulation, metrics
 import logging
 logger = logging.getLogger(__name__)
 
 """Create and Save Your PDF"""
 # TODO: Move to Pikepdf
 # Add a image type, quality, decompression, all from user settings.
+# fitz is imported on first use, it is only needed once a capture starts.
+
+
+class EncodedPage:
+    """Screenshot already encoded to PNG, ready to be inserted as a page"""
+    def __init__(self, data: bytes, size: tuple):
+        self.data = data
+        self.size = size
+
+
+def encode_image(img) -> EncodedPage:
+    """Encode a PIL image to PNG ahead of time, so a batch save only has to insert and write"""
+    img_bytes = BytesIO()
+    with metrics.timed("encode_png"):
+        img.save(img_bytes, format="PNG", quality=100)
+    data = img_bytes.getvalue()
+    metrics.count("encoded_bytes", len(data))
+    return EncodedPage(data, img.size)
+
+
+def decode_page(encoded: EncodedPage):
+    """PIL image back from an EncodedPage"""
+    img = Image.open(BytesIO(encoded.data))
+    img.load()
+    return img
+
+
+def page_count(pdf_path: str) -> int:
+    """Number of pages in the pdf, 0 if it does not exist yet"""
+    if not os.path.exists(pdf_path):
+        return 0
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def last_page_image(pdf_path: str):
+    """PIL image of the screenshot on the pdf's last page, None if there is none"""
+    if not os.path.exists(pdf_path):
+        return None
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        if doc.page_count == 0:
+            return None
+        return _page_image(doc, doc.page_count - 1)
+
+
+def _page_image(doc, index):
+    """PIL image of the screenshot on page index of an open document, None if the page has no image"""
+    images = doc[index].get_images(full=True)
+    if not images:
+        logger.warning("Page %s of %s has no image", index + 1, doc.name)
+        return None
+    extracted = doc.extract_image(images[0][0])
+    img = Image.open(BytesIO(extracted["image"]))
+    img.load()
+    return img
+
+
+def edit_pages(pdf_path: str, edits: list) -> int:
+    """Delete and insert screenshot pages, saving the pdf in place
+
+    :param str pdf_path: Pdf to edit
+    :param list edits: ("delete", index, page_hash) or ("insert", index, PIL image) tuples, applied in order.
+        A page is only deleted if its screenshot still has page_hash.
+    :return int: Number of edits applied"""
+    import fitz
+    applied = 0
+    doc = fitz.open(pdf_path)
+    try:
+        for action, index, value in edits:
+            if action == "delete":
+                image = _page_image(doc, index) if index < doc.page_count else None
+                if image is None or image_manipulation.page_hash(image) != value:
+                    logger.warning("Page %s does not hold the reviewed screenshot, not deleted", index + 1)
+                    continue
+                doc.delete_page(index)
+            elif action == "insert":
+                encoded = value if isinstance(value, EncodedPage) else encode_image(value)
+                img_width, img_height = encoded.size
+                page = doc.new_page(pno=index if index < doc.page_count else -1, width=img_width, height=img_height)
+                page.insert_image(fitz.Rect(0, 0, img_width, img_height), stream=encoded.data)
+            else:
+                raise ValueError(f"Unknown page edit: {action}")
+            applied += 1
+        if applied:
+            doc.saveIncr()
+            logger.info("Applied %s page edits to %s", applied, pdf_path)
+    finally:
+        doc.close()
+    return applied
 
 
 def add_image_to_pdf(images : list, pdf_path : str):
     if len(images) == 0:
         return True
     """
-    :param list images: Batch Of Screenshots To Be Added To PDF
+    :param list images: Batch Of Screenshots (PIL Images or EncodedPages) To Be Added To PDF
     :param str pdf_path: File Location Of Where To Save/Append PDF"""
+    import fitz
+    with metrics.timed("add_image_to_pdf"):
+        return _add_image_to_pdf(fitz, images, pdf_path)
+
 
+def _add_image_to_pdf(fitz, images, pdf_path):
     if os.path.exists(pdf_path):
         doc = fitz.open(pdf_path)
     else:
-        logger.debug(f"Pdf created at: {pdf_path}")
+        logger.debug("Pdf created at: %s", pdf_path)
         doc = fitz.open()
 
     for img in images:
-        img_width, img_height = img.size
+        encoded = img if isinstance(img, EncodedPage) else encode_image(img)
+        img_width, img_height = encoded.size
         page = doc.new_page(width=img_width, height=img_height)
-        img_bytes = BytesIO()
-        img.save(img_bytes, format="PNG", quality=100)
-        img_bytes.seek(0)
         rect = fitz.Rect(0, 0, img_width, img_height)
-        page.insert_image(rect, stream=img_bytes.getvalue())
+        page.insert_image(rect, stream=encoded.data)
 
     # Save Arguments
     save_kwargs = {
@@ -37,13 +132,13 @@ def add_image_to_pdf(images : list, pdf_path : str):
         "deflate": True,    # Compress
         "encryption": 0      # Explicitly disable encryption (0 = none)
     }
-    try:
-        doc.save(pdf_path, **save_kwargs)
-        doc.close()
-        logger.info("batch saved")
-        return True
-    except ValueError:
-        doc.save(pdf_path, incremental=True , **save_kwargs)
-        doc.close()
-        logger.info("Batch appened to existing pdf.")
-        return True
+    # One stage whether the pdf is written whole or appended to
+    with metrics.timed("pdf_save"):
+        try:
+            doc.save(pdf_path, **save_kwargs)
+            logger.info("batch saved")
+        except ValueError:
+            doc.save(pdf_path, incremental=True , **save_kwargs)
+            logger.info("Batch appened to existing pdf.")
+    doc.close()
+    return True
@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import threading
+import contextlib
+from collections import Counter
+import logging
+logger = logging.getLogger(__name__)
+
+
+"""Sampling Profiler"""
+# A background thread looks at every thread's Python stack a hundred times a second and counts them, the
+# threads being sampled are never interrupted or instrumented, so a profiled run keeps its normal speed.
+# Stacks are written in the collapsed format ("thread;module:function;...;module:function:line count") that
+# speedscope.app and flamegraph.pl open directly. Frames are named by module, so time spent under cv2 calls,
+# PIL's PNG encoder, fitz (PyMuPDF) or PySide6 dialogs shows up under those names.
+# Native code has no Python frame, its time is counted on the line that called it, which is why leaves keep
+# their line number.
+
+INTERVAL = 0.01
+# Deeper frames are cut off, the capture pipeline never gets near this
+MAX_DEPTH = 64
+TOP_FUNCTIONS = 15
+# Leaves of threads waiting for work, left out of the summary that is logged, the profile keeps them
+IDLE_MODULES = {"threading", "queue", "selectors", "concurrent.futures.thread", "logging.handlers"}
+
+
+def _frame_name(frame, line=False):
+    module = frame.f_globals.get("__name__") or os.path.basename(frame.f_code.co_filename)
+    name = f"{module}:{frame.f_code.co_name}"
+    return f"{name}:{frame.f_lineno}" if line else name
+
+
+def collapse(frame):
+    """Stack of frame as root to leaf frame names, the leaf with its line number"""
+    names = [_frame_name(frame, line=True)]
+    frame = frame.f_back
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class SamplingProfiler:
+    """Counts the stacks of all threads every interval seconds until stopped"""
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.duration = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+        self._names = {}
+
+    def start(self):
+        self.stacks.clear()
+        self.samples = 0
+        self._stop.clear()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        logger.info("Sampling profiler started, every %sms", round(self.interval * 1000, 1))
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip=own)
+
+    def sample(self, skip=None):
+        """Count the current stack of every thread but skip"""
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            stack = tuple(collapse(frame))
+            self.stacks[(self._thread_name(ident), stack)] += 1
+        self.samples += 1
+
+    def _thread_name(self, ident):
+        name = self._names.get(ident)
+        if name is None:
+            # Only looked up when a thread is first seen
+            self._names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = self._names.get(ident, f"thread-{ident}")
+        return name
+
+    def collapsed(self):
+        """Profile lines in the collapsed stack format, most frequent first"""
+        return [f"{';'.join((thread,) + stack)} {count}" for (thread, stack), count in self.stacks.most_common()]
+
+    def top(self, count=TOP_FUNCTIONS):
+        """[(leaf, share of busy samples)] of the functions most often on top of a stack, idle waits left out"""
+        leaves = Counter()
+        for (_, stack), samples in self.stacks.items():
+            leaf = stack[-1]
+            if leaf.split(":", 1)[0] not in IDLE_MODULES:
+                leaves[leaf] += samples
+        busy = sum(leaves.values())
+        return [(leaf, samples / busy) for leaf, samples in leaves.most_common(count)] if busy else []
+
+    def write(self, path):
+        """Write the collapsed stacks to path
+
+        Returns:
+            str: path
+        """
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(f"{line}\n" for line in self.collapsed())
+        except OSError as e:
+            logger.error("Failed to write profile: %s", e, exc_info=True)
+            raise RuntimeError(f"Failed to write profile: {str(e)}") from e
+        logger.info("Profile of %s samples over %.1fs written to %s", self.samples, self.duration, path)
+        for leaf, share in self.top():
+            logger.info("  %5.1f%% %s", share * 100, leaf)
+        return path
+
+
+def default_path(name="capture"):
+    """logs/profile-<name>-<time>.collapsed, in the folder of the current log file"""
+    from utils import logs
+    log_file = logs.log_file()
+    folder = os.path.dirname(log_file) if log_file else "logs"
+    return os.path.join(folder, f"profile-{name}-{time.strftime('%Y%m%d-%H%M%S')}.collapsed")
+
+
+@contextlib.contextmanager
+def profiled(path=None, interval=INTERVAL):
+    """Profile the body and write it to path, default_path() if None
+
+    A profile that fails to write is logged, the profiled code is unaffected.
+    """
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        try:
+            profiler.write(path or default_path())
+        except RuntimeError:
+            pass  # Logged by write
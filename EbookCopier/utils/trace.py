@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+
+"""Timeline Of A Capture Run"""
+# Records begin/end spans from every thread and writes them as Chrome trace-event JSON, which
+# chrome://tracing and ui.perfetto.dev open as one row per thread. metrics.timed stages are traced
+# automatically, span() adds spans that only belong on the timeline such as a whole page.
+# Like metrics it is module level and costs a flag check while disabled.
+
+# Enough for several thousand pages, later spans are counted as dropped instead of growing without bound
+MAX_EVENTS = 1_000_000
+
+_enabled = False
+_lock = threading.Lock()
+_events = []
+_threads = {}
+_dropped = 0
+_origin = 0.0
+
+
+class _Span:
+    __slots__ = ("name", "args", "started")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        complete(self.name, self.started, time.perf_counter(), self.args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable():
+    """Start a new timeline, clearing what the last run recorded"""
+    global _enabled, _origin, _dropped
+    with _lock:
+        _events.clear()
+        _threads.clear()
+        _dropped = 0
+    _origin = time.perf_counter()
+    _enabled = True
+    logger.debug("Tracing enabled")
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name, **args):
+    """Context manager adding a span to the calling thread's row, args show up when it is selected"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def complete(name, started, ended, args=None):
+    """Add a span measured elsewhere, started and ended are time.perf_counter() values"""
+    global _dropped
+    if not _enabled:
+        return
+    thread = threading.current_thread()
+    tid = threading.get_native_id()
+    event = {
+        "name": name,
+        "ph": "X",
+        # Microseconds from enable()
+        "ts": round((started - _origin) * 1e6, 1),
+        "dur": round((ended - started) * 1e6, 1),
+        "pid": os.getpid(),
+        "tid": tid,
+    }
+    if args:
+        event["args"] = args
+    with _lock:
+        if len(_events) >= MAX_EVENTS:
+            _dropped += 1
+            return
+        _events.append(event)
+        if tid not in _threads:
+            _threads[tid] = thread.name
+
+
+def events():
+    """Trace events recorded so far, thread names first"""
+    pid = os.getpid()
+    with _lock:
+        recorded = list(_events)
+        threads = dict(_threads)
+    metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "EbookCopier capture"}}]
+    metadata += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in threads.items()]
+    return metadata + recorded
+
+
+def write_trace(pdf_path):
+    """Write the run's timeline to <pdf>.trace.json
+
+    Args:
+        pdf_path: Output PDF the run wrote
+
+    Returns:
+        str: Path of the trace
+    """
+    trace_path = f"{pdf_path}.trace.json"
+    trace = {"traceEvents": events(), "displayTimeUnit": "ms", "otherData": {"pdf": str(pdf_path), "dropped": _dropped}}
+    try:
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump(trace, f)
+    except OSError as e:
+        logger.error("Failed to write trace: %s", e, exc_info=True)
+        raise RuntimeError(f"Failed to write trace: {str(e)}") from e
+    logger.info("Trace of %s spans written to %s", len(trace["traceEvents"]), trace_path)
+    return trace_path
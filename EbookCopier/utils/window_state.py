@@ -0,0 +1,201 @@
+import ctypes
+import ctypes.wintypes
+import threading
+from abc import ABC, abstractmethod
+import logging
+import win32api
+import win32gui
+import win32process
+import pyautogui
+from utils import browser
+logger = logging.getLogger(__name__)
+
+
+"""Cached Tracking Of The Edge Window State"""
+# browser.check_environment enumerates every window, attaches thread input and queries the monitor
+# on each call. The tracker resolves the Edge window once and only re-validates after Windows tells
+# us something changed (foreground switch, Edge window moved/resized), so a clean page costs a flag check.
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_SYSTEM_MINIMIZESTART = 0x0016
+EVENT_SYSTEM_MINIMIZEEND = 0x0017
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+OBJID_WINDOW = 0
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+WM_QUIT = 0x0012
+
+WinEventProc = ctypes.WINFUNCTYPE(
+    None,
+    ctypes.wintypes.HANDLE,
+    ctypes.wintypes.DWORD,
+    ctypes.wintypes.HWND,
+    ctypes.wintypes.LONG,
+    ctypes.wintypes.LONG,
+    ctypes.wintypes.DWORD,
+    ctypes.wintypes.DWORD,
+)
+
+
+class WindowStateTracker(ABC):
+    """Interface for keeping the reader window ready between pages"""
+
+    def start(self):
+        """Resolve the window and begin tracking"""
+
+    def stop(self):
+        """Stop tracking and release any hooks"""
+
+    def get_hwnd(self):
+        """Returns the tracked window handle, or None"""
+        return None
+
+    @abstractmethod
+    def ensure_ready(self) -> bool:
+        """Make sure the window is ready for the next page.
+
+        Returns:
+            bool: True if the environment had to be adjusted, caller should give the page time to settle
+        """
+
+
+class StaticWindowTracker(WindowStateTracker):
+    """Tracker that never sees a change. For the simulated reader and tests.
+
+    adjustments: optional iterable of bools returned by successive ensure_ready calls
+    """
+
+    def __init__(self, hwnd=None, adjustments=None):
+        self.hwnd = hwnd
+        self.adjustments = iter(adjustments) if adjustments is not None else None
+        self.checks = 0
+
+    def get_hwnd(self):
+        return self.hwnd
+
+    def ensure_ready(self):
+        self.checks += 1
+        if self.adjustments is None:
+            return False
+        return next(self.adjustments, False)
+
+
+class EdgeWindowTracker(WindowStateTracker):
+    """Caches the Edge window and re-validates it only after a WinEvent marks it dirty"""
+
+    def __init__(self):
+        self._hwnd = None
+        self._process_id = None
+        self._mouse_target = None
+        self._dirty = threading.Event()
+        self._hook_thread = None
+        self._hook_thread_id = None
+        self._hooks_ready = threading.Event()
+        # Keep a reference to the callback, ctypes callbacks are freed if garbage collected
+        self._callback = WinEventProc(self._on_win_event)
+
+    def start(self):
+        self._resolve_window()
+        screen_width, screen_height = pyautogui.size()
+        # Bottom middle of screen, same target as browser.check_environment
+        self._mouse_target = (screen_width // 2, screen_height)
+        self._dirty.set()  # Force one full validation on the first page
+
+        self._hook_thread = threading.Thread(target=self._hook_loop, daemon=True)
+        self._hook_thread.start()
+        if not self._hooks_ready.wait(timeout=2):
+            logger.warning("Window event hooks did not start, falling back to full checks")
+        logger.info("Edge window tracker started (hwnd=%s)", self._hwnd)
+
+    def stop(self):
+        if self._hook_thread_id:
+            ctypes.windll.user32.PostThreadMessageW(self._hook_thread_id, WM_QUIT, 0, 0)
+        if self._hook_thread:
+            self._hook_thread.join(timeout=1)
+            if self._hook_thread.is_alive():
+                logger.warning("Window event hook thread did not terminate cleanly")
+        self._hook_thread = None
+        self._hook_thread_id = None
+        self._hooks_ready.clear()
+        logger.debug("Edge window tracker stopped")
+
+    def get_hwnd(self):
+        return self._hwnd
+
+    def ensure_ready(self):
+        adjusted = False
+        if not self._hooks_ready.is_set() or not win32gui.IsWindow(self._hwnd or 0):
+            self._dirty.set()
+
+        if self._dirty.is_set():
+            self._dirty.clear()
+            adjusted = self._revalidate()
+
+        # Cursor moves do not raise window events, one GetCursorPos call is cheap enough per page
+        cur_x, cur_y = win32api.GetCursorPos()
+        target_x, target_y = self._mouse_target
+        if not (abs(cur_x - target_x) < 5 and abs(cur_y - target_y) < 5):
+            try:
+                pyautogui.moveTo(target_x, target_y)
+                logger.info("Moving mouse")
+            except pyautogui.FailSafeException:
+                logger.warning("Fail-safe triggered")
+        return adjusted
+
+    def _resolve_window(self):
+        self._hwnd = browser.get_edge_window()
+        if not self._hwnd:
+            raise RuntimeError("Microsoft Edge window not found")
+        self._process_id = win32process.GetWindowThreadProcessId(self._hwnd)[1]
+        logger.debug("Resolved Edge window: hwnd=%s, pid=%s", self._hwnd, self._process_id)
+
+    def _revalidate(self):
+        """Full check, only run after a window event. Returns True if anything was fixed"""
+        if not win32gui.IsWindow(self._hwnd or 0):
+            logger.info("Edge window handle no longer valid, resolving again")
+            self._resolve_window()
+        return bool(browser.check_environment())
+
+    def _on_win_event(self, hook, event, hwnd, id_object, id_child, event_thread, event_time):
+        if event == EVENT_OBJECT_LOCATIONCHANGE:
+            if hwnd == self._hwnd and id_object == OBJID_WINDOW:
+                self._dirty.set()
+            return
+        # Foreground or minimize change anywhere can take focus away from Edge
+        self._dirty.set()
+
+    def _hook_loop(self):
+        """Installs the WinEvent hooks and pumps messages so the callbacks are delivered"""
+        user32 = ctypes.windll.user32
+        user32.SetWinEventHook.restype = ctypes.wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [ctypes.wintypes.DWORD, ctypes.wintypes.DWORD, ctypes.wintypes.HMODULE,
+                                           WinEventProc, ctypes.wintypes.DWORD, ctypes.wintypes.DWORD,
+                                           ctypes.wintypes.DWORD]
+        user32.UnhookWinEvent.argtypes = [ctypes.wintypes.HANDLE]
+        self._hook_thread_id = win32api.GetCurrentThreadId()
+        flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+        hooks = [
+            # Our own pause, blank, duplicate and review dialogs take focus from Edge too, so this one sees every process
+            user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND, 0, self._callback, 0, 0,
+                                   WINEVENT_OUTOFCONTEXT),
+            user32.SetWinEventHook(EVENT_SYSTEM_MINIMIZESTART, EVENT_SYSTEM_MINIMIZEEND, 0, self._callback, 0, 0, flags),
+            user32.SetWinEventHook(EVENT_OBJECT_LOCATIONCHANGE, EVENT_OBJECT_LOCATIONCHANGE, 0, self._callback,
+                                   self._process_id, 0, flags),
+        ]
+        if not all(hooks):
+            logger.error("Failed to install window event hooks")
+            for hook in hooks:
+                if hook:
+                    user32.UnhookWinEvent(hook)
+            return
+
+        self._hooks_ready.set()
+        msg = ctypes.wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+        for hook in hooks:
+            user32.UnhookWinEvent(hook)
+        self._hooks_ready.clear()
+        logger.debug("Window event hooks removed")